@@ -0,0 +1,129 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Clean data backends benchmark
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import argparse
+import filecmp
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_PATH = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, BENCH_PATH)
+
+from bench_pipeline import prepare_root
+
+BACKENDS = ["pandas", "polars"]
+
+
+def run_backend(backend, countries, out_path):
+    """
+    Clean, filter and standardize Import Genius data with one backend in
+    this process (a child of 'bench_backend') and save it as a .csv file.
+
+    Inputs:
+        backend (str): either "pandas" or "polars"
+        countries (str): either 'asia', 'spain' or 'belgium'
+        out_path (str): path of the .csv file.
+
+    Returns (dict): seconds and peak RSS in MB.
+    """
+    import utils.translate as translate
+    from synthetic import TRANSLATIONS
+
+    translate.register_provider(
+        translate.LocalProvider(TRANSLATIONS, name="google"))
+
+    from pipeline import clean_ig_polars, standardize_ig
+    from utils.clean_data import clean_data, create_subsidiary_dict, generate_path
+
+    subsidiaries = create_subsidiary_dict(25, 20)
+    if backend == "polars":
+        # Polars is imported outside the timed block, like pandas. Fails with
+        # a message on how to install it if it's missing
+        from utils.lazy_clean import import_polars
+        import_polars()
+        func = lambda: clean_ig_polars(countries, subsidiaries)
+    else:
+        func = lambda: standardize_ig(clean_data("ig", generate_path(countries)),
+                                      countries, subsidiaries)
+
+    start = time.perf_counter()
+    ig_c = func()
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    ig_c.to_csv(out_path, index=False)
+
+    return {"seconds": round(seconds, 3), "peak_mb": round(peak_mb, 1)}
+
+
+def bench_backend(root, backend, countries, out_path):
+    """
+    Run a backend in a fresh interpreter inside a work directory.
+
+    Inputs:
+        root (str): project root in the work directory
+        backend (str): either "pandas" or "polars"
+        countries (str): either 'asia', 'spain' or 'belgium'
+        out_path (str): path of the .csv file with the clean data.
+
+    Returns (dict): seconds and peak RSS in MB.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, BENCH_PATH]))
+    with open(os.devnull, "w") as devnull:
+        result = subprocess.run(
+            [sys.executable, os.path.realpath(__file__), "--child", backend,
+             "--countries", countries, "--out", out_path],
+            cwd=root, env=env, stdout=subprocess.PIPE, stderr=devnull,
+            text=True, check=True,
+        )
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the pandas and Polars backends on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000],
+                        help="IG rows of the synthetic file")
+    parser.add_argument("--countries", default="asia")
+    parser.add_argument("--work-dir", help="directory for code copies and "
+                        "synthetic data. Default is a temporary directory")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.countries, args.out)))
+        sys.exit(0)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_backends_")
+    same = True
+    print(f"{'rows':>9}{'pandas s':>10}{'polars s':>10}{'speedup':>9}"
+          f"{'pandas MB':>11}{'polars MB':>11}  output")
+    for n_rows in args.rows:
+        root = prepare_root(work_dir, n_rows)
+        results, outputs = {}, {}
+        for backend in BACKENDS:
+            outputs[backend] = os.path.join(root, f"ig_{backend}.csv")
+            results[backend] = bench_backend(root, backend, args.countries,
+                                             outputs[backend])
+        identical = filecmp.cmp(outputs["pandas"], outputs["polars"], shallow=False)
+        same = same and identical
+        pandas, polars = results["pandas"], results["polars"]
+        print(f"{n_rows:>9}{pandas['seconds']:>10.2f}{polars['seconds']:>10.2f}"
+              f"{pandas['seconds'] / polars['seconds']:>8.1f}x"
+              f"{pandas['peak_mb']:>11.0f}{polars['peak_mb']:>11.0f}  "
+              f"{'identical' if identical else 'DIFFERENT'}")
+    if not args.work_dir:
+        shutil.rmtree(work_dir)
+
+    if not same:
+        sys.exit(1)
@@ -0,0 +1,59 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Import time benchmark
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def import_times(module):
+    """
+    Import a module in a fresh interpreter with '-X importtime'.
+
+    Inputs:
+        module (str): module name, e.g. 'utils.clean_data'.
+
+    Returns (tuple): wall time of the whole import in seconds and dictionary
+        with module names as keys and their self import time (seconds, not
+        counting their own imports) as values.
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+
+    self_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        self_times[name.strip()] = int(self_us) / 1e6
+
+    return wall, self_times
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time benchmark")
+    parser.add_argument("--module", type=str, default="utils.clean_data")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    walls = [wall for wall, _ in runs]
+    own = [self_times.get(args.module, 0) for _, self_times in runs]
+
+    print(f"import {args.module} ({args.repeat} runs, best of)")
+    print(f"  total wall time (incl. interpreter and dependencies): {min(walls) * 1000:.1f} ms")
+    print(f"  {args.module} own import time: {min(own) * 1000:.2f} ms")
@@ -0,0 +1,74 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Clean data memory benchmark
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import argparse
+import os
+import sys
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+from utils.get_data import load_clean_ig
+
+TEXT_COLS = ["country", "shipper", "shipper_low", "company_std",
+             "bsgi_commodity", "product"]
+
+
+def frame_memory(df):
+    """
+    Measure the deep memory usage of a dataframe and of its text columns.
+
+    Inputs:
+        df (DataFrame): dataframe to measure.
+
+    Returns (tuple): total memory and memory of the text columns in MB.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    text_cols = [col for col in TEXT_COLS if col in df.columns]
+
+    return usage.sum() / 1e6, usage[text_cols].sum() / 1e6
+
+
+def compare_memory(countries):
+    """
+    Compare the memory of the clean IG dataframes as they are loaded
+    (categorical and Arrow string columns) against the same dataframes with
+    Python object columns.
+
+    Inputs:
+        countries (lst): list of countries with clean IG data.
+
+    Returns (list): list of (country, rows, object MB, typed MB, object text
+        MB, typed text MB) tuples.
+    """
+    results = []
+    for country in countries:
+        typed = load_clean_ig(country)
+        text_cols = [col for col in TEXT_COLS if col in typed.columns]
+        objects = typed.astype({col: object for col in text_cols})
+        obj_total, obj_text = frame_memory(objects)
+        typed_total, typed_text = frame_memory(typed)
+        results.append((country, len(typed), obj_total, typed_total, obj_text,
+                        typed_text))
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare memory of clean IG data with object and "
+                    "categorical/Arrow string text columns")
+    parser.add_argument("countries", nargs="*",
+                        default=["asia", "spain", "belgium"],
+                        help="countries with clean IG data")
+    args = parser.parse_args()
+
+    print(f"{'country':<10}{'rows':>10}{'object MB':>12}{'typed MB':>12}"
+          f"{'text obj MB':>14}{'text typed MB':>15}{'saving':>9}")
+    for country, rows, obj, typed, obj_text, typed_text in \
+            compare_memory(args.countries):
+        print(f"{country:<10}{rows:>10}{obj:>12.2f}{typed:>12.2f}"
+              f"{obj_text:>14.2f}{typed_text:>15.2f}{1 - typed / obj:>9.0%}")
@@ -0,0 +1,249 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Pipeline benchmark suite
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_PATH = os.path.dirname(os.path.realpath(__file__))
+ROOT_PATH = os.path.dirname(BENCH_PATH)
+BASELINE_PATH = os.path.join(BENCH_PATH, "baseline.json")
+
+# Code copied to the work directory, which gets its own synthetic data folders
+PROJECT_FILES = ["config.py", "pipeline.py", "names.json", "utils"]
+
+STAGES = ["clean_data", "create_subsidiary_dict", "standard_company_name",
+          "rl_ig_bsgi", "build_cube", "create_wide_table", "clean_ig_by_country"]
+
+WIDE_TABLE_ARGS = (["year", "month", "company_std"], ["weight_ton"],
+                   ["year", "month", "company_std"], True, {"weight_ton": "sum"})
+
+
+def prepare_root(work_dir, n_rows, seed=0):
+    """
+    Copy the project code to a work directory and write synthetic data in it.
+
+    Inputs:
+        work_dir (str): directory for this scale
+        n_rows (int): number of IG shipments per country file
+        seed (int): random seed. Default is 0.
+
+    Returns (str): project root in the work directory.
+    """
+    from synthetic import write_dataset
+
+    root = os.path.join(work_dir, f"rows_{n_rows}")
+    os.makedirs(root, exist_ok=True)
+    for name in PROJECT_FILES:
+        src = os.path.join(ROOT_PATH, name)
+        if os.path.isdir(src):
+            shutil.copytree(src, os.path.join(root, name), dirs_exist_ok=True,
+                            ignore=shutil.ignore_patterns("__pycache__"))
+        else:
+            shutil.copy(src, root)
+    write_dataset(root, n_rows, seed)
+
+    return root
+
+
+def checksum(result):
+    """
+    Summarize a stage result so runs can be compared with the baseline.
+
+    Inputs:
+        result (DataFrame, Series or dict): stage result.
+
+    Returns (tuple): number of rows (or keys) and a hash of the content.
+    """
+    import pandas as pd
+    from utils.cache import object_hash
+
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        hashes = pd.util.hash_pandas_object(result, index=False)
+        return len(result), str(int(hashes.sum()) % 2 ** 64)
+
+    return len(result), object_hash(result)[:20]
+
+
+def run_stage(stage):
+    """
+    Run one stage in this process (a child of 'bench_stage'): prepare its
+    inputs, then time the stage and measure peak memory.
+
+    Inputs:
+        stage (str): stage name (see STAGES).
+
+    Returns (dict): seconds, peak RSS in MB before (imports and inputs) and
+        after the stage, rows and checksum of the result.
+    """
+    import utils.translate as translate
+    from synthetic import TRANSLATIONS
+
+    # Translations come from a local table instead of Google
+    translate.register_provider(
+        translate.LocalProvider(TRANSLATIONS, name="google"))
+
+    from pipeline import clean_ig_by_country, standardize_ig
+    from utils.clean_data import (clean_data, create_subsidiary_dict,
+                                  clean_bsgi_by_country, generate_path,
+                                  map_values)
+    from utils.record_linkage import rl_ig_bsgi
+    from utils.cube import build_cube
+    from utils.transform_data import standard_company_name, create_wide_table
+
+    path = generate_path("asia")
+    if stage == "clean_data":
+        func = lambda: clean_data("ig", path)
+    elif stage == "create_subsidiary_dict":
+        func = lambda: create_subsidiary_dict(25, 20)
+    elif stage == "standard_company_name":
+        ig = clean_data("ig", path)
+        shipper_low = map_values(ig["shipper"], str.lower)
+        subsidiaries = create_subsidiary_dict(25, 20)
+        func = lambda: standard_company_name(shipper_low, subsidiaries)
+    elif stage == "rl_ig_bsgi":
+        ig = standardize_ig(clean_data("ig", path), "asia",
+                            create_subsidiary_dict(25, 20))
+        bsgi = clean_bsgi_by_country("asia")
+        func = lambda: rl_ig_bsgi(ig, bsgi, "sunflower", date_window=2)
+    elif stage == "build_cube":
+        ig = standardize_ig(clean_data("ig", path), "asia",
+                            create_subsidiary_dict(25, 20))
+        func = lambda: build_cube(ig)
+    elif stage == "create_wide_table":
+        # Tables are built from the export cube the pipeline saves
+        cube = build_cube(standardize_ig(clean_data("ig", path), "asia",
+                                         create_subsidiary_dict(25, 20)))
+        func = lambda: create_wide_table(cube, *WIDE_TABLE_ARGS)
+    elif stage == "clean_ig_by_country":
+        func = lambda: clean_ig_by_country("asia", save=True, force=True)
+    else:
+        raise ValueError(f"Unknown stage '{stage}'. Use one of {STAGES}.")
+
+    # ru_maxrss is in kilobytes on Linux
+    setup_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    rows, digest = checksum(result)
+
+    return {"seconds": round(seconds, 3), "setup_mb": round(setup_mb, 1),
+            "peak_mb": round(peak_mb, 1), "rows": rows, "checksum": digest}
+
+
+def bench_stage(root, stage):
+    """
+    Run a stage in a fresh interpreter inside a work directory, so every
+    stage starts with a cold process and its own peak memory.
+
+    Inputs:
+        root (str): project root in the work directory
+        stage (str): stage name.
+
+    Returns (dict): stage measurements (see 'run_stage').
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, BENCH_PATH]))
+    with open(os.devnull, "w") as devnull:
+        result = subprocess.run(
+            [sys.executable, os.path.realpath(__file__), "--child", stage],
+            cwd=root, env=env, stdout=subprocess.PIPE, stderr=devnull,
+            text=True, check=True,
+        )
+
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print the measurements next to the baseline and flag changes.
+
+    Inputs:
+        results (dict): measurements by scale and stage
+        baseline (dict): baseline measurements by scale and stage
+        tolerance (float): relative slowdown or memory growth flagged as a
+            regression, e.g. 0.25 for 25%.
+
+    Returns (bool): True if every result matches its baseline result.
+    """
+    same = True
+    print(f"{'rows':>9} {'stage':<24}{'seconds':>9}{'base':>9}{'peak MB':>9}"
+          f"{'base':>9}  note")
+    for scale, stages in results.items():
+        for stage, m in stages.items():
+            b = baseline.get(scale, {}).get(stage)
+            notes = []
+            if b is None:
+                notes.append("no baseline")
+                b = {}
+            else:
+                if (m["rows"], m["checksum"]) != (b["rows"], b["checksum"]):
+                    notes.append("RESULT CHANGED")
+                    same = False
+                if m["seconds"] > b["seconds"] * (1 + tolerance):
+                    notes.append("slower")
+                if m["peak_mb"] > b["peak_mb"] * (1 + tolerance):
+                    notes.append("more memory")
+            print(f"{scale:>9} {stage:<24}{m['seconds']:>9.2f}"
+                  f"{b.get('seconds', float('nan')):>9.2f}{m['peak_mb']:>9.0f}"
+                  f"{b.get('peak_mb', float('nan')):>9.0f}  {', '.join(notes)}")
+
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark pipeline stages on synthetic data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000],
+                        help="IG rows per country file (e.g. 10000 100000 1000000)")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--work-dir", help="directory for code copies and "
+                        "synthetic data. Default is a temporary directory")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative slowdown flagged as a regression")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child)))
+        sys.exit(0)
+
+    sys.path.insert(0, BENCH_PATH)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_pipeline_")
+    results = {}
+    for n_rows in args.rows:
+        print(f"Writing synthetic data with {n_rows} rows per IG file...")
+        root = prepare_root(work_dir, n_rows)
+        results[str(n_rows)] = {}
+        for stage in args.stages:
+            print(f"  {stage}")
+            results[str(n_rows)][stage] = bench_stage(root, stage)
+    if not args.work_dir:
+        shutil.rmtree(work_dir)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    same = compare(results, baseline, args.tolerance)
+
+    if args.update_baseline:
+        for scale, stages in results.items():
+            baseline.setdefault(scale, {}).update(stages)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+        print(f"Baseline updated: {args.baseline}")
+    elif not same:
+        sys.exit(1)
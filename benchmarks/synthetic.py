@@ -0,0 +1,268 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Synthetic data generator
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import argparse
+import json
+import os
+import numpy as np
+import pandas as pd
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+START_DATE = "2022-08-01"
+N_DAYS = 242  # August 2022 until March 2023
+
+# Raw destination names as they appear in each IG file (keys of the name
+# dictionaries in names.json)
+IG_COUNTRIES = {"asia": ["індія", "в'єтнам", "в єтнам", "шрі-ланка", "шрі ланка"],
+                "spain": ["іспанія"], "belgium": ["бельгія"]}
+
+BSGI_COUNTRIES = ["India", "Viet Nam", "Sri Lanka", "Spain", "Belgium",
+                  "China", "Turkey", "Egypt", "Italy", "Netherlands"]
+
+# Product descriptions with the HS code they are declared with. Some codes
+# lose their leading 0 like in the IG exports
+PRODUCTS = [
+    ("Насіння соняшнику врожаю 2022 року", "1206009900"),
+    ("Олія соняшникова нерафінована", "1512191000"),
+    ("Шрот соняшниковий гранульований", "2306300000"),
+    ("Кукурудза 3 класу врожаю 2022 року", "1005900000"),
+    ("Пшениця м'яка 2 класу", "1001990000"),
+    ("Ячмінь фуражний", "1003900000"),
+    ("Ріпак для технічної переробки", "1205109000"),
+    ("Соєві боби", "1201900000"),
+    ("Олія соєва", "1507909000"),
+    ("Горох жовтий сушений", "713109000"),
+    ("Шрот ріпаковий", "2306410000"),
+    ("Висівки пшеничні гранульовані", "2302300000"),
+    ("Кукурудза та соняшник, суміш", "1005900000"),
+    ("Цукор білий кристалічний", "1701991000"),
+    ("Машини та обладнання", "8479899790"),
+]
+
+BSGI_COMMODITIES = ["Corn", "Wheat", "Sunflower meal", "Sunflower oil",
+                    "Rapeseed", "Barley", "Soya beans", "Sunflower seed",
+                    "Peas", "Vegetable oil", "Rapeseed meal",
+                    "Wheat bran pellets", "Sugar beet pellets", "Soya oil"]
+
+# Translations of the stubbed translator: BSGI countries and commodities
+# (lowercase English) to Ukrainian
+TRANSLATIONS = {"india": "індія", "viet nam": "в єтнам", "sri lanka": "шрі ланка",
+                "spain": "іспанія", "belgium": "бельгія", "china": "китай",
+                "turkey": "туреччина", "egypt": "єгипет", "italy": "італія",
+                "netherlands": "нідерланди", "corn": "кукурудза",
+                "wheat": "пшениця", "sunflower": "соняшник", "rapeseed": "ріпак",
+                "barley": "ячмінь", "soya": "соя", "peas": "горох",
+                "vegetable": "овочевий", "canola": "канола",
+                "sugar beet": "цукровий буряк"}
+
+NAME_PARTS = ["АГРО", "ЗЕРНО", "ТРЕЙД", "СВІТАНОК", "ПОДІЛЛЯ", "ЕЛЕВАТОР",
+              "ХЛІБ", "НИВА", "СТЕП", "ПРОМ", "ІНВЕСТ", "ЕКСПОРТ", "ДНІПРО",
+              "ЛАН", "КОЛОС", "ГРУП", "ОЛІЯ", "ПІВДЕНЬ"]
+LEGAL_FORMS = ["ТОВ", "ПРАТ", "ФГ", "ТОВАРИСТВО З ОБМЕЖЕНОЮ ВІДПОВІДАЛЬНІСТЮ"]
+
+
+def known_shippers():
+    """
+    Get the subsidiary names of the known companies in names.json, so some
+    synthetic shippers are standardized to parent companies.
+
+    Returns (lst): list of shipper names.
+    """
+    with open(os.path.join(ROOT_PATH, "names.json"), encoding="utf-8") as f:
+        known = json.load(f)["KNOWN_COMPANIES"]
+
+    return [name for names in known.values() for name in names]
+
+
+def shipper_names(n_companies, rng):
+    """
+    Generate Ukrainian shipper names: known subsidiaries and random companies.
+
+    Inputs:
+        n_companies (int): number of random companies
+        rng (Generator): random number generator.
+
+    Returns (lst): list of shipper names.
+    """
+    names = [f"{rng.choice(LEGAL_FORMS)} {rng.choice(NAME_PARTS)} "
+             f"{rng.choice(NAME_PARTS)} {i}" for i in range(n_companies)]
+
+    return known_shippers() + names
+
+
+def random_dates(n_rows, rng):
+    """
+    Generate dates between August 2022 and March 2023.
+
+    Inputs:
+        n_rows (int): number of dates
+        rng (Generator): random number generator.
+
+    Returns (DatetimeIndex): dates.
+    """
+    days = rng.integers(0, N_DAYS, n_rows)
+
+    return pd.Timestamp(START_DATE) + pd.to_timedelta(days, unit="D")
+
+
+def generate_ig(n_rows, countries, rng):
+    """
+    Generate an Import Genius export file.
+
+    Inputs:
+        n_rows (int): number of shipments
+        countries (str): either 'asia', 'spain' or 'belgium'
+        rng (Generator): random number generator.
+
+    Returns (DataFrame): raw IG data.
+    """
+    shippers = shipper_names(max(n_rows // 200, 20), rng)
+    # A few shippers send most shipments
+    weights = 1 / np.arange(1, len(shippers) + 1)
+    products = rng.integers(0, len(PRODUCTS), n_rows)
+
+    return pd.DataFrame({
+        "EXPORT DATE": random_dates(n_rows, rng).strftime("%Y-%m-%d"),
+        "HS CODE": [PRODUCTS[i][1] for i in products],
+        "SHIPPER": rng.choice(shippers, n_rows, p=weights / weights.sum()),
+        "DESTINATION COUNTRY": rng.choice(IG_COUNTRIES[countries], n_rows),
+        "PRODUCT": [PRODUCTS[i][0] for i in products],
+        "WEIGHT KG": rng.lognormal(11, 1.5, n_rows).round(1),
+        "UNIT": "KG",
+    })
+
+
+def generate_bsgi(n_rows, rng):
+    """
+    Generate the Black Sea Grain Initiative outbound voyages file.
+
+    Inputs:
+        n_rows (int): number of voyages
+        rng (Generator): random number generator.
+
+    Returns (DataFrame): raw BSGI data.
+    """
+    tons = rng.integers(1000, 90000, n_rows)
+
+    return pd.DataFrame({
+        "Status": "Outbound",
+        "Vessel name": [f"VESSEL {i}" for i in range(n_rows)],
+        "Departure port": rng.choice(["Odesa", "Chornomorsk", "Yuzhny/Pivdennyi"],
+                                     n_rows),
+        "Country": rng.choice(BSGI_COUNTRIES, n_rows),
+        "Commodity": rng.choice(BSGI_COMMODITIES, n_rows),
+        "Metric tons": [f"{t:,}" for t in tons],
+        "Departure date": random_dates(n_rows, rng).strftime("%Y-%m-%d"),
+        "Income group": rng.choice(["High income", "Upper middle income",
+                                    "Lower middle income"], n_rows),
+    })
+
+
+def generate_panjiva(n_rows, rng):
+    """
+    Generate a Panjiva shipments file.
+
+    Inputs:
+        n_rows (int): number of shipments
+        rng (Generator): random number generator.
+
+    Returns (DataFrame): raw Panjiva data.
+    """
+    products = rng.integers(0, len(PRODUCTS), n_rows)
+    countries = [country.title() for country in TRANSLATIONS][:10]
+
+    return pd.DataFrame({
+        "Date": random_dates(n_rows, rng),
+        "Shipment Destination": rng.choice(countries, n_rows),
+        "Shipment Origin": rng.choice(["Ukraine", "Ukraine", "Ukraine", "Moldova"],
+                                      n_rows),
+        "Goods Shipped": [PRODUCTS[i][0] for i in products],
+        "Weight (kg)": rng.lognormal(11, 1.5, n_rows).round(1),
+        "HS Code": [PRODUCTS[i][1] for i in products],
+        "Shipper": rng.choice(shipper_names(50, rng), n_rows),
+        "Consignee": rng.choice([f"CONSIGNEE {i}" for i in range(100)], n_rows),
+    })
+
+
+def generate_deals(n_rows, rng):
+    """
+    Generate the Land Matrix deals file. Parent companies are the known
+    companies of names.json with their deal ids.
+
+    Inputs:
+        n_rows (int): number of deals
+        rng (Generator): random number generator.
+
+    Returns (DataFrame): raw Land Matrix deals data.
+    """
+    with open(os.path.join(ROOT_PATH, "names.json"), encoding="utf-8") as f:
+        parents = list(json.load(f)["KNOWN_COMPANIES"])
+
+    parent = rng.integers(0, len(parents), n_rows)
+    operating = [f"{rng.choice(NAME_PARTS).title()} {rng.choice(NAME_PARTS).title()}"
+                 for _ in range(n_rows)]
+
+    return pd.DataFrame({
+        "Deal ID": np.arange(1, n_rows + 1),
+        "Target country": rng.choice(["Ukraine", "Ukraine", "Ukraine", "Romania"],
+                                     n_rows),
+        "Top parent companies": [f"{parents[i]} #{i + 1}#" for i in parent],
+        "Operating company: Name": operating,
+        "Deal size": rng.integers(100, 100000, n_rows),
+    })
+
+
+def write_dataset(root, n_rows, seed=0):
+    """
+    Write every raw data file the pipeline reads under 'root', with the same
+    layout as the project's data folders.
+
+    Inputs:
+        root (str): project root directory to write the data in
+        n_rows (int): number of IG shipments per country file. BSGI, Panjiva
+            and Land Matrix files are smaller, like in the real data
+        seed (int): random seed. Default is 0.
+
+    Returns: None.
+    """
+    rng = np.random.default_rng(seed)
+    ig_dir = os.path.join(root, "data", "raw", "ig")
+    deals_dir = os.path.join(root, "data", "raw", "land_matrix")
+    bsgi_dir = os.path.join(root, "data", "bsgi")
+    panjiva_dir = os.path.join(root, "data", "panjiva")
+    clean_dir = os.path.join(root, "data", "clean")
+    for directory in [ig_dir, deals_dir, bsgi_dir, panjiva_dir, clean_dir]:
+        os.makedirs(directory, exist_ok=True)
+
+    for countries in IG_COUNTRIES:
+        generate_ig(n_rows, countries, rng).to_csv(
+            os.path.join(ig_dir, f"ig_{countries}_22-23.csv"), index=False)
+    generate_bsgi(max(n_rows // 20, 100), rng).to_csv(
+        os.path.join(bsgi_dir, "bsgi_outbound.csv"), index=False)
+    generate_deals(max(n_rows // 100, 200), rng).to_csv(
+        os.path.join(deals_dir, "deals.csv"), sep=";", index=False)
+
+    # Panjiva exports come as Excel files of at most 10,000 rows per company
+    n_panjiva = max(n_rows // 10, 100)
+    for i, start in enumerate(range(0, n_panjiva, 10000)):
+        size = min(10000, n_panjiva - start)
+        generate_panjiva(size, rng).to_excel(
+            os.path.join(panjiva_dir, f"panjiva_company{i}_1.xlsx"), index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write synthetic IG, BSGI, Panjiva and Land Matrix files")
+    parser.add_argument("root", help="project root to write the data folders in")
+    parser.add_argument("--rows", type=int, default=10000,
+                        help="IG shipments per country file")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    write_dataset(args.root, args.rows, args.seed)
+    print(f"Synthetic data with {args.rows} IG rows per file written to "
+          f"{os.path.join(args.root, 'data')}")
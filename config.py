@@ -8,11 +8,94 @@ ROOT_PATH = os.path.dirname(os.path.realpath(__file__))
 RAW_FILES_PATH = os.path.join(ROOT_PATH, "data/raw")
 CLEAN_FILES_PATH = os.path.join(ROOT_PATH, "data/clean")
 IG_FILES_PATH = os.path.join(RAW_FILES_PATH, "ig")
+CACHE_PATH = os.path.join(ROOT_PATH, "data/cache")
+NAMES_PATH = os.path.join(ROOT_PATH, "names.json")
+DEALS_PATH = os.path.join(RAW_FILES_PATH, "land_matrix/deals.csv")
+OUTPUT_PATH = os.path.join(ROOT_PATH, "output")
 
 COUNTRY_FILES = {"asia": "ig_asia_22-23.csv", "spain": "ig_spain_22-23.csv",
                  "belgium": "ig_belgium_22-23.csv"}
 CLEAN_FILES = {"asia": "ig_clean_asia.csv", "spain": "ig_clean_spain.csv",
                  "belgium": "ig_clean_belgium.csv"}
+CLEAN_COLUMNAR_FILES = {"asia": "ig_clean_asia.parquet",
+                        "spain": "ig_clean_spain.parquet",
+                        "belgium": "ig_clean_belgium.parquet"}
+
+# Bump when the cleaning code changes so cached clean files are rebuilt
+CLEAN_CACHE_VERSION = 2
+# Memoized outputs of the pipeline stages (see utils/stage_graph.py)
+STAGE_CACHE_PATH = os.path.join(CACHE_PATH, "stages")
+
+## STAGE INSTRUMENTATION ##
+
+# Measurements of every pipeline stage (JSON lines) and cProfile files of
+# runs with --profile
+STAGE_LOG_PATH = os.path.join(ROOT_PATH, "data/logs/stages.jsonl")
+PROFILE_PATH = os.path.join(ROOT_PATH, "data/logs/profiles")
+
+## READ SCHEMAS ##
+
+# Columns to load for each data source with their dtypes (None lets the date
+# parser handle the column) and the exact format of date columns. Columns are
+# identified by their standardized name (lowercase, words joined by "_") so
+# small differences in the raw headers (e.g. "WEIGHT (KG)") don't matter.
+# Declared columns that aren't in a file are skipped.
+READ_SCHEMAS = {
+    "ig": {
+        "columns": {"export_date": None, "hs_code": "str",
+                    "shipper": "category", "destination_country": "category",
+                    "product": "string[pyarrow]", "weight_kg": "float64",
+                    "unit": "category", "weight_unit": "category",
+                    "quantity_unit": "category"},
+        "dates": {"export_date": "%Y-%m-%d"},
+    },
+    "bsgi": {
+        "columns": {"departure_date": None, "metric_tons": "float64",
+                    "commodity": "category", "country": "category",
+                    "vessel_name": "str", "departure_port": "category",
+                    "income_group": "category",
+                    "development_category": "category"},
+        "dates": {"departure_date": "%Y-%m-%d"},
+    },
+    "panjiva": {
+        "columns": {"date": None, "shipment_destination": "category",
+                    "shipment_origin": "category",
+                    "goods_shipped": "string[pyarrow]",
+                    "weight_kg": "float64", "hs_code": "str",
+                    "shipper": "category", "consignee": "category"},
+        "dates": {"date": None},
+    },
+}
+
+## TRANSLATION CACHE ##
+
+TRANSLATION_CACHE_PATH = os.path.join(CACHE_PATH, "translations.sqlite")
+TRANSLATION_CACHE_MAX_ENTRIES = 100000
+TRANSLATION_CACHE_MAX_AGE_DAYS = 365
+TRANSLATION_BATCH_SIZE = 25
+TRANSLATION_MAX_WORKERS = 8
+TRANSLATION_RATE_LIMIT = 10  # requests per second
+TRANSLATION_MAX_RETRIES = 3
+TRANSLATION_BACKOFF = 1  # seconds before first retry
+
+## RECORD LINKAGE ##
+
+# Candidate pairs are refused (or the blocking tightened) when their index and
+# comparison features would need more memory than this
+RL_MEMORY_BUDGET_MB = 1024
+RL_PAIR_BYTES = 16  # two int64 row labels per candidate pair
+RL_FEATURE_BYTES = 8  # one float64 per compared variable and pair
+RL_MAX_WORKERS = None  # processes comparing blocks (None uses every CPU)
+RL_STRING_THRESHOLD = 0.9  # minimum Jaro Winkler similarity of matching strings
+RL_WEIGHT_VAR = "weight_ton"  # weight compared when scoring one-to-one matches
+# Components of candidate matches with at most this many cells (rows of the
+# first dataset x rows of the second) are solved as a dense assignment; larger
+# ones as a sparse matching, so memory grows with the candidates, not the cells
+RL_DENSE_ASSIGNMENT_CELLS = 250000
+# Stored matches of incremental record linkage runs. Bump the version when the
+# comparison code changes so stored matches are recomputed
+RL_STORE_PATH = os.path.join(CACHE_PATH, "linkage")
+RL_STORE_VERSION = 1
 
 ## CONSTANTS FOR FILTERING DATA ##
 
@@ -20,6 +103,24 @@ PRODUCTS_VAL = ["corn", "soya", "sunflower", "wheat", "sunflower", "barley",
                 "peas", "rapeseed", "sunflower", "vegetable", "soya", "canola",
                 "rapeseed", "sunflower", "mixed", "wheat", "sugar beet"]
 
+# Offline multilingual crop lexicon used to flag which crops are mentioned in
+# a product description. Values are regular expressions matched against the
+# lowercase description: English (Panjiva), Ukrainian (Import Genius) and
+# Russian stems so inflected forms (e.g. "соняшникова", "ячменю") also match.
+CROP_LEXICON = {
+    "corn": ["corn", "maize", "кукурудз", "кукуруз"],
+    "soya": ["soy", r"\bсо(?:я|ї|ю|єю)\b", r"\bсоєв", r"\bсоев"],
+    "sunflower": ["sunflower", "соняшн", "подсолн"],
+    "wheat": ["wheat", "пшениц", "пшенич"],
+    "barley": ["barley", "ячмін", "ячмен"],
+    "peas": ["peas", "горох"],
+    "rapeseed": ["rapeseed", "rape seed", "ріпак", "рапс"],
+    "vegetable": ["vegetable", "рослинн", "овоч", "растительн"],
+    "canola": ["canola", "канол"],
+    "mixed": ["mixed", "змішан", "суміш", "смешан", "смесь"],
+    "sugar beet": ["sugar beet", "beet pulp", "буряк", r"\bжом", "свекл", "свёкл"],
+}
+
 CROP_DICT =  {'Rapeseed': 'rapeseed', 'Corn': 'corn',
               'Sunflower meal': 'sunflower', 'Wheat': 'wheat',
               'Sunflower oil': 'sunflower', 'Soya beans': 'soya',
@@ -44,6 +145,12 @@ HS_BSGI = {"1205": "Rapeseed", "1514": "Canola",
            "1507": "Soya oil", "1003":  "Barley", "0713": "Peas",
            "1516": "Vegetable oil", "2302": "Sugar beet pellets"}
 
+# 6-digit subheadings that refine the 4-digit BSGI headings above
+HS_BSGI_6 = {"230630": "Sunflower meal", "230641": "Rapeseed meal",
+             "230649": "Rapeseed meal", "230230": "Wheat bran pellets"}
+
+HS_NOT_BSGI = "Not in BSGI"
+
 SUBSIDIARY_DICT = {"enselcoagro": "Kernel Holding", "mhp": "MHP",
                    "khmilnytske": "Astarta Holding",
                    "slobozhanschynaagro": "Industrial Milk \nCompany (IMC)",
@@ -60,4 +167,30 @@ SUBSIDIARY_DICT = {"enselcoagro": "Kernel Holding", "mhp": "MHP",
                    "agroprosperis": "NHC Capital",
                    "druzhbanova": "Kernel Holding",
                    "astarta": "Astarta Holding",
-                   "agroprogress": "Industrial Milk \nCompany (IMC)"}
\ No newline at end of file
+                   "agroprogress": "Industrial Milk \nCompany (IMC)"}
+## CLEAN DATA TYPES ##
+
+CLEAN_IG_DTYPES = {"date": "datetime64[ns]", "year": "int64", "month": "int64",
+                   "weight_kg": "float64", "weight_ton": "float64",
+                   "n_products": "int64", "country": "category",
+                   "shipper": "category", "shipper_low": "category",
+                   "company_std": "category", "bsgi_commodity": "category",
+                   "hs_crop": "category",
+                   "product": "string[pyarrow]"}
+CLEAN_IG_DTYPES.update({crop: "bool" for crop in CROP_LEXICON})
+
+## EXPORT CUBE ##
+
+# Monthly aggregates of clean IG data that tables and charts read instead of
+# the row-level files (see utils/cube.py). Rows are keyed on the month
+# ("period"), these columns and the crop flags
+CUBE_FILES = {"asia": "ig_cube_asia.parquet", "spain": "ig_cube_spain.parquet",
+              "belgium": "ig_cube_belgium.parquet"}
+CUBE_DIMENSIONS = ["country", "company_std", "bsgi_commodity"] + list(CROP_LEXICON)
+CUBE_MEASURES = ["weight_kg", "weight_ton", "n_shipments"]
+
+## CHART RENDERING ##
+
+# Worker processes that render charts in batch mode (see utils/render.py).
+# None uses one per CPU
+RENDER_MAX_WORKERS = None
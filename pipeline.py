@@ -9,75 +9,624 @@ from utils.clean_data import (
     generate_path,
     clean_data,
     correct_name,
-    create_subsidiary_dict,
+    crop_pattern,
+    map_values,
+    prepare_raw,
+    rename_columns,
+    derive_columns,
 )
+from utils.get_data import get_data
+from utils.hs_codes import classify_hs
+from utils.aho_corasick import Automaton
+from utils.subsidiaries import load_subsidiary_dict
+from utils.stage_graph import Stage, StageGraph
+from utils.lazy_clean import clean_ig_lazy
+from utils.cube import build_cube, merge_cubes, write_cube, cube_path
 from utils.transform_data import standard_company_name
+from utils.translate import get_cache, translate_many
+from utils import instrument
+from utils.instrument import stage
+from utils.cache import (
+    ChunkedColumnarWriter,
+    file_hash,
+    object_hash,
+    is_fresh,
+    read_columnar,
+    write_columnar,
+    write_manifest,
+)
 import os
+import sys
+import time
 import argparse
 import json
-from config import CLEAN_FILES_PATH
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config import (
+    COUNTRY_FILES,
+    CLEAN_FILES_PATH,
+    CLEAN_COLUMNAR_FILES,
+    CLEAN_CACHE_VERSION,
+    CLEAN_IG_DTYPES,
+    NAMES_PATH,
+    DEALS_PATH,
+    STAGE_LOG_PATH,
+    PROFILE_PATH,
+    PRODUCTS_VAL,
+    CROP_LEXICON,
+    CROP_DICT,
+    HS_DICT,
+    HS_BSGI,
+    HS_BSGI_6,
+    HS_NOT_BSGI,
+)
 
-f = open("names.json")  # works when running python pipeline.py command
-data = json.load(f)
+with open(NAMES_PATH, encoding="utf-8") as f:
+    data = json.load(f)
 ASIA_NAME_DICT = data["ASIA_NAME_DICT"]
 SPAIN_NAME_DICT = data["SPAIN_NAME_DICT"]
 BELGIUM_NAME_DICT = data["BELGIUM_NAME_DICT"]
+NAME_DICTS = {
+    "asia": ASIA_NAME_DICT,
+    "spain": SPAIN_NAME_DICT,
+    "belgium": BELGIUM_NAME_DICT,
+}
+
+
+def ig_manifest(countries):
+    """
+    Create manifest with the hashes of every input of the clean Import Genius
+    data: raw file, names.json, Land Matrix deals.csv and config constants.
+
+    Inputs:
+        countries (str): countries which we want the manifest for. It can be
+            either 'asia', 'spain' or 'belgium'.
+
+    Returns (dict): manifest.
+    """
+    return {
+        "version": CLEAN_CACHE_VERSION,
+        "raw_file": file_hash(generate_path(countries)),
+        "names": file_hash(NAMES_PATH),
+        "deals": file_hash(DEALS_PATH),
+        "config": object_hash(
+            [PRODUCTS_VAL, CROP_LEXICON, CROP_DICT, HS_DICT, HS_BSGI, HS_BSGI_6]
+        ),
+    }
+
+
+def read_ig(countries):
+    """
+    Read the raw Import Genius file of specific countries.
+
+    Inputs:
+        countries (str): either 'asia', 'spain' or 'belgium'.
+
+    Returns (DataFrame): raw IG data.
+    """
+    return prepare_raw(get_data(generate_path(countries), "ig"), "ig")
+
+
+def rename_ig(ig):
+    """
+    Standardize the column names of raw Import Genius data.
+
+    Inputs:
+        ig (DataFrame): raw IG data.
+
+    Returns (DataFrame): IG data with renamed columns.
+    """
+    return rename_columns(ig, "ig")
+
+
+def derive_ig(ig):
+    """
+    Create the new columns (dates, weight in tons, BSGI commodity and crop
+    flags) of Import Genius data and turn text columns to lowercase.
+
+    Inputs:
+        ig (DataFrame): IG data with renamed columns.
+
+    Returns (DataFrame): clean IG data (the same dataframe, changed in place).
+    """
+    derive_columns(ig, "ig")
+
+    return ig
+
+
+def correct_country(ig, countries):
+    """
+    Standardize the destination country names of clean Import Genius data.
+
+    Inputs:
+        ig (DataFrame): clean IG data
+        countries (str): either 'asia', 'spain' or 'belgium'.
+
+    Returns (DataFrame): IG data (the same dataframe, changed in place).
+    """
+    ig["country"] = correct_name(ig["country"], NAME_DICTS[countries])
+
+    return ig
 
 
-def clean_ig_by_country(countries, save=True):
+def filter_bsgi(ig):
     """
-    Get Import Genius (IG) data for specific countries.
+    Keep Import Genius shipments of commodities included in BSGI.
+
+    Inputs:
+        ig (DataFrame): clean IG data.
+
+    Returns (DataFrame): filtered IG data with a new index (0 to n - 1), the
+        same index the memoized stage outputs and the cached clean data have
+        when they're loaded from Parquet.
+    """
+    ig_c = ig[ig["bsgi_commodity"] != HS_NOT_BSGI].reset_index(drop=True)
+    for col in ["country", "bsgi_commodity", "hs_crop"]:
+        ig_c[col] = ig_c[col].cat.remove_unused_categories()
+
+    return ig_c
+
+
+def standardize_companies(ig_c, subsidiaries_dict):
+    """
+    Add lowercase shipper names and standardized company names (parent
+    companies) to Import Genius data.
+
+    Inputs:
+        ig_c (DataFrame): filtered IG data
+        subsidiaries_dict (dict): dictionary with parent companies as keys and
+            subsidiaries as values.
+
+    Returns (DataFrame): IG data with "shipper_low" and "company_std" columns
+        (the same dataframe, changed in place).
+    """
+    ig_c["shipper_low"] = map_values(ig_c["shipper"], str.lower)
+    ig_c["company_std"] = standard_company_name(ig_c["shipper_low"], subsidiaries_dict)
+
+    return ig_c
+
+
+def export_ig(ig_c, countries):
+    """
+    Save clean Import Genius data as .csv and Parquet files in "data/clean",
+    with its monthly export cube (see utils/cube.py) and the manifest of its
+    inputs.
+
+    Inputs:
+        ig_c (DataFrame): clean and standardized IG data
+        countries (str): either 'asia', 'spain' or 'belgium'.
+
+    Returns (DataFrame): the same IG data.
+    """
+    file_name = f"ig_clean_{countries}.csv"
+    columnar_path = os.path.join(CLEAN_FILES_PATH, CLEAN_COLUMNAR_FILES[countries])
+    ig_c.to_csv(os.path.join(CLEAN_FILES_PATH, file_name), index=False)
+    write_columnar(ig_c, columnar_path, CLEAN_IG_DTYPES)
+    with stage("cube", rows_in=ig_c, country=countries) as record:
+        cube = build_cube(ig_c)
+        write_cube(cube, countries)
+        record["rows_out"] = cube
+    write_manifest(columnar_path + ".json", ig_manifest(countries))
+    print(f"Saved clean data. Check data/clean/{file_name}")
+
+    return ig_c
+
+
+IG_STAGES = ["read", "rename", "derive", "correct_country", "filter",
+             "subsidiary_dict", "standardize", "export"]
+
+
+def ig_stage_graph(countries, n_parent_companies=25, n_subsidiaries=20):
+    """
+    Build the stage graph that cleans Import Genius data for specific
+    countries. Every stage output but the export is memoized in
+    data/cache/stages, so only stages whose code or inputs changed run again.
+
+    Inputs:
+        countries (str): either 'asia', 'spain' or 'belgium'
+        n_parent_companies (int): top 'n' parent companies from Land Matrix
+        n_subsidiaries (int): top 'n' subsidiaries per parent company.
+
+    Returns (StageGraph): stage graph with the stages in IG_STAGES.
+    """
+    config = [PRODUCTS_VAL, CROP_LEXICON, CROP_DICT, HS_DICT, HS_BSGI, HS_BSGI_6]
+    stages = [
+        Stage("read", read_ig, params={"countries": countries},
+              depends={"raw_file": file_hash(generate_path(countries))},
+              code=[prepare_raw, get_data]),
+        Stage("rename", rename_ig, ["read"], code=[rename_columns]),
+        Stage("derive", derive_ig, ["rename"],
+              depends={"config": object_hash(config)},
+              code=[derive_columns, classify_hs, translate_many]),
+        Stage("correct_country", correct_country, ["derive"],
+              params={"countries": countries},
+              depends={"names": object_hash(NAME_DICTS[countries])},
+              code=[correct_name]),
+        Stage("filter", filter_bsgi, ["correct_country"]),
+        # The dictionary has its own cached artifact (see utils/subsidiaries.py)
+        Stage("subsidiary_dict", load_subsidiary_dict,
+              params={"n_parent_companies": n_parent_companies,
+                      "n_subsidiaries": n_subsidiaries},
+              keyed_by_output=True),
+        Stage("standardize", standardize_companies, ["filter", "subsidiary_dict"],
+              code=[map_values, standard_company_name, Automaton]),
+        Stage("export", export_ig, ["standardize"], params={"countries": countries},
+              store=False),
+    ]
+
+    return StageGraph(stages, f"ig_{countries}", fields={"country": countries})
+
+
+def clean_ig_polars(countries, subsidiaries_dict):
+    """
+    Clean, filter and standardize Import Genius data with the lazy Polars
+    backend (see utils/lazy_clean.py). The result is the same as the output
+    of the 'standardize' stage of the pandas backend.
+
+    Inputs:
+        countries (str): either 'asia', 'spain' or 'belgium'
+        subsidiaries_dict (dict): dictionary with parent companies as keys and
+            subsidiaries as values.
+
+    Returns (DataFrame): filtered Import Genius data with "company_std" column.
+    """
+    with stage("clean_lazy", country=countries) as record:
+        ig_c = clean_ig_lazy(generate_path(countries), NAME_DICTS[countries])
+        record["rows_out"] = ig_c
+
+    with stage("standardize", rows_in=ig_c, country=countries) as record:
+        ig_c = standardize_companies(ig_c, subsidiaries_dict)
+        record["rows_out"] = ig_c
+
+    return ig_c
+
+
+def clean_ig_by_country(countries, save=True, force=False, subsidiaries_dict=None,
+                        rerun_from=None, backend="pandas"):
+    """
+    Get Import Genius (IG) data for specific countries. If the inputs didn't
+    change since the last saved run, the cached clean Parquet file is loaded
+    instead of cleaning the data again. Otherwise the IG stage graph runs
+    (see 'ig_stage_graph'): stages whose code and inputs didn't change are
+    loaded from their memoized outputs.
 
     Inputs:
         countries (str): countries which we want the path for. It can be either
             'asia', 'spain' or 'belgium'.
+        save (bool): save clean data as .csv and Parquet files. Default is True
+        force (bool): run every stage even if its output is memoized (the
+            subsidiary dictionary is still loaded from its artifact). Default
+            is False
+        subsidiaries_dict (dict): dictionary with parent companies as keys and
+            subsidiaries as values. If None, it's loaded from its cached
+            artifact (built from Land Matrix data if needed)
+        rerun_from (str): run this stage (see IG_STAGES) and every stage after
+            it even if their outputs are memoized. Default is None
+        backend (str): "pandas" (default) runs the stage graph and "polars"
+            the lazy Polars query, without memoized stages.
 
     Returns (DataFrame): table with filtered Import Genius data.
     """
-    path = generate_path(countries)
-    ig = clean_data("ig", path)
+    manifest = ig_manifest(countries)
+    columnar_path = os.path.join(CLEAN_FILES_PATH, CLEAN_COLUMNAR_FILES[countries])
+    manifest_path = columnar_path + ".json"
+
+    if force:
+        rerun_from = "read"
+    if rerun_from is None and is_fresh(manifest_path, manifest, columnar_path):
+        print(f"Inputs unchanged. Loading cached clean data for {countries}")
+        ig_c = read_columnar(columnar_path)
+        # Clean data saved before the export cube existed
+        if save and not os.path.exists(cube_path(countries)):
+            write_cube(build_cube(ig_c), countries)
+        return ig_c
 
-    if countries == "asia":
-        country_name_dict = ASIA_NAME_DICT
-    elif countries == "spain":
-        country_name_dict = SPAIN_NAME_DICT
-    elif countries == "belgium":
-        country_name_dict = BELGIUM_NAME_DICT
+    if backend == "polars":
+        if subsidiaries_dict is None:
+            subsidiaries_dict = load_subsidiary_dict(25, 20)
+        print(f"Cleaning Import Genius data for {countries} with Polars")
+        ig_c = clean_ig_polars(countries, subsidiaries_dict)
+        if save:
+            with stage("export", rows_in=ig_c, country=countries):
+                export_ig(ig_c, countries)
+        return ig_c
+
+    graph = ig_stage_graph(countries)
+    if subsidiaries_dict is not None:
+        graph.provide("subsidiary_dict", subsidiaries_dict)
 
     print(f"Cleaning Import Genius data for {countries}")
+    return graph.run("export" if save else "standardize", rerun_from=rerun_from)
+
 
+def standardize_ig(ig, countries, subsidiaries_dict):
+    """
+    Standardize country names, keep crops included in BSGI and standardize
+    company names of clean Import Genius data. It works on the whole data or
+    on a chunk of it.
+
+    Inputs:
+        ig (DataFrame): clean Import Genius data
+        countries (str): either 'asia', 'spain' or 'belgium'
+        subsidiaries_dict (dict): dictionary with parent companies as keys and
+            subsidiaries as values.
+
+    Returns (DataFrame): filtered Import Genius data with "company_std" column.
+    """
     # We standardize the "country" values in the IG dataset
-    print(f"Filtering Import Genius data...")
-    ig["country"] = correct_name(ig["country"], country_name_dict)
+    with stage("correct_country", rows_in=ig, country=countries) as record:
+        ig = correct_country(ig, countries)
+        record["rows_out"] = ig
 
     # We only keep crops that are included both in IG and BSGI
-    ig = ig[ig["bsgi_commodity"] != "Not in BSGI"]
+    with stage("filter", rows_in=ig, country=countries) as record:
+        ig_c = filter_bsgi(ig)
+        record["rows_out"] = ig_c
 
-    subsidiaries_dict = create_subsidiary_dict(25, 20, ig)
-    ig_c = ig.copy()
-    print(f"Standardizing company names...")
-    ig_c["company_std"] = standard_company_name(ig["shipper_low"], subsidiaries_dict)
-
-    # Save clean IG dataset in "/data" directory
-    if save:
-        file_name = f"ig_clean_{countries}.csv"
-        export_path = os.path.join(CLEAN_FILES_PATH, file_name)
-        ig_c.to_csv(export_path, index=False)
-        print(f"Saved clean data. Check data/clean/{file_name}")
+    with stage("standardize", rows_in=ig_c, country=countries) as record:
+        ig_c = standardize_companies(ig_c, subsidiaries_dict)
+        record["rows_out"] = ig_c
 
     return ig_c
 
 
+def clean_ig_streaming(countries, chunksize, subsidiaries_dict=None):
+    """
+    Clean Import Genius data for specific countries reading the raw file in
+    chunks. Each chunk is cleaned, filtered, standardized and appended to the
+    clean .csv and Parquet files as soon as it's done, so peak memory depends
+    on 'chunksize' and not on the size of the file. The export cube is built
+    from the cubes of the chunks.
+
+    Inputs:
+        countries (str): either 'asia', 'spain' or 'belgium'
+        chunksize (int): number of raw rows per chunk
+        subsidiaries_dict (dict): dictionary with parent companies as keys and
+            subsidiaries as values. If None, it's loaded from its cached
+            artifact.
+
+    Returns (int): number of rows of the clean data.
+    """
+    manifest = ig_manifest(countries)
+    columnar_path = os.path.join(CLEAN_FILES_PATH, CLEAN_COLUMNAR_FILES[countries])
+    manifest_path = columnar_path + ".json"
+    file_name = f"ig_clean_{countries}.csv"
+    export_path = os.path.join(CLEAN_FILES_PATH, file_name)
+
+    if subsidiaries_dict is None:
+        with stage("subsidiary_dict") as record:
+            subsidiaries_dict = load_subsidiary_dict(25, 20)
+            record["rows_out"] = subsidiaries_dict
+
+    # The manifest is written again only if every chunk is saved, so a failed
+    # run never leaves a partial file that looks up to date
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    print(f"Cleaning Import Genius data for {countries} in chunks of {chunksize} rows")
+    chunks = clean_data("ig", generate_path(countries), chunksize=chunksize)
+    cubes = []
+    with stage("clean_streaming", country=countries) as record, \
+            ChunkedColumnarWriter(columnar_path, CLEAN_IG_DTYPES) as writer:
+        for i, chunk in enumerate(chunks):
+            ig_c = standardize_ig(chunk, countries, subsidiaries_dict)
+            ig_c.to_csv(export_path, mode="w" if i == 0 else "a",
+                        header=i == 0, index=False)
+            writer.write(ig_c)
+            cubes.append(build_cube(ig_c))
+        record["rows_out"] = writer.rows
+
+    # Cubes of the chunks are small and additive, so they're merged at the end
+    with stage("cube", rows_in=len(cubes), country=countries) as record:
+        cube = merge_cubes(cubes)
+        write_cube(cube, countries)
+        record["rows_out"] = cube
+
+    write_manifest(manifest_path, manifest)
+    print(f"Saved clean data ({writer.rows} rows). Check data/clean/{file_name}")
+
+    return writer.rows
+
+
+def build_shared_artifacts(n_parent_companies=25, n_subsidiaries=20):
+    """
+    Build the artifacts every country shares once, before cleaning countries
+    in parallel: subsidiary dictionary and compiled crop lexicon (country
+    name dictionaries are loaded when the module is imported).
+
+    Inputs:
+        n_parent_companies (int): top 'n' parent companies from Land Matrix
+        n_subsidiaries (int): top 'n' subsidiaries per parent company.
+
+    Returns (dict): dictionary with the subsidiary dictionary.
+    """
+    print("Building shared artifacts...")
+    crop_pattern()
+    with stage("subsidiary_dict") as record:
+        subsidiaries_dict = load_subsidiary_dict(n_parent_companies, n_subsidiaries)
+        record["rows_out"] = subsidiaries_dict
+
+    return {"subsidiaries": subsidiaries_dict}
+
+
+def clean_country_worker(countries, subsidiaries_dict, force=False, chunksize=None,
+                         instrument_settings=None, rerun_from=None,
+                         backend="pandas"):
+    """
+    Clean Import Genius data for one country in a worker process.
+
+    Inputs:
+        countries (str): either 'asia', 'spain' or 'belgium'
+        subsidiaries_dict (dict): shared subsidiary dictionary
+        force (bool): clean the data even if the cached file is up to date
+        chunksize (int): if passed, stream the raw file in chunks of this many
+            rows
+        instrument_settings (dict): stage log and profile settings of the
+            parent process (see 'instrument.settings')
+        rerun_from (str): run this stage and every stage after it even if
+            their outputs are memoized
+        backend (str): either "pandas" or "polars".
+
+    Returns (tuple): number of rows of the clean data, seconds it took and
+        the records of its stages.
+    """
+    if instrument_settings is not None:
+        instrument.configure(**instrument_settings)
+    instrument.reset()
+
+    start = time.perf_counter()
+    if chunksize is not None:
+        rows = clean_ig_streaming(countries, chunksize, subsidiaries_dict)
+    else:
+        rows = len(clean_ig_by_country(countries, force=force,
+                                       subsidiaries_dict=subsidiaries_dict,
+                                       rerun_from=rerun_from, backend=backend))
+
+    return rows, time.perf_counter() - start, instrument.records()
+
+
+def run_countries(countries, force=False, max_workers=None, chunksize=None,
+                  rerun_from=None, backend="pandas"):
+    """
+    Clean Import Genius data for several countries. Shared artifacts are
+    built once and each country is cleaned in its own worker process.
+
+    Inputs:
+        countries (lst): list of countries, each either 'asia', 'spain' or
+            'belgium'
+        force (bool): clean the data even if the cached files are up to date
+        max_workers (int): maximum number of worker processes. Default is one
+            per country
+        chunksize (int): if passed, stream each raw file in chunks of this
+            many rows
+        rerun_from (str): run this stage and every stage after it even if
+            their outputs are memoized
+        backend (str): either "pandas" or "polars".
+
+    Returns (dict): dictionary with countries as keys and a dictionary with
+        "status", "rows", "seconds", "error" and "stages" (stage records)
+        as values.
+    """
+    artifacts = build_shared_artifacts()
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers or len(countries)) as pool:
+        futures = {
+            pool.submit(
+                clean_country_worker, country, artifacts["subsidiaries"], force,
+                chunksize, instrument.settings(), rerun_from, backend
+            ): country
+            for country in countries
+        }
+        for future in as_completed(futures):
+            country = futures[future]
+            try:
+                rows, seconds, stages = future.result()
+                results[country] = {"status": "ok", "rows": rows,
+                                    "seconds": seconds, "error": None,
+                                    "stages": stages}
+            except Exception as e:
+                results[country] = {"status": "failed", "rows": None,
+                                    "seconds": None, "error": repr(e),
+                                    "stages": []}
+                print(f"Cleaning {country} failed: {e!r}")
+
+    print("\ncountry     status   rows      seconds")
+    for country in countries:
+        r = results[country]
+        rows = "" if r["rows"] is None else r["rows"]
+        seconds = "" if r["seconds"] is None else f"{r['seconds']:.1f}"
+        print(f"{country:<11} {r['status']:<8} {rows:<9} {seconds}")
+
+    return results
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="My parser")
     parser.add_argument(
-        "country", type=str, help="Options are 'spain', 'belgium' and 'asia'"
+        "country",
+        type=str,
+        nargs="+",
+        help="Options are 'spain', 'belgium', 'asia' (one or more) or 'all'",
     )
     parser.add_argument(
         "--clean", type=bool, help="Cleans data and saves file by default", default=True
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Clean data even if the cached clean file is up to date",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use cached translations and fail if one is missing",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        help="Stream the raw file in chunks of this many rows (bounded memory)",
+        default=None,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of worker processes when cleaning several countries",
+        default=None,
+    )
+    parser.add_argument(
+        "--from-stage",
+        type=str,
+        choices=IG_STAGES,
+        help="Run this stage and every stage after it even if their memoized "
+             "outputs are up to date",
+        default=None,
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=["pandas", "polars"],
+        help="Clean data with pandas (memoized stages) or with a lazy Polars "
+             "query (needs the polars package)",
+        default="pandas",
+    )
+    parser.add_argument(
+        "--stage-log",
+        type=str,
+        help="JSON lines file where the measurements of every stage are appended",
+        default=STAGE_LOG_PATH,
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"Dump a cProfile (pstats) file per stage in {PROFILE_PATH}",
+    )
 
     args = parser.parse_args()
+    countries = list(COUNTRY_FILES) if args.country == ["all"] else args.country
+    for country in countries:
+        if country not in COUNTRY_FILES:
+            parser.error(f"Wrong country '{country}'. Use {list(COUNTRY_FILES)} or 'all'.")
+
+    if args.offline:
+        os.environ["TRANSLATION_OFFLINE"] = "1"
+
+    instrument.configure(args.stage_log, PROFILE_PATH if args.profile else None)
 
     if args.clean:
-        clean_ig_by_country(args.country)
+        if len(countries) == 1 and args.chunksize is not None:
+            clean_ig_streaming(countries[0], args.chunksize)
+            print(f"\n{instrument.summary_table()}")
+        elif len(countries) == 1:
+            clean_ig_by_country(countries[0], force=args.force,
+                                rerun_from=args.from_stage, backend=args.backend)
+            print(f"Translation cache: {get_cache().stats()}")
+            print(f"\n{instrument.summary_table()}")
+        else:
+            results = run_countries(countries, args.force, args.workers,
+                                    args.chunksize, args.from_stage, args.backend)
+            stages = instrument.records()
+            for country in countries:
+                stages += results[country]["stages"]
+            print(f"\n{instrument.summary_table(stages)}")
+            if any(r["status"] != "ok" for r in results.values()):
+                sys.exit(1)
@@ -0,0 +1,95 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Aho-Corasick multi-pattern matcher
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+from collections import deque
+
+
+class Automaton:
+    """
+    Aho-Corasick automaton to find every occurrence of many substrings in a
+    text with a single scan of the text. Patterns are added with 'add', the
+    automaton is compiled with 'build' and texts are scanned with 'find_all'.
+    """
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        self.patterns = []
+        self.built = False
+
+    def add(self, pattern, value=None):
+        """
+        Add a pattern to the automaton.
+
+        Inputs:
+            pattern (str): substring we want to find. Empty patterns are
+                ignored
+            value (any): value returned with the pattern when it's found.
+
+        Returns: None.
+        """
+        if not pattern:
+            return
+
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(len(self.patterns))
+        self.patterns.append((pattern, value))
+        self.built = False
+
+    def build(self):
+        """
+        Compute failure links (breadth first) so a text can be scanned once.
+
+        Returns (Automaton): the compiled automaton.
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[child] = self.goto[f].get(ch, 0)
+                # A node also outputs every pattern ending at its failure node
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+        self.built = True
+
+        return self
+
+    def find_all(self, text):
+        """
+        Find all patterns contained in 'text'.
+
+        Inputs:
+            text (str): text to scan.
+
+        Returns (lst): list of (pattern, value) tuples for every occurrence,
+            in the order their last character appears in the text.
+        """
+        if not self.built:
+            self.build()
+
+        found = []
+        node = 0
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for i in self.out[node]:
+                found.append(self.patterns[i])
+
+        return found
@@ -4,30 +4,64 @@
 # Last modified: 07/20/23
 # DSI
 
-import os
+import argparse
 import pandas as pd
-from utils.get_data import get_data
-from utils.clean_data import PRODUCTS_VAL
-from utils.plot import cargo_grouping, plot_line, plot_crops
+from utils.clean_data import PRODUCTS_VAL, clean_bsgi_by_country, standard_name
+from utils.cube import load_cube
+from utils.plot import plot_crops, plot_total_exports
+from utils.render import render_charts
+from config import OUTPUT_PATH, RENDER_MAX_WORKERS
 
 pd.set_option('display.float_format', lambda x: '%.4f' % x)
 
-# Import clean data
-ig = get_data("ig_kernel_10000.csv", "ig")
-bsgi = get_data("bsgi_outbound.csv", "bsgi")
 
-# Create graph image outputs and save them in "output" directory
-# Graph 1. Total volume of exports from Import Genius and BSGI
-ig_g = cargo_grouping(ig, ["year", "month"], ["weight_ton"], ["year", "month"], True)
-bsgi_g = cargo_grouping(bsgi, ["year", "month"], ["weight_ton"], ["year", "month"], True)
-ig_g["date"] = ig_g["month"].astype(str) + "/" + ig_g["year"].astype(str)
-bsgi_g["date"] = bsgi_g["month"].astype(str) + "/" + bsgi_g["year"].astype(str)
+def app_charts(country, company):
+    """
+    List the charts of the app: total exports of a company and BSGI, and the
+    same per crop. Each chart only gets the data it plots, so its key (see
+    'render.chart_key') changes only if that data changes.
 
-graph_1 = ig_g.merge(bsgi_g, on="date", suffixes=("_ig", "_bsgi"))
-plot_line(graph_1["date"], [graph_1["weight_ton_ig"], graph_1["weight_ton_bsgi"]], ["Kernel", "Black Sea Grain Initiative"], "BSGI and Kernel volume of exports", "Export date (m-yy)", "Products exported (tons)", True)
+    Inputs:
+        country (str): country or region, either 'asia', 'spain' or 'belgium'
+        company (str): standardized company name ("company_std").
 
-# Graph 2. Total volume of exports from Import Genius and BSGI per crop
-product_std = set(PRODUCTS_VAL)
+    Returns (lst): list of (name, func, kwargs) tuples for 'render_charts'.
+    """
+    # Import clean data: the export cube of the company and BSGI data
+    cube = load_cube(country)
+    company_cube = cube[cube["company_std"] == company]
+    bsgi = clean_bsgi_by_country(country)
+    data_source = f"Import Genius data for {company} and Black Sea Grain Initiative"
 
-for crop in product_std:
-    plot_crops(crop, ig, bsgi, True)
+    # Graph 1. Total volume of exports from Import Genius and BSGI
+    charts = [("bsgi_and_kernel_volume_of_exports", plot_total_exports,
+               {"df_1": company_cube, "df_2": bsgi, "data_source": data_source})]
+
+    # Graph 2. Total volume of exports from Import Genius and BSGI per crop
+    for crop in sorted(set(PRODUCTS_VAL)):
+        name = standard_name(f"BSGI and Kernel volume of {crop} exports")
+        charts.append((name, plot_crops, {
+            "crop": crop,
+            "df_1": company_cube[company_cube[crop]],
+            "df_2": bsgi[bsgi["product_std"] == crop],
+            "data_source": data_source,
+        }))
+
+    return charts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create graph outputs")
+    parser.add_argument("--country", default="asia",
+                        help="Options are 'spain', 'belgium' or 'asia'")
+    parser.add_argument("--company", default="Kernel Holding S.A.",
+                        help="standardized company name")
+    parser.add_argument("--workers", type=int, default=RENDER_MAX_WORKERS,
+                        help="worker processes that render charts")
+    parser.add_argument("--force", action="store_true",
+                        help="render charts even if they are up to date")
+    args = parser.parse_args()
+
+    # Create graph image outputs and save them in "output" directory
+    render_charts(app_charts(args.country, args.company), OUTPUT_PATH,
+                  args.workers, args.force)
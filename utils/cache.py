@@ -0,0 +1,229 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Cache functions
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import hashlib
+import json
+import os
+import pandas as pd
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Hash the content of a file.
+
+    Inputs:
+        path (str): path of the file
+        chunk_size (int): number of bytes read at a time.
+
+    Returns (str): SHA-256 hex digest of the file content or None if the file
+        doesn't exist.
+    """
+    if not os.path.exists(path):
+        return None
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def object_hash(obj):
+    """
+    Hash a JSON serializable object (e.g. config constants).
+
+    Inputs:
+        obj (any): object made of dicts, lists, strings and numbers.
+
+    Returns (str): SHA-256 hex digest of the object's JSON representation.
+    """
+    text = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def frame_hash(df):
+    """
+    Hash the content of a dataframe or series: values, index, column names
+    and dtypes.
+
+    Inputs:
+        df (DataFrame or Series): data to hash.
+
+    Returns (str): SHA-256 hex digest.
+    """
+    h = hashlib.sha256(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    if isinstance(df, pd.DataFrame):
+        h.update(object_hash([list(df.columns), list(df.dtypes.astype(str))]).encode())
+    else:
+        h.update(object_hash([df.name, str(df.dtype)]).encode())
+
+    return h.hexdigest()
+
+
+def read_manifest(path):
+    """
+    Read a JSON manifest.
+
+    Inputs:
+        path (str): path of the manifest file.
+
+    Returns (dict): manifest or None if the file doesn't exist or can't be
+        parsed.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(path, manifest):
+    """
+    Write a JSON manifest.
+
+    Inputs:
+        path (str): path of the manifest file
+        manifest (dict): manifest to write.
+
+    Returns: None.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True, ensure_ascii=False)
+
+
+def apply_dtypes(df, dtypes):
+    """
+    Cast dataframe columns to explicit dtypes. Columns that are not in the
+    dataframe are ignored.
+
+    Inputs:
+        df (DataFrame): dataframe
+        dtypes (dict): dictionary with column names as keys and dtypes as
+            values.
+
+    Returns (DataFrame): dataframe with casted columns.
+    """
+    dtypes = {col: dtype for col, dtype in dtypes.items() if col in df.columns}
+
+    return df.astype(dtypes)
+
+
+def write_columnar(df, path, dtypes=None):
+    """
+    Write dataframe as a Parquet file with explicit dtypes.
+
+    Inputs:
+        df (DataFrame): dataframe to write
+        path (str): path of the Parquet file
+        dtypes (dict): optional dictionary with column names as keys and dtypes
+            as values.
+
+    Returns: None.
+    """
+    if dtypes is not None:
+        df = apply_dtypes(df, dtypes)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path, index=False)
+
+
+class ChunkedColumnarWriter:
+    """
+    Write a Parquet file one dataframe chunk at a time, so only the current
+    chunk has to be in memory. Every chunk is cast to the schema of the first
+    one. Use it as a context manager or call 'close' when done.
+
+    Inputs:
+        path (str): path of the Parquet file
+        dtypes (dict): optional dictionary with column names as keys and dtypes
+            as values.
+    """
+
+    def __init__(self, path, dtypes=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.dtypes = dtypes
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        """
+        Append a chunk to the Parquet file.
+
+        Inputs:
+            df (DataFrame): chunk to write.
+
+        Returns: None.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.dtypes is not None:
+            df = apply_dtypes(df, self.dtypes)
+        if self._writer is None:
+            schema = pa.Table.from_pandas(df, preserve_index=False).schema
+            # Categories change from chunk to chunk, so dictionary columns get
+            # indices wide enough for any chunk
+            for i, field in enumerate(schema):
+                if pa.types.is_dictionary(field.type):
+                    wide = pa.dictionary(pa.int32(), field.type.value_type)
+                    schema = schema.set(i, field.with_type(wide))
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.path, schema)
+        else:
+            table = pa.Table.from_pandas(
+                df, schema=self._writer.schema, preserve_index=False
+            )
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_columnar(path, columns=None):
+    """
+    Read a Parquet file written with 'write_columnar'. Parquet doesn't keep
+    the storage of string columns, so they're read back as
+    "string[pyarrow]", the dtype text columns have when they're written.
+
+    Inputs:
+        path (str): path of the Parquet file
+        columns (lst): optional list of columns to read.
+
+    Returns (DataFrame): dataframe.
+    """
+    df = pd.read_parquet(path, columns=columns)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.StringDtype) and \
+                df[col].dtype.storage != "pyarrow":
+            df[col] = df[col].astype("string[pyarrow]")
+
+    return df
+
+
+def is_fresh(manifest_path, manifest, output_path):
+    """
+    Check if a cached output can be reused.
+
+    Inputs:
+        manifest_path (str): path of the manifest stored with the output
+        manifest (dict): manifest computed from the current inputs
+        output_path (str): path of the cached output.
+
+    Returns (bool): True if the output exists and its stored manifest is equal
+        to the current one.
+    """
+    return os.path.exists(output_path) and read_manifest(manifest_path) == manifest
@@ -6,20 +6,25 @@
 
 import sys
 import os
+import functools
 import unicodedata
-from deep_translator import GoogleTranslator, DeeplTranslator
+import numpy as np
 import pandas as pd
 from .get_data import get_data, compile_data
+from .hs_codes import classify_hs
+from .instrument import stage
+from .translate import translate_many
 from config import (
     IG_FILES_PATH,
     COUNTRY_FILES,
     ROOT_PATH,
     PRODUCTS_VAL,
+    CROP_LEXICON,
     CROP_DICT,
     HS_DICT,
-    HS_BSGI,
     CLEAN_FILES_PATH,
-    RAW_FILES_PATH,
+    NAMES_PATH,
+    DEALS_PATH,
 )
 import json
 from .map import top_parent, top_subsidiaries
@@ -27,9 +32,11 @@ import re
 import copy
 
 
+@functools.lru_cache(maxsize=None)
 def keep_chr(ch):
     """
-    Find all characters that are classifed as punctuation in Unicode.
+    Find all characters that are classifed as punctuation in Unicode. Results
+    are cached so each character is only classified once.
     Reference: CAPP121 course, Programming Assigment 3.
 
     Inputs:
@@ -41,7 +48,38 @@ def keep_chr(ch):
     return unicodedata.category(ch).startswith("P")
 
 
-PUNCTUATION = " ".join([chr(i) for i in range(sys.maxunicode) if keep_chr(chr(i))])
+def __getattr__(name):
+    """
+    Build the 'PUNCTUATION' string (every Unicode punctuation character) the
+    first time it's accessed instead of at import time, since it requires
+    scanning all Unicode code points.
+    """
+    if name == "PUNCTUATION":
+        punctuation = " ".join(
+            [chr(i) for i in range(sys.maxunicode) if keep_chr(chr(i))]
+        )
+        globals()["PUNCTUATION"] = punctuation
+        return punctuation
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def strip_punctuation(string):
+    """
+    Remove leading and trailing spaces and Unicode punctuation characters.
+    Equivalent to 'string.strip(PUNCTUATION)' without building 'PUNCTUATION'.
+
+    Inputs:
+        string (str): string we want to strip.
+
+    Returns (str): stripped string.
+    """
+    start, end = 0, len(string)
+    while start < end and (string[start] == " " or keep_chr(string[start])):
+        start += 1
+    while end > start and (string[end - 1] == " " or keep_chr(string[end - 1])):
+        end -= 1
+
+    return string[start:end]
 
 
 def standard_name(string):
@@ -56,7 +94,7 @@ def standard_name(string):
         characters).
     """
 
-    return string.lower().strip(PUNCTUATION).replace("(", "").replace(" ", "_")
+    return strip_punctuation(string.lower()).replace("(", "").replace(" ", "_")
 
 
 def rename_columns(df, source):
@@ -120,6 +158,64 @@ def create_crop_dict(df):
     return d
 
 
+@functools.lru_cache(maxsize=None)
+def crop_pattern():
+    """
+    Compile the crop lexicon into one regular expression with a named group
+    per crop. The pattern is compiled once per process.
+
+    Returns (tuple): compiled pattern and list of crop names. Group "c{i}"
+        matches the i-th crop of the list.
+    """
+    crops = list(CROP_LEXICON)
+    groups = [
+        f"(?P<c{i}>{'|'.join(CROP_LEXICON[crop])})" for i, crop in enumerate(crops)
+    ]
+
+    return re.compile("|".join(groups)), crops
+
+
+def crop_flags(product_col):
+    """
+    Find which crops are mentioned in each product description using the
+    offline crop lexicon. Descriptions are lowercased once and each unique
+    description is scanned once.
+
+    Inputs:
+        product_col (Series): series with product descriptions.
+
+    Returns (DataFrame): boolean dataframe with one column per crop and the
+        same index as 'product_col'.
+    """
+    pattern, crops = crop_pattern()
+    codes, uniques = pd.factorize(product_col.str.lower())
+
+    # The last row stays False for missing descriptions (code -1)
+    flags = np.zeros((len(uniques) + 1, len(crops)), dtype=bool)
+    for i, product in enumerate(uniques):
+        for match in pattern.finditer(product):
+            flags[i, int(match.lastgroup[1:])] = True
+
+    return pd.DataFrame(flags[codes], index=product_col.index, columns=crops)
+
+
+def add_crop_flags(df):
+    """
+    Add one boolean column per crop saying if the crop is mentioned in the
+    "product" column, and a "n_products" column with the number of crops
+    mentioned.
+
+    Inputs:
+        df (DataFrame): dataframe with a "product" column.
+
+    Returns: None. Changes to dataframe are done in place in input dataframe.
+    """
+    flags = crop_flags(df["product"])
+    for crop in flags.columns:
+        df[crop] = flags[crop]
+    df["n_products"] = flags.sum(axis=1)
+
+
 def create_columns(df, source):
     """
     Create columns necessary for time series plots.
@@ -137,41 +233,54 @@ def create_columns(df, source):
 
     if source == "ig":
         df["weight_ton"] = df["weight_kg"] / 1000
-        df["bsgi_commodity"] = (
-            df["hs_code"]
-            .str[:4]
-            .apply(lambda x: HS_BSGI[x] if x in HS_BSGI else "Not in BSGI")
-        )
+        classify_hs(df)
         # df["parent_company"] = df["company_searched"].apply(lambda x: SUBSIDIARY_DICT[x])
-        product_std = set(PRODUCTS_VAL)
-        # We create a variable that sums the number of products mentioned in the
-        # product name
-        df["n_products"] = 0
-        for product in product_std:
-            product_uk = GoogleTranslator("en", "uk").translate(product)
-            df[product] = df["product"].apply(
-                lambda x: True if product_uk in x.lower() else False
-            )
-            df["n_products"] += df[product]
+        add_crop_flags(df)
 
     elif source == "bsgi":
-        df["product_std"] = df["product"].apply(lambda x: CROP_DICT[x])
-        df["hs_code"] = df["product"].apply(lambda x: HS_DICT[x])
+        df["product_std"] = map_values(df["product"], CROP_DICT.__getitem__)
+        df["hs_code"] = map_values(df["product"], HS_DICT.__getitem__)
 
     elif source == "panjiva":
         df["weight_ton"] = df["weight_kg"] / 1000
-        product_std = set(PRODUCTS_VAL)
-        df["n_products"] = 0
-        for product in product_std:
-            df[product] = df["product"].apply(
-                lambda x: True if product in x.lower() else False
-            )
-            df["n_products"] += df[product]
+        classify_hs(df)
+        add_crop_flags(df)
+
+
+def translate_columns(df, columns, translator, source="uk", target="en"):
+    """
+    Translate several string columns with Google or Deepl translator. Unique
+    values of all columns are collected and translated together so every
+    string is only translated once. Only values missing from the translation
+    cache are sent to the translator.
+
+    Inputs:
+        df (DataFrame): dataset
+        columns (lst): names of columns to translate. Column values should be
+            strings
+        translator (str or Provider): translator to use. Can be either
+            'google', 'deepl' or a translation provider
+        source (str): code of language to translate. Default is 'uk' (Ukrainian)
+        target (str): target of language to translate. Default is 'en' (English).
+
+    Return: None. Adds new columns to passed dataframe.
+    """
+    unique_val = set()
+    for column in columns:
+        unique_val.update(df[column].unique())
+    with stage("translate", rows_in=len(unique_val)) as record:
+        d = translate_many(unique_val, translator, source, target)
+        record["rows_out"] = d
+
+    suffix = "_deepl" if translator == "deepl" else "_gt"
+    for column in columns:
+        df[column.lower() + suffix] = df[column].map(d)
 
 
 def translate_column(df, column, translator, source="uk", target="en"):
     """
-    Translate string column faster with Google or Deepl translator.
+    Translate string column faster with Google or Deepl translator. Only values
+    missing from the translation cache are sent to the translator.
 
     Inputs:
         df (DataFrame): dataset
@@ -183,29 +292,25 @@ def translate_column(df, column, translator, source="uk", target="en"):
 
     Return: None. Adds new column to passed dataframe.
     """
-    assert (
-        translator == "google" or translator == "deepl"
-    ), "Wrong translator\
-                                                name. Use 'google' or 'deepl'."
+    translate_columns(df, [column], translator, source, target)
+
 
-    # Get deepl API key from environment variable "API_KEY"
-    deepl_key = os.environ.get("API_KEY")
+def map_values(series, func):
+    """
+    Apply a function once per unique value of a column instead of once per row.
 
-    # We create list with unique column values so we only translate neccesary
-    # number of values
-    unique_val = df[column].unique()
+    Inputs:
+        series (Series): column we want to transform
+        func (function): function that takes a value and returns the new value.
 
-    d = {}
-    if translator == "google":
-        for val in unique_val:
-            d[val] = GoogleTranslator(source=source, target=target).translate(val)
-        df[column.lower() + "_gt"] = df[column].apply(lambda x: d[x])
-    else:
-        for val in unique_val:
-            d[val] = DeeplTranslator(
-                api_key=deepl_key, source=source, target=target, use_free_api=True
-            ).translate(val)
-        df[column.lower() + "_deepl"] = df[column].apply(lambda x: d[x])
+    Returns (Series): categorical series with new values. Missing values stay
+        missing.
+    """
+    codes, uniques = pd.factorize(series)
+    values = pd.Categorical([func(x) for x in uniques])
+
+    return pd.Series(values.take(codes, allow_fill=True), index=series.index,
+                     name=series.name)
 
 
 def clean_column(df, column):
@@ -218,41 +323,49 @@ def clean_column(df, column):
 
     Return: None. It does the change in place in the input dataframe.
     """
-    df[column] = df[column].str.lower()
+    if isinstance(df[column].dtype, pd.CategoricalDtype):
+        df[column] = map_values(df[column], str.lower)
+    else:
+        df[column] = df[column].str.lower()
 
 
-def clean_data(source, path=None):
+def derive_columns(df, source):
     """
-    Get clean data from data source directory
+    Create the new columns of a dataframe with standardized column names and
+    turn its "country" and "product" columns to lowercase.
+
     Inputs:
+        df (DataFrame): dataframe with renamed columns (see 'rename_columns')
         source (str): data source, either "ig" (Import Genius), "bsgi" (Black
             Sea Grain Initiative) or "panjiva".
 
-    Return (DataFrame): dataframe with cleaned data (with renamed columns and
-        new columns neccesary for analysis).
+    Return: None. It does the change in place in the input dataframe.
     """
-    data_sources = ["ig", "bsgi", "panjiva"]
-    assert (
-        source in data_sources
-    ), "Wrong data source Error: source must be\
-                                    'ig', 'bsgi' or 'panjiva'."
-
-    if path is None:
-        df = compile_data(source)
-    else:
-        df = get_data(path, source)
-        if source == "ig":
-            df["company_searched"] = df["SHIPPER"]
-    df = rename_columns(df, source)
     create_columns(df, source)
 
     columns = ["country", "product"]
     for col in columns:
         clean_column(df, col)
 
+
+def clean_frame(df, source):
+    """
+    Clean a dataframe read from a data source: rename columns, create new
+    columns and turn string columns to lowercase. It works on a whole file or
+    on a chunk of it.
+
+    Inputs:
+        df (DataFrame): raw data
+        source (str): data source, either "ig" (Import Genius), "bsgi" (Black
+            Sea Grain Initiative) or "panjiva".
+
+    Return (DataFrame): dataframe with cleaned data.
+    """
+    df = rename_columns(df, source)
+    derive_columns(df, source)
+
     if source == "bsgi":
-        translate_column(df, "product_std", "google", "en", "uk")
-        translate_column(df, "country", "google", "en", "uk")
+        translate_columns(df, ["product_std", "country"], "google", "en", "uk")
         df = df.rename(columns={"country": "country_en", "country_gt": "country"})
         clean_column(df, "country")
 
@@ -263,6 +376,65 @@ def clean_data(source, path=None):
     return df
 
 
+def clean_data(source, path=None, chunksize=None):
+    """
+    Get clean data from data source directory
+    Inputs:
+        source (str): data source, either "ig" (Import Genius), "bsgi" (Black
+            Sea Grain Initiative) or "panjiva".
+        path (str): optional path of a single data file. If None, all files of
+            the data source directory are compiled
+        chunksize (int): optional number of rows per chunk (only with 'path'
+            and "ig" or "bsgi" sources). If passed, the file is read and
+            cleaned one chunk at a time.
+
+    Return (DataFrame or iterator): dataframe with cleaned data (with renamed
+        columns and new columns neccesary for analysis), or iterator of clean
+        dataframes if 'chunksize' is passed.
+    """
+    data_sources = ["ig", "bsgi", "panjiva"]
+    assert (
+        source in data_sources
+    ), "Wrong data source Error: source must be\
+                                    'ig', 'bsgi' or 'panjiva'."
+
+    if chunksize is not None:
+        return (
+            clean_frame(prepare_raw(df, source), source)
+            for df in get_data(path, source, chunksize=chunksize)
+        )
+
+    with stage(f"read_{source}") as record:
+        if path is None:
+            df = compile_data(source)
+        else:
+            df = prepare_raw(get_data(path, source), source)
+        record["rows_out"] = df
+
+    with stage(f"clean_{source}", rows_in=df) as record:
+        df = clean_frame(df, source)
+        record["rows_out"] = df
+
+    return df
+
+
+def prepare_raw(df, source):
+    """
+    Add columns to raw data read from a single file that the compiled data
+    files already have.
+
+    Inputs:
+        df (DataFrame): raw data
+        source (str): data source.
+
+    Return (DataFrame): raw data.
+    """
+    if source == "ig":
+        df["company_searched"] = df["SHIPPER"]
+
+    return df
+
+
 def generate_path(countries):
     """
     Generate path where file is located.
@@ -293,9 +465,9 @@ def correct_name(series, name_dict):
         name_dict (dict): dictionary with incorrect names as keys and correct
             names as values.
 
-    Returns: series with correct names.
+    Returns: categorical series with correct names.
     """
-    return series.apply(lambda x: name_dict[x])
+    return map_values(series, lambda x: name_dict[x])
 
 
 def filter_country(deals, country):
@@ -386,15 +558,15 @@ def translate_subsidiaries(dict, source_lan, target_lan):
     Returns (dict): dictionary with parent companies as keys and subsidaries as
         values.
     """
-    d_target = {}
+    all_subsidiaries = [sub for sub_lst in dict.values() for sub in sub_lst]
+    with stage("translate", rows_in=all_subsidiaries) as record:
+        translations = translate_many(all_subsidiaries, "google", source_lan,
+                                      target_lan)
+        record["rows_out"] = translations
 
+    d_target = {}
     for parent, sub_lst in dict.items():
-        target_lst = []
-        for subsidiary in sub_lst:
-            target_lst.append(
-                GoogleTranslator(source_lan, target_lan).translate(subsidiary)
-            )
-        d_target[parent] = target_lst
+        d_target[parent] = [translations[subsidiary] for subsidiary in sub_lst]
 
     return d_target
 
@@ -444,27 +616,39 @@ def add_companies_manually(old_dict, new_dict):
     return old_dict_copy
 
 
-def create_subsidiary_dict(n_parent_companies, n_subsidiaries, ig_data):
+def create_subsidiary_dict(n_parent_companies, n_subsidiaries, ig_data=None):
     """
     Create dictionary with parent companies as keys and subsidiaries as values
         using Land Matrix data.
 
-    n_parent_companies (int): top 'n' parent companies we want to
+    Inputs:
+        n_parent_companies (int): top 'n' parent companies we want to get
+        n_subsidiaries (int): top 'n' subsidiaries we want to get for each
+            parent company
+        ig_data (DataFrame): optional Import Genius data. If passed, a
+            lowercase "shipper_low" column is added to it in place.
+
+    Returns (dict): dictionary with parent companies as keys and subsidiary
+        names in Ukrainian (lowercase) as values.
     """
     # Import Land Matrix data and create list with top parent companies
-    path = os.path.join(RAW_FILES_PATH, "land_matrix/deals.csv")
-    deals = pd.read_csv(path, delimiter=";", low_memory=False)
-    deals_c = filter_country(deals, "ukraine")
-    parent_lst = top_parent(deals_c, n_parent_companies)
-    parent_lst = extend_list(parent_lst, "|")
-
-    # Regex cleans parent company names. Names include deal_id as 'Kernel #366#'
-    # Function removes specified regex pattern.
-    pattern = r"^.*?(?=#\d+#)"
-    clean_list(parent_lst, pattern)
-
-    # Create dictionary with parent companies as keys and subsidiaries as values
-    subsidiaries_dict = parent_subsidiary_dict(parent_lst, deals_c, n_subsidiaries)
+    with stage("land_matrix") as record:
+        deals = pd.read_csv(DEALS_PATH, delimiter=";", low_memory=False)
+        record["rows_in"] = len(deals)
+        deals_c = filter_country(deals, "ukraine")
+        parent_lst = top_parent(deals_c, n_parent_companies)
+        parent_lst = extend_list(parent_lst, "|")
+
+        # Regex cleans parent company names. Names include deal_id as
+        # 'Kernel #366#'. Function removes specified regex pattern.
+        pattern = r"^.*?(?=#\d+#)"
+        clean_list(parent_lst, pattern)
+
+        # Create dictionary with parent companies as keys and subsidiaries as
+        # values
+        subsidiaries_dict = parent_subsidiary_dict(parent_lst, deals_c,
+                                                   n_subsidiaries)
+        record["rows_out"] = subsidiaries_dict
 
     # Translate subsidiary names to Ukrainian to try to match them to IG shipper
     # names which are in Ukrainian
@@ -473,14 +657,13 @@ def create_subsidiary_dict(n_parent_companies, n_subsidiaries, ig_data):
     # Turn company values to lowercase both in subsidiary dictionary and IG
     # shipper column
     dict_to_lower(subsidiaries_uk)
-    ig_data["shipper_low"] = ig_data["shipper"].str.lower()
+    if ig_data is not None:
+        ig_data["shipper_low"] = ig_data["shipper"].str.lower()
 
     # Manually add some companies we identified separately
     # Import countries dictionaries from JSON file
-    # TODO: change path back to previous one
-    f = open("names.json")  # works when running python pipeline.py command
-    # f = open('../names.json') # works when running Jupyter notebook
-    data = json.load(f)
+    with open(NAMES_PATH, encoding="utf-8") as f:
+        data = json.load(f)
 
     KNOWN_COMPANIES = data["KNOWN_COMPANIES"]
     subsidiaries_c = add_companies_manually(subsidiaries_uk, KNOWN_COMPANIES)
@@ -568,7 +751,7 @@ def export_csv(df, file_name, translate=False):
         if translate
         else ["subsidiary", "parent_company"]
     )
-    df_g = df_filtered.groupby(group_cols, as_index=False)
+    df_g = df_filtered.groupby(group_cols, as_index=False, observed=True)
     df_g = df_g.sum("weight_ton_subs").sort_values(
         by=["weight_ton_subs"], ascending=False
     )
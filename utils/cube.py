@@ -0,0 +1,192 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Monthly export cube
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import os
+import pandas as pd
+from pandas.api.types import union_categoricals
+from config import CLEAN_FILES_PATH, CUBE_FILES, CUBE_DIMENSIONS, CROP_LEXICON
+from .cache import write_columnar, read_columnar
+from .get_data import load_clean_ig
+
+
+def aggregate(df, keys, measures):
+    """
+    Sum measures of a dataframe by some keys. Only combinations of categories
+    that exist are kept and missing keys are kept as their own group.
+
+    Inputs:
+        df (DataFrame): dataframe
+        keys (lst): list of series or column names to group by
+        measures (dict): dictionary with new column names as keys and
+            (column, function) tuples as values.
+
+    Returns (DataFrame): aggregated dataframe.
+    """
+    cube = df.groupby(keys, observed=True, dropna=False, sort=True) \
+        .agg(**measures).reset_index()
+    crops = [crop for crop in CROP_LEXICON if crop in cube.columns]
+    if crops:
+        cube["n_products"] = cube[crops].sum(axis=1)
+
+    return cube
+
+
+def build_cube(df):
+    """
+    Aggregate clean shipments into the monthly export cube: one row per month
+    ("period", a monthly Period), destination country, standardized company,
+    BSGI commodity and combination of crop flags, with the sum of weights and
+    the number of shipments. The crop flags and "n_products" are kept, so
+    crops can be filtered as in the row-level data (see 'filter_crop').
+
+    Inputs:
+        df (DataFrame): clean Import Genius (or Panjiva) data. Dimensions of
+            CUBE_DIMENSIONS in config.py that it doesn't have are skipped.
+
+    Returns (DataFrame): export cube.
+    """
+    if "date" in df.columns:
+        period = df["date"].dt.to_period("M")
+    else:
+        period = pd.Series(pd.PeriodIndex(year=df["year"], month=df["month"],
+                                          freq="M"), index=df.index)
+    keys = [period.rename("period")] + [col for col in CUBE_DIMENSIONS
+                                        if col in df.columns]
+    measures = {col: (col, "sum") for col in ["weight_kg", "weight_ton"]
+                if col in df.columns}
+    measures["n_shipments"] = ("weight_ton", "size")
+
+    return aggregate(df, keys, measures)
+
+
+def merge_cubes(cubes):
+    """
+    Merge cubes of different parts of the same data (e.g. chunks of a file).
+    Weights and shipments are additive, so the result is the cube of all the
+    data.
+
+    Inputs:
+        cubes (lst): list of export cubes.
+
+    Returns (DataFrame): export cube.
+    """
+    cube = pd.concat(cubes, ignore_index=True)
+    keys = [col for col in ["period"] + CUBE_DIMENSIONS if col in cube.columns]
+    # Categories of each part can differ, so concatenating makes them objects
+    for col in keys:
+        if isinstance(cubes[0][col].dtype, pd.CategoricalDtype):
+            cube[col] = union_categoricals([c[col] for c in cubes])
+    measures = {col: (col, "sum") for col in ["weight_kg", "weight_ton",
+                                               "n_shipments"] if col in cube.columns}
+
+    return aggregate(cube, keys, measures)
+
+
+def is_cube(df):
+    """
+    Check if a dataframe is an export cube or row-level data.
+
+    Inputs:
+        df (DataFrame): dataframe.
+
+    Returns (bool): True if the dataframe is an export cube.
+    """
+    return "period" in df.columns and "n_shipments" in df.columns
+
+
+def as_cube(df):
+    """
+    Get the export cube of some data, so functions that read the cube also
+    take row-level data.
+
+    Inputs:
+        df (DataFrame): export cube or clean row-level data.
+
+    Returns (DataFrame): export cube.
+    """
+    return df if is_cube(df) else build_cube(df)
+
+
+def monthly_table(cube, columns="company_std", value="weight_ton", by=None):
+    """
+    Build a wide table from a cube (or a slice of it) with one row per month.
+
+    Inputs:
+        cube (DataFrame): export cube
+        columns (str or lst): cube dimension(s) whose values are the columns.
+            Default is "company_std"
+        value (str): measure to sum, e.g. "weight_ton" (default) or
+            "n_shipments"
+        by (str): optional cube dimension (e.g. "country") added as the first
+            level of the index, so one table has the months of every value.
+
+    Returns (DataFrame): wide table with a monthly PeriodIndex ("period"), or
+        a MultiIndex of 'by' and "period". Months without data for a column
+        are missing values.
+    """
+    index = "period" if by is None else [by, "period"]
+
+    return cube.pivot_table(index=index, columns=columns, values=value,
+                            aggfunc="sum", observed=True)
+
+
+def period_labels(periods):
+    """
+    Format months as "m/yyyy" labels for charts (e.g. "8/2022").
+
+    Inputs:
+        periods (PeriodIndex or Series): monthly periods.
+
+    Returns (lst): list of labels.
+    """
+    return [f"{p.month}/{p.year}" for p in periods]
+
+
+def cube_path(country):
+    """
+    Get the path of the export cube of a country.
+
+    Inputs:
+        country (str): country or region, either 'asia', 'spain' or 'belgium'.
+
+    Returns (str): path of the Parquet file.
+    """
+    return os.path.join(CLEAN_FILES_PATH, CUBE_FILES[country])
+
+
+def write_cube(cube, country):
+    """
+    Save the export cube of a country in "data/clean".
+
+    Inputs:
+        cube (DataFrame): export cube
+        country (str): country or region, either 'asia', 'spain' or 'belgium'.
+
+    Returns: None.
+    """
+    write_columnar(cube, cube_path(country))
+
+
+def load_cube(country, columns=None):
+    """
+    Load the export cube of a country created by the pipeline. If it doesn't
+    exist (e.g. clean data saved by an older version of the pipeline), it's
+    built from the clean data.
+
+    Inputs:
+        country (str): country or region, either 'asia', 'spain' or 'belgium'
+        columns (lst): optional list of columns to read.
+
+    Returns (DataFrame): export cube.
+    """
+    path = cube_path(country)
+    if os.path.exists(path):
+        return read_columnar(path, columns=columns)
+
+    print(f"No export cube for {country}. Building it from the clean data")
+    cube = build_cube(load_clean_ig(country))
+
+    return cube if columns is None else cube[columns]
@@ -7,42 +7,227 @@
 import os
 import pandas as pd
 import re
+from concurrent.futures import ProcessPoolExecutor
+from .cache import read_manifest, write_manifest, object_hash
+from config import (
+    CACHE_PATH,
+    CLEAN_CACHE_VERSION,
+    CLEAN_FILES_PATH,
+    CLEAN_FILES,
+    CLEAN_COLUMNAR_FILES,
+    CLEAN_IG_DTYPES,
+    READ_SCHEMAS,
+)
 
 CURRENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def get_data(path, source):
+def column_key(name):
     """
-    Import data from .csv file name
+    Standardize a raw column name to match it with the read schemas
+    (lowercase, words joined by "_"). Example: "WEIGHT (KG)" -> "weight_kg".
+
+    Inputs:
+        name (str): raw column name.
+
+    Return (str): standardized column name.
+    """
+    return re.sub(r"[\W_]+", "_", str(name).lower()).strip("_")
+
+
+def resolve_schema(columns, source):
+    """
+    Match the raw columns of a file with the read schema of its data source.
+
+    Inputs:
+        columns (lst): raw column names of the file
+        source (str): data source, either "ig", "bsgi" or "panjiva".
+
+    Return (tuple): list of raw columns to load, dictionary with raw column
+        names as keys and dtypes as values, and dictionary with raw date
+        column names as keys and date formats as values.
+    """
+    schema = READ_SCHEMAS[source]
+    keys = {col: column_key(col) for col in columns}
+    usecols = [col for col in columns if keys[col] in schema["columns"]]
+    dtype = {
+        col: schema["columns"][keys[col]]
+        for col in usecols
+        if schema["columns"][keys[col]] is not None
+    }
+    dates = {
+        col: schema["dates"][keys[col]] for col in usecols if keys[col] in schema["dates"]
+    }
+
+    return usecols, dtype, dates
+
+
+def parse_dates(df, dates):
+    """
+    Parse date columns with their exact format. If a column doesn't follow
+    the format, the format is inferred instead and a warning is printed.
+
+    Inputs:
+        df (DataFrame): raw data
+        dates (dict): dictionary with date column names as keys and formats as
+            values.
+
+    Return: None. Changes are done in place in input dataframe.
+    """
+    for col, date_format in dates.items():
+        try:
+            df[col] = pd.to_datetime(df[col], format=date_format, cache=True)
+        except (ValueError, TypeError):
+            print(f"Warning: '{col}' doesn't follow the format {date_format}. "
+                  "Update READ_SCHEMAS in config.py. Inferring format instead.")
+            df[col] = pd.to_datetime(df[col], cache=True)
+
+
+def fix_hs_code(df):
+    """
+    Add 0 to HS Codes that have 9 digits because apparently Import Genius cuts
+    the 0 at the beggining.
+
+    Inputs:
+        df (DataFrame): raw Import Genius data with HS Codes read as strings.
+
+    Return: None. Changes are done in place in input dataframe.
+    """
+    col = [col for col in df.columns if column_key(col) == "hs_code"][0]
+    df[col] = df[col].mask(df[col].str.len() == 9, "0" + df[col])
+
+
+def finish_read(df, source, dates):
+    """
+    Parse dates and fix HS Codes of data read with a read schema.
+
+    Inputs:
+        df (DataFrame): raw data
+        source (str): data source
+        dates (dict): dictionary with date column names as keys and formats as
+            values.
+
+    Return (DataFrame): raw data.
+    """
+    parse_dates(df, dates)
+    if source == "ig":
+        fix_hs_code(df)
+
+    return df
+
+
+def iter_chunks(reader, source, dates):
+    """
+    Parse dates and fix HS Codes of data read in chunks.
+
+    Inputs:
+        reader (iterator): iterator of raw dataframes
+        source (str): data source
+        dates (dict): dictionary with date column names as keys and formats as
+            values.
+
+    Return (iterator): iterator of raw dataframes.
+    """
+    for df in reader:
+        yield finish_read(df, source, dates)
+
+
+def memory_report(df):
+    """
+    Get the memory footprint of a dataframe.
+
+    Inputs:
+        df (DataFrame): dataframe.
+
+    Return (Series): memory used by each column and in total (bytes).
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    usage["total"] = usage.sum()
+
+    return usage
+
+
+def get_data(path, source, chunksize=None, report_memory=False):
+    """
+    Import data from .csv file name. Only the columns declared in the read
+    schema of the data source (READ_SCHEMAS in config.py) are loaded, with
+    their declared dtypes and date formats, so pandas doesn't infer them.
 
     Inputs:
         path (str): path for data file
         source (str): data source, either "ig" (Import Genius), "bsgi" (Black
             Sea Grain Initiative) or panjiva.
+        chunksize (int): optional number of rows per chunk for .csv sources.
+            If passed, the file is read lazily one chunk at a time.
+        report_memory (bool): print the memory footprint of the loaded data.
+            Default is False.
 
-    Return (DataFrame): dataframe.
+    Return (DataFrame or iterator): dataframe, or iterator of dataframes if
+        'chunksize' is passed.
     """
 
-    if source == "ig":
-        df = pd.read_csv(path, parse_dates=["EXPORT DATE"], encoding = "utf-8")
-        # Add 0 to HS Codes that have 9 digits because apparently Import Genius
-        # cuts the 0 at the beggining 
-        df["HS CODE"] = df["HS CODE"].astype(str)
-        df["HS CODE"] = df["HS CODE"].apply(lambda x: "0" + x if len(x) == 9 else x)
-    
-    elif source == "bsgi":
-        df = pd.read_csv(path, thousands=",", parse_dates=["Departure date"])
+    if source == "panjiva":
+        assert chunksize is None, "Panjiva Excel files can't be read in chunks."
+        schema = READ_SCHEMAS[source]
+        df = pd.read_excel(path, usecols=lambda col: column_key(col) in schema["columns"])
+        _, dtype, dates = resolve_schema(df.columns, source)
+        df = df.astype(dtype)
+
+    else:
+        header = pd.read_csv(path, nrows=0, encoding="utf-8").columns
+        usecols, dtype, dates = resolve_schema(header, source)
+        # BSGI numbers use "," as thousands separator
+        thousands = "," if source == "bsgi" else None
+        df = pd.read_csv(path, usecols=usecols, dtype=dtype, encoding="utf-8",
+                         thousands=thousands, chunksize=chunksize)
+        if chunksize is not None:
+            return iter_chunks(df, source, dates)
+
+    df = finish_read(df, source, dates)
+
+    if report_memory:
+        usage = memory_report(df)
+        print(f"{os.path.basename(path)}: {len(df)} rows, "
+              f"{usage['total'] / 2**20:.1f} MB in memory")
+        print((usage / 2**20).round(2).to_string())
+
+    return df
+
+
+def parse_company_file(file_path, directory_name):
+    """
+    Read one company data file and add the columns that identify the search
+    it comes from. File names follow the syntax "[source]_[company]_[batch].ext".
+
+    Inputs:
+        file_path (str): path of the data file
+        directory_name (str): data source directory, either "ig" or "panjiva".
 
-    elif source == "panjiva":
-        df = pd.read_excel(path, parse_dates=["Date"])
+    Return (DataFrame): dataframe with file data.
+    """
+    file = os.path.basename(file_path)
+    df = get_data(file_path, directory_name)
+    # One value per file, so they're categorical like other repeated labels
+    df["company_searched"] = pd.Categorical([re.split("_|\\.", file)[1]] * len(df))
+    if directory_name == "ig":
+        df["search_batch"] = pd.Categorical([re.split("_|\\.", file)[2]] * len(df))
 
     return df
 
-def compile_data(directory_name):
+
+def compile_data(directory_name, max_workers=None, use_cache=True):
     """
-    Compile data files into one dataframe
+    Compile data files into one dataframe. Files are parsed concurrently in a
+    process pool and concatenated once. Parsed files are cached, so files
+    whose modification time and size didn't change since the last run are
+    read from the cache instead of parsed again. The cache is only used if
+    CLEAN_CACHE_VERSION and the read schema of the data source didn't change
+    either, since they change what parsing returns.
 
     Inputs:
         directory_name (str): name of directory where data files are located.
+        max_workers (int): maximum number of worker processes. Default is the
+            number of CPUs
+        use_cache (bool): use and update the per-file cache. Default is True.
     
     Return (DataFrame): dataframe with compiled data
     """
@@ -54,15 +239,83 @@ def compile_data(directory_name):
         path = os.path.join(path, "company_files")
     
     file_formats = ["xlsx", "csv"]
-    compiled_df = pd.DataFrame()
-
-    for file in os.listdir(path):
-        if re.split("_|\\.", file)[-1] in file_formats:
-            file_path = os.path.join(path, file)
-            df = get_data(file_path, directory_name)
-            df["company_searched"] = re.split("_|\\.", file)[1]
-            if directory_name == "ig":
-                df["search_batch"] = re.split("_|\\.", file)[2]
-            compiled_df = pd.concat([compiled_df, df])
-
-    return compiled_df
\ No newline at end of file
+    files = sorted(
+        file for file in os.listdir(path)
+        if re.split("_|\\.", file)[-1] in file_formats
+    )
+
+    cache_dir = os.path.join(CACHE_PATH, "compile", directory_name)
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    parser = {"version": CLEAN_CACHE_VERSION,
+              "schema": object_hash(READ_SCHEMAS[directory_name])}
+    manifest = (read_manifest(manifest_path) or {}) if use_cache else {}
+    # Files parsed by another parser version are parsed again
+    cached = manifest.get("files", {}) if manifest.get("parser") == parser else {}
+
+    frames = {}
+    to_parse = []
+    stats = {}
+    for file in files:
+        st = os.stat(os.path.join(path, file))
+        stats[file] = {"mtime": st.st_mtime_ns, "size": st.st_size}
+        cache_file = os.path.join(cache_dir, file + ".pkl")
+        if cached.get(file) == stats[file] and os.path.exists(cache_file):
+            frames[file] = pd.read_pickle(cache_file)
+        else:
+            to_parse.append(file)
+
+    if to_parse:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            parsed = pool.map(
+                parse_company_file,
+                [os.path.join(path, file) for file in to_parse],
+                [directory_name] * len(to_parse),
+            )
+            for file, df in zip(to_parse, parsed):
+                frames[file] = df
+
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        for file in to_parse:
+            frames[file].to_pickle(os.path.join(cache_dir, file + ".pkl"))
+        # Remove cached files whose data file doesn't exist anymore
+        for cache_file in os.listdir(cache_dir):
+            if cache_file.endswith(".pkl") and cache_file[:-4] not in stats:
+                os.remove(os.path.join(cache_dir, cache_file))
+        write_manifest(manifest_path, {"parser": parser, "files": stats})
+
+    if not frames:
+        return pd.DataFrame()
+
+    df = pd.concat([frames[file] for file in files])
+    # Categories differ between files, so concatenating makes them objects
+    first = frames[files[0]]
+    for col in df.columns:
+        if isinstance(first[col].dtype, pd.CategoricalDtype) and \
+                not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    return df
+
+
+def load_clean_ig(country, columns=None):
+    """
+    Load clean Import Genius data created by the pipeline. The Parquet file is
+    used when available since it's much faster to read than the .csv file.
+
+    Inputs:
+        country (str): country or region, either 'asia', 'spain' or 'belgium'
+        columns (lst): optional list of columns to read.
+
+    Return (DataFrame): dataframe with clean Import Genius data.
+    """
+    path = os.path.join(CLEAN_FILES_PATH, CLEAN_COLUMNAR_FILES[country])
+    if os.path.exists(path):
+        return pd.read_parquet(path, columns=columns)
+
+    path = os.path.join(CLEAN_FILES_PATH, CLEAN_FILES[country])
+    dtype = {col: dtype for col, dtype in CLEAN_IG_DTYPES.items() if col != "date"}
+    dtype["hs_code"] = "str"
+    # "date" can only be parsed if it's read
+    parse_dates = ["date"] if columns is None or "date" in columns else None
+    return pd.read_csv(path, usecols=columns, parse_dates=parse_dates, dtype=dtype)
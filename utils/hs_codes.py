@@ -0,0 +1,103 @@
+# Name: Josemaria Macedo Carrillo
+# Title: HS code lookup
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import re
+from functools import lru_cache
+import pandas as pd
+from config import CROP_DICT, HS_BSGI, HS_BSGI_6, HS_NOT_BSGI
+
+PREFIX_LENGTHS = (6, 4, 2)
+
+
+class HSIndex:
+    """
+    Hierarchical lookup of HS codes. Every code is resolved to the BSGI
+    commodity and standard crop of its longest known prefix (6, 4 or 2 digits).
+    Each distinct code is resolved once and rows get their result through the
+    codes of a categorical, so a whole column is classified in one pass.
+
+    Inputs:
+        prefixes (dict): dictionary with HS code prefixes (2, 4 or 6 digits) as
+            keys and BSGI commodities as values
+        crops (dict): dictionary with BSGI commodities as keys and standard
+            crops as values
+        default (str): commodity of codes without a known prefix.
+    """
+
+    def __init__(self, prefixes, crops, default=HS_NOT_BSGI):
+        for prefix in prefixes:
+            if len(prefix) not in PREFIX_LENGTHS:
+                raise ValueError(f"HS prefix '{prefix}' must have 2, 4 or 6 digits")
+        self.prefixes = prefixes
+        self.crops = crops
+        self.default = default
+
+    def resolve(self, code):
+        """
+        Find the BSGI commodity of a single HS code.
+
+        Inputs:
+            code (str): HS code. Characters other than digits are ignored.
+
+        Returns (str): BSGI commodity of the longest known prefix of the code
+            or the default commodity.
+        """
+        digits = re.sub(r"\D", "", code)
+        for n in PREFIX_LENGTHS:
+            commodity = self.prefixes.get(digits[:n]) if len(digits) >= n else None
+            if commodity is not None:
+                return commodity
+
+        return self.default
+
+    def classify(self, hs_col):
+        """
+        Classify a column of HS codes.
+
+        Inputs:
+            hs_col (Series): series with HS codes as strings or categories.
+
+        Returns (DataFrame): dataframe with the same index as 'hs_col' and two
+            categorical columns: "bsgi_commodity" and "hs_crop" (missing if
+            the commodity has no standard crop). Missing codes get the default
+            commodity.
+        """
+        codes, uniques = pd.factorize(hs_col)
+        commodities = [self.resolve(str(code)) for code in uniques]
+        commodities.append(self.default)
+        crops = [self.crops.get(commodity) for commodity in commodities]
+
+        # Code -1 (missing HS code) points to the last, default, label
+        commodity = pd.Categorical(commodities).take(codes)
+        crop = pd.Categorical(crops).take(codes)
+
+        return pd.DataFrame({"bsgi_commodity": commodity, "hs_crop": crop},
+                            index=hs_col.index)
+
+
+@lru_cache(maxsize=1)
+def hs_index():
+    """
+    Build the HS code index of the BSGI commodities in config.py once.
+
+    Returns (HSIndex): HS code index.
+    """
+    return HSIndex({**HS_BSGI, **HS_BSGI_6}, CROP_DICT)
+
+
+def classify_hs(df, hs_column="hs_code"):
+    """
+    Add "bsgi_commodity" and "hs_crop" columns to a dataframe with HS codes.
+
+    Inputs:
+        df (DataFrame): dataframe with HS codes
+        hs_column (str): name of the HS code column. Default is "hs_code".
+
+    Returns: None. Changes to dataframe are done in place in input dataframe.
+    """
+    classes = hs_index().classify(df[hs_column])
+    df["bsgi_commodity"] = classes["bsgi_commodity"]
+    df["hs_crop"] = classes["hs_crop"]
@@ -0,0 +1,229 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Pipeline stage instrumentation
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import cProfile
+import functools
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+import pandas as pd
+from .translate import get_cache
+
+# Records of the stages run in this process, and the stages running now
+_RECORDS = []
+_STACK = []
+_SETTINGS = {"log_path": None, "profile_dir": None}
+
+
+def configure(log_path=None, profile_dir=None):
+    """
+    Set where stage records and profiles are written. Records are always kept
+    in memory (see 'records').
+
+    Inputs:
+        log_path (str): JSON lines file each stage record is appended to. If
+            None (default), records are not written
+        profile_dir (str): directory to dump a cProfile (pstats) file per
+            stage. If None (default), stages are not profiled.
+
+    Returns: None.
+    """
+    _SETTINGS["log_path"] = log_path
+    _SETTINGS["profile_dir"] = profile_dir
+
+
+def settings():
+    """
+    Get the current settings, e.g. to configure worker processes the same way.
+
+    Returns (dict): dictionary with "log_path" and "profile_dir".
+    """
+    return dict(_SETTINGS)
+
+
+def records():
+    """
+    Get the records of the stages run in this process.
+
+    Returns (lst): list of stage records (dictionaries).
+    """
+    return list(_RECORDS)
+
+
+def reset():
+    """
+    Forget the stage records of this process.
+
+    Returns: None.
+    """
+    _RECORDS.clear()
+
+
+def peak_rss_mb():
+    """
+    Get the peak resident memory of this process.
+
+    Returns (float): peak RSS in MB.
+    """
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count_rows(obj):
+    """
+    Count the rows of a stage input or output.
+
+    Inputs:
+        obj: dataframe, series, dictionary, list, number of rows or None.
+
+    Returns (int): number of rows, or None if they can't be counted.
+    """
+    if obj is None or isinstance(obj, int):
+        return obj
+    if isinstance(obj, (pd.DataFrame, pd.Series, dict, list, set, tuple)):
+        return len(obj)
+
+    return None
+
+
+def write_record(record):
+    """
+    Append a stage record to the JSON lines log, if there is one.
+
+    Inputs:
+        record (dict): stage record.
+
+    Returns: None.
+    """
+    log_path = _SETTINGS["log_path"]
+    if log_path is None:
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+@contextmanager
+def stage(name, rows_in=None, **fields):
+    """
+    Measure a pipeline stage: wall time, growth of the peak RSS, rows in and
+    out and translator calls. The record is kept in memory and appended to
+    the JSON lines log. Stages can be nested; when profiling, only the
+    outermost stage running is profiled (nested stages are in its profile).
+
+    Inputs:
+        name (str): stage name
+        rows_in: stage input or its number of rows (see 'count_rows')
+        fields: other values to record, e.g. country="asia".
+
+    Returns (dict): yields the stage record. Set its "rows_out" inside the
+        'with' block, e.g. record["rows_out"] = len(df).
+    """
+    cache = get_cache()
+    record = {"stage": name, "parent": _STACK[-1]["stage"] if _STACK else None,
+              "depth": len(_STACK), **fields, "rows_in": count_rows(rows_in),
+              "rows_out": None, "pid": os.getpid()}
+
+    profiler = None
+    if _SETTINGS["profile_dir"] is not None and \
+            not any(s.get("profiled") for s in _STACK):
+        profiler = cProfile.Profile()
+        record["profiled"] = True
+
+    _STACK.append(record)
+    calls = cache.translator_calls
+    rss = peak_rss_mb()
+    start_time = time.time()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+        record["status"] = "ok"
+    except BaseException as e:
+        record["status"] = f"failed: {e!r}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _STACK.pop()
+        record["rows_out"] = count_rows(record["rows_out"])
+        record.update({
+            "start": start_time,
+            "seconds": round(time.perf_counter() - start, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "rss_delta_mb": round(peak_rss_mb() - rss, 1),
+            "translator_calls": cache.translator_calls - calls,
+        })
+        if profiler is not None:
+            profile_dir = _SETTINGS["profile_dir"]
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(
+                profile_dir, f"{len(_RECORDS):03d}_{name}_{os.getpid()}.prof")
+            profiler.dump_stats(path)
+            record["profile"] = path
+        record.pop("profiled", None)
+        _RECORDS.append(record)
+        write_record(record)
+
+
+def instrumented(name=None):
+    """
+    Decorator to run a function as a stage. Rows in are counted from the
+    first argument and rows out from the returned value.
+
+    Inputs:
+        name (str): stage name. Default is the function name.
+
+    Returns (function): decorator.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = args[0] if args else None
+            with stage(name or func.__name__, count_rows(rows_in)) as record:
+                result = func(*args, **kwargs)
+                record["rows_out"] = count_rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def summary_table(stage_records=None):
+    """
+    Format stage records as a table. Nested stages are indented under their
+    parent stage.
+
+    Inputs:
+        stage_records (lst): list of stage records. Default is the records of
+            this process.
+
+    Returns (str): summary table.
+    """
+    if stage_records is None:
+        stage_records = _RECORDS
+
+    def fmt(value):
+        return "" if value is None else str(value)
+
+    lines = [f"{'stage':<32}{'seconds':>9}{'rss +MB':>9}{'rows in':>10}"
+             f"{'rows out':>10}{'transl.':>9}  status"]
+    # Records are stored when a stage ends, so nested stages come before their
+    # parent. Sorting by start time shows them in the order they started
+    for r in sorted(stage_records, key=lambda r: (r["pid"], r["start"])):
+        label = "  " * r["depth"] + r["stage"]
+        if r.get("country"):
+            label += f" ({r['country']})"
+        if r.get("cached"):
+            label += " [cached]"
+        lines.append(f"{label:<32}{r['seconds']:>9.2f}{r['rss_delta_mb']:>9.1f}"
+                     f"{fmt(r['rows_in']):>10}{fmt(r['rows_out']):>10}"
+                     f"{r['translator_calls']:>9}  {r['status']}")
+
+    return "\n".join(lines)
@@ -0,0 +1,138 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Lazy clean data backend
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import pandas as pd
+from .get_data import resolve_schema
+from .clean_data import rename_columns, add_crop_flags, map_values
+from .hs_codes import hs_index, PREFIX_LENGTHS
+from .cache import apply_dtypes
+
+
+def import_polars():
+    """
+    Import Polars, an optional dependency only needed by this backend.
+
+    Returns (module): polars module.
+    """
+    try:
+        import polars as pl
+    except ImportError as e:
+        raise ImportError("The 'polars' backend needs the polars package. "
+                          "Install it with 'pip install polars'.") from e
+
+    return pl
+
+
+def hs_commodity_expr(pl, hs):
+    """
+    Build the expression that classifies HS codes into BSGI commodities by
+    their longest known prefix, like 'HSIndex.resolve'.
+
+    Inputs:
+        pl (module): polars module
+        hs (Expr): expression with HS codes as strings.
+
+    Returns (Expr): expression with BSGI commodities.
+    """
+    index = hs_index()
+    digits = hs.str.replace_all(r"\D", "")
+    lookups = []
+    for n in PREFIX_LENGTHS:
+        prefixes = {k: v for k, v in index.prefixes.items() if len(k) == n}
+        lookups.append(digits.str.slice(0, n).replace_strict(
+            prefixes, default=None, return_dtype=pl.String))
+
+    return pl.coalesce(lookups + [pl.lit(index.default)])
+
+
+def ig_query(path):
+    """
+    Build the lazy query that reads, renames, derives and filters raw Import
+    Genius data. Only the columns of the read schema are scanned, and the
+    filter on BSGI commodities only needs the HS code, so Polars applies it
+    while scanning the file, before the other columns are parsed.
+
+    Inputs:
+        path (str): path of the raw IG .csv file.
+
+    Returns (tuple): lazy query and dictionary with the pandas dtypes of the
+        columns of its result (see READ_SCHEMAS in config.py).
+    """
+    pl = import_polars()
+    header = pd.read_csv(path, nrows=0, encoding="utf-8").columns
+    usecols, dtype, dates = resolve_schema(header, "ig")
+    names = list(rename_columns(pd.DataFrame(columns=usecols), "ig").columns)
+    new_names = dict(zip(usecols, names))
+
+    pd_dtypes = {new_names[col]: dtype[col] for col in usecols
+                 if dtype.get(col) not in (None, "str")}
+    pd_dtypes.update({"bsgi_commodity": "category", "hs_crop": "category"})
+
+    # Import Genius cuts the leading 0 of some HS codes (see 'fix_hs_code')
+    hs_col = [col for col in usecols if new_names[col] == "hs_code"][0]
+    raw_hs = pl.col(hs_col)
+    hs = pl.when(raw_hs.str.len_chars() == 9).then(pl.lit("0") + raw_hs) \
+        .otherwise(raw_hs)
+    index = hs_index()
+    commodity = hs_commodity_expr(pl, hs)
+
+    exprs = []
+    for col in usecols:
+        expr = hs if col == hs_col else pl.col(col)
+        if col in dates:
+            expr = expr.str.strptime(pl.Datetime("ns"), dates[col])
+        elif dtype.get(col) == "float64":
+            expr = expr.cast(pl.Float64)
+        exprs.append(expr.alias(new_names[col]))
+
+    query = (
+        pl.scan_csv(path, infer_schema=False, encoding="utf8")
+        # The filter only uses a raw column, so it's pushed down to the scan
+        .filter(commodity != index.default)
+        .select(exprs + [commodity.alias("bsgi_commodity")])
+        .with_columns(
+            pl.col("date").dt.year().cast(pl.Int64).alias("year"),
+            pl.col("date").dt.month().cast(pl.Int64).alias("month"),
+            pl.col("bsgi_commodity").replace_strict(
+                index.crops, default=None, return_dtype=pl.String).alias("hs_crop"),
+            pl.col("product").str.to_lowercase(),
+        )
+        # Same column order as the pandas path
+        .select(names + ["year", "month", "bsgi_commodity", "hs_crop"])
+    )
+
+    return query, pd_dtypes
+
+
+def clean_ig_lazy(path, name_dict):
+    """
+    Clean Import Genius data with a lazy Polars query (see 'ig_query') that
+    runs multithreaded. Steps that map each unique value with Python (crop
+    flags and country names) run afterwards on the filtered rows, with the
+    same functions as the pandas path. The result has the same columns,
+    values and dtypes as cleaning with 'clean_data', correcting country names
+    and filtering BSGI commodities, but a new index, and categorical columns
+    don't keep the categories of filtered out rows.
+
+    Inputs:
+        path (str): path of the raw IG .csv file
+        name_dict (dict): dictionary with raw country names (lowercase) as keys
+            and correct names as values.
+
+    Returns (DataFrame): clean and filtered IG data.
+    """
+    query, dtypes = ig_query(path)
+    ig = apply_dtypes(query.collect().to_pandas(), dtypes)
+
+    # Columns 'prepare_raw' and 'create_columns' add. Polars divides by a
+    # constant multiplying by its inverse, which can change the last digit of
+    # the result, so weights are divided with pandas
+    ig.insert(ig.columns.get_loc("year"), "company_searched", ig["shipper"])
+    ig.insert(ig.columns.get_loc("month") + 1, "weight_ton", ig["weight_kg"] / 1000)
+    ig["country"] = map_values(ig["country"], lambda x: name_dict[x.lower()])
+    add_crop_flags(ig)
+
+    return ig
@@ -0,0 +1,91 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Record linkage match store
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import os
+import shutil
+import pandas as pd
+from config import RL_STORE_PATH, RL_STORE_VERSION
+from .cache import read_manifest, write_manifest, write_columnar, read_columnar
+
+
+def row_fingerprints(df):
+    """
+    Hash every row of a dataframe from its values (not its index), so a row
+    keeps its fingerprint when other rows are added or removed and gets a new
+    one when any of its values change.
+
+    Inputs:
+        df (DataFrame): dataframe.
+
+    Returns (Series): series of uint64 fingerprints with the same index as
+        'df'.
+    """
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def store_path(name):
+    """
+    Build the directory of a match store.
+
+    Inputs:
+        name (str): name of the match store, e.g. "ig_bsgi_sunflower".
+
+    Returns (str): directory of the match store.
+    """
+    return os.path.join(RL_STORE_PATH, name)
+
+
+def load_store(name, params):
+    """
+    Load stored matches if they were computed with the same parameters.
+
+    Inputs:
+        name (str): name of the match store
+        params (dict): record linkage parameters of the current run.
+
+    Returns (tuple): dataframe with stored matches ("fp_1" and "fp_2"
+        fingerprints and comparison features) and the sets of fingerprints of
+        the rows of both datasets compared so far, or None if there's no
+        usable store.
+    """
+    path = store_path(name)
+    manifest = read_manifest(os.path.join(path, "manifest.json"))
+    if manifest != {"version": RL_STORE_VERSION, "params": params}:
+        return None
+
+    matches = read_columnar(os.path.join(path, "matches.parquet"))
+    rows_1 = set(read_columnar(os.path.join(path, "rows_1.parquet"))["fp"])
+    rows_2 = set(read_columnar(os.path.join(path, "rows_2.parquet"))["fp"])
+
+    return matches, rows_1, rows_2
+
+
+def save_store(name, params, matches, fp_1, fp_2):
+    """
+    Save matches with the fingerprints of the rows they were computed from.
+    The manifest is written last, so an interrupted save is never loaded.
+
+    Inputs:
+        name (str): name of the match store
+        params (dict): record linkage parameters of the run
+        matches (DataFrame): dataframe with "fp_1" and "fp_2" fingerprints and
+            comparison features
+        fp_1 (Series): fingerprints of the rows of the first dataset
+        fp_2 (Series): fingerprints of the rows of the second dataset.
+
+    Returns: None.
+    """
+    path = store_path(name)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+    write_columnar(matches, os.path.join(path, "matches.parquet"))
+    write_columnar(pd.DataFrame({"fp": fp_1.unique()}),
+                   os.path.join(path, "rows_1.parquet"))
+    write_columnar(pd.DataFrame({"fp": fp_2.unique()}),
+                   os.path.join(path, "rows_2.parquet"))
+    write_manifest(os.path.join(path, "manifest.json"),
+                   {"version": RL_STORE_VERSION, "params": params})
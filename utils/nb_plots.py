@@ -5,28 +5,23 @@
 # DSI
 
 import pandas as pd
-from .transform_data import create_wide_table
-from .plot import cargo_grouping, plot_stack_bar, plot_pie
+from .transform_data import create_wide_table, create_wide_tables
+from .plot import plot_stack_bar, plot_pie
+from .cube import as_cube
 
 def estimate_table_percentages(table):
     """
-    Add non-repeated values from 'new_dict' to 'old_dict' based on keys.
+    Turn a wide table into the percentage of each column in each month.
 
     Inputs:
-        old_dict (dict): dictionary with parent companies as keys and
-            subsidaries as values.
-        new_dict (dict): dictionary with parent companies as keys and new
-            subsidaries as values.
+        table (DataFrame): wide table with a monthly PeriodIndex (see
+            'create_wide_table').
 
-    Returns (dict): None. The function does the change in place of the input
-        'old_dict'.
+    Returns (DataFrame): table with percentages (rows add up to 100).
     """
     table = table.fillna(0)
-    date = table["date"]
-    percentage_df = table.drop(columns=["date"]).divide(table.drop(columns=\
-                                            ["date"]).sum(axis=1), axis=0) * 100
+    percentage_df = table.divide(table.sum(axis=1), axis=0) * 100
     percentage_df = percentage_df.round(2)
-    percentage_df["date"] = date
     
     return percentage_df
 
@@ -37,23 +32,23 @@ def plot_multiple_countries(country_dict, data, y_axis_limit, source):
     Inputs:
         country_dict (dict): dictionary with country names in BSGI as keys
             (in English) and country names in IG as values (Ukrainian)
-        data (DataFrame): dataset with information to plot
+        data (DataFrame): export cube or clean data with information to plot
         y_axis_limit (int): y axis limit in scale
         source (str): text to say which is the data source for the plot.
 
     Returns (dict): None. The function plots the stacked bar charts.
     """
+    # Tables of every country come from one groupby, so the loop only plots
+    tables = create_wide_tables(data, by="country")
     for country_en, country_uk in country_dict.items():
-        ig_country = data[data["country"] == country_uk]
-        pivot_country = create_wide_table(ig_country,
-                                          ["year", "month", "company_std"],
-                                          ["weight_ton"],
-                                          ["year", "month", "company_std"], True,
-                                          {"weight_ton": "sum"})
+        pivot_country = tables.get(country_uk)
+        if pivot_country is None:
+            print(f"No exports to {country_en.capitalize()}")
+            continue
         plot_stack_bar(pivot_country, "Total exports by company",
                        "Weight of exports (metric tons)",
                        f"Total exports to {country_en.capitalize()} by company",
-                       "date", y_axis_limit, source)
+                       None, y_axis_limit, source)
 
 def plot_all_period(data, source, min_wedge_percentage=2,
                     min_legend_percentage=0):
@@ -62,7 +57,7 @@ def plot_all_period(data, source, min_wedge_percentage=2,
         (August 2022 until March 2023), not by month.
 
     Inputs:
-        data (DataFrame): dataset with information to plot
+        data (DataFrame): export cube or clean data with information to plot
         source (str): text to say which is the data source for the plot
         min_wedge_percentage (float, optional): minimum percentage threshold for
             annotating wedges (default is 2)
@@ -71,8 +66,9 @@ def plot_all_period(data, source, min_wedge_percentage=2,
 
     Returns (DataFrame): table used to plot pie chart.
     """
-    whole_period_g = cargo_grouping(data, ["company_std"], ["weight_ton"],
-                                    ["weight_ton"], False, {"weight_ton": "sum"})
+    whole_period_g = as_cube(data).groupby("company_std", as_index=False,
+                                           observed=True)["weight_ton"].sum()
+    whole_period_g = whole_period_g.sort_values(by="weight_ton", ascending=False)
     whole_period_g = whole_period_g.reset_index(drop=True)
     plot_pie(whole_period_g["company_std"], whole_period_g["weight_ton"],
              "Company category",
@@ -88,9 +84,9 @@ def plot_pc_monthly(df, group, agg_cols, sort, asc_bool, agg_dict, x_title,
         (August 2022 until March 2023) by month for one country.
 
     Inputs:
-        df (DataFrame): dataset to be used
+        df (DataFrame): export cube or clean data
         group (lst): list of columns to group by
-        other_cols(lst): list of columns that are going to be aggregated
+        agg_cols(lst): list of columns that are going to be aggregated
         sort (lst): list of columns to sort dataframe by. If new_name is not
             empty then the new column names should be used
         asc_bool (bool): boolean stating wheter or not to sort data "ascending"
@@ -101,7 +97,8 @@ def plot_pc_monthly(df, group, agg_cols, sort, asc_bool, agg_dict, x_title,
         x_title (str): horizontal axis title
         y_title (str): horizontal axis title
         plot_title (str): plot title
-        x_axis_ticks (str): name of column to use for x axis tick names
+        x_axis_ticks (str): name of column to use for x axis tick names. If
+            None, months of the table index are used
         data_source (str): data source text.
 
     Return: None. Function plots pie chart.
@@ -4,8 +4,11 @@
 # Last modified: 07/26/23
 # DSI
 
+import os
 import matplotlib.pyplot as plt
+from config import OUTPUT_PATH
 from .clean_data import standard_name
+from .cube import as_cube, period_labels
 import numpy as np
 from matplotlib.ticker import FuncFormatter
 import pandas as pd
@@ -37,7 +40,8 @@ def cargo_grouping(df, group, agg_cols, sort, asc_bool, agg_dict,
 
     cols = agg_cols[:]
     cols.extend(group)
-    df_g = df.loc[:, cols].groupby(group, as_index=False)
+    # observed=True so categorical columns only produce groups that exist
+    df_g = df.loc[:, cols].groupby(group, as_index=False, observed=True)
 
     if new_name is not None:
         col_dict = {}
@@ -73,6 +77,9 @@ def plot_line(x_axis, y_axis, line_labels, graph_title, x_label, y_label,
         data_source (str): data source for plot
         save_fig (bool): boolean that states whether or not to save figure in
             "output" directory.
+
+    Returns (Figure): figure of the chart. It isn't closed, so close it with
+        'plt.close' when it's not needed (see utils/render.py).
     """
     fig, ax = plt.subplots(figsize=(12, 6))
 
@@ -85,19 +92,71 @@ def plot_line(x_axis, y_axis, line_labels, graph_title, x_label, y_label,
 
     plt.setp(ax.get_xticklabels(), rotation=30, horizontalalignment='right')
 
-    plt.title(graph_title)
-    plt.xlabel(x_label)
-    plt.ylabel(y_label)
-    plt.legend()
+    ax.set_title(graph_title)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.legend()
     spacing = 0.1
     fig.subplots_adjust(bottom=spacing)
 
     ax.yaxis.set_major_formatter(FuncFormatter(format_func))
-    plt.annotate(f"Source: {data_source}.", (0, 0), (-90, -60), fontsize=6, 
+    ax.annotate(f"Source: {data_source}.", (0, 0), (-90, -60), fontsize=6, 
              xycoords='axes fraction', textcoords='offset points', va='top')
 
     if save_fig:
-        plt.savefig("app/output/" + standard_name(graph_title) + ".png")
+        os.makedirs(OUTPUT_PATH, exist_ok=True)
+        fig.savefig(os.path.join(OUTPUT_PATH, standard_name(graph_title) + ".png"))
+
+    return fig
+
+def monthly_exports(df_1, df_2, crop=None):
+    """
+    Get the monthly exports of a company and the total BSGI exports, in the
+    months with data in both datasets.
+
+    Inputs:
+        df_1 (DataFrame): export cube or Import Genius data of the company
+        df_2 (DataFrame): clean BSGI data
+        crop (str): optional crop to filter both datasets by.
+
+    Returns (DataFrame): table with a monthly PeriodIndex and "weight_ton_ig"
+        and "weight_ton_bsgi" columns.
+    """
+    # Import Genius data, monthly from the export cube
+    cube = as_cube(df_1)
+    if crop is not None:
+        cube = cube.loc[cube.loc[:, crop] == True]
+        df_2 = df_2.loc[df_2.loc[:, "product_std"] == crop]
+    ig_g = cube.groupby("period")["weight_ton"].sum()
+
+    # BSGI data
+    bsgi_g = df_2.groupby(df_2["date"].dt.to_period("M"))["weight_ton"].sum()
+
+    return pd.concat([ig_g, bsgi_g], axis=1, join="inner",
+                     keys=["weight_ton_ig", "weight_ton_bsgi"])
+
+def plot_total_exports(df_1, df_2, data_source, save_fig=True):
+    """
+    Plot line chart with the exports of one company and the total BSGI
+        exports
+
+    Inputs:
+        df_1 (DataFrame): export cube or Import Genius data to use for first
+            line
+        df_2 (DataFrame): clean BSGI data to use for second line
+        data_source (str): data source for plot
+        save_fig (bool): boolean that states wheter or not to save figure in
+            "output" directory.
+
+    Returns (Figure): figure of the chart.
+    """
+    final = monthly_exports(df_1, df_2)
+
+    return plot_line(period_labels(final.index),
+                     [final["weight_ton_ig"], final["weight_ton_bsgi"]],
+                     ["Kernel", "Black Sea Grain Initiative"],
+                     "BSGI and Kernel volume of exports", "Export date (m-yy)",
+                     "Products exported (tons)", data_source, save_fig)
 
 def plot_crops(crop, df_1, df_2, data_source, save_fig=True):
     """
@@ -106,31 +165,23 @@ def plot_crops(crop, df_1, df_2, data_source, save_fig=True):
 
     Inputs:
         crop (str): name of crop that we want to plot
-        df_1 (DataFrame): dataset to use for first line
+        df_1 (DataFrame): export cube or Import Genius data to use for first
+            line
         df_2 (DataFrame): dataset to use for second line
         data_source (str): data source for plot
         save_fig (bool): boolean that states wheter or not to save figure in
             "output" directory.
-    """
 
-    crop_kernel = df_1.loc[df_1.loc[:, crop] == True]
-    kernel_g = cargo_grouping(crop_kernel, ["year", "month"], ["weight_ton"],
-                              ["year", "month"], True, {"weight_ton": "sum"})
-    kernel_g["date"] = kernel_g["month"].astype(str) + "/" + kernel_g["year"].astype(str)
-
-    # BSGI data
-    crop_bsgi = df_2.loc[df_2.loc[:, "product_std"] == crop]
-    outbound_g = cargo_grouping(crop_bsgi, ["year", "month"], ["weight_ton"],
-                                ["year", "month"], True, {"weight_ton": "sum"})
-    outbound_g["date"] = outbound_g["month"].astype(str) + "/" + outbound_g["year"].astype(str)
-
-    # Plot together
-    final = kernel_g.merge(outbound_g, on="date", suffixes=("_kernel", "_bsgi"))
+    Returns (Figure): figure of the chart.
+    """
+    final = monthly_exports(df_1, df_2, crop)
 
-    plot_line(final["date"], [final["weight_ton_kernel"], final["weight_ton_bsgi"]],
-              ["Kernel", "Black Sea Grain Initiative"],
-              "BSGI and Kernel volume of {} exports".format(crop),
-              "Export date (m-yy)", "{} exported (tons)".format(crop), save_fig)
+    return plot_line(period_labels(final.index),
+                     [final["weight_ton_ig"], final["weight_ton_bsgi"]],
+                     ["Kernel", "Black Sea Grain Initiative"],
+                     "BSGI and Kernel volume of {} exports".format(crop),
+                     "Export date (m-yy)", "{} exported (tons)".format(crop),
+                     data_source, save_fig)
 
 
 def label(percentage, data, min_wedge_percentage):
@@ -273,20 +324,27 @@ def plot_stack_bar(df, x_title, y_title, plot_title, x_ticks, ylim, data_source)
         x_title (str): horizontal axis title
         y_title (str): horizontal axis title
         plot_title (str): plot title
-        x_ticks (str): name of column to use for x axis tick names
+        x_ticks (str): name of column to use for x axis tick names. If None,
+            the index is used (months of a PeriodIndex as "m/yyyy")
         ylim (int): limit for y axis
         data_source (str): data source text.
     """
     # df = df.apply(pd.to_numeric, errors='coerce')
     
-    color_palette = plt.cm.get_cmap('tab20c', len(df.columns))
+    color_palette = plt.get_cmap('tab20c', len(df.columns))
 
     ax = df.plot.bar(stacked=True, figsize=(8,6), color=color_palette.colors)
     ax.set_title(plot_title, fontsize=20)
     ax.set_ylim(0,ylim)
     ax.set_xlabel(x_title)
     ax.set_ylabel(y_title)
-    ax.set_xticklabels(df[x_ticks], rotation=0)
+    if x_ticks is None:
+        x_labels = df.index
+        if isinstance(x_labels, pd.PeriodIndex):
+            x_labels = period_labels(x_labels)
+    else:
+        x_labels = df[x_ticks]
+    ax.set_xticklabels(x_labels, rotation=0)
     for p in ax.patches:
         width, height = p.get_width(), p.get_height()
         x, y = p.get_xy()
@@ -4,8 +4,29 @@
 # Last modified: 07/20/23
 # DSI
 
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+import pandas as pd
 import recordlinkage
-from config import PRODUCTS_VAL
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse.csgraph import (connected_components,
+                                  min_weight_full_bipartite_matching)
+from recordlinkage.algorithms.string import jarowinkler_similarity
+from .match_store import row_fingerprints, load_store, save_store
+from config import (
+    PRODUCTS_VAL,
+    RL_MEMORY_BUDGET_MB,
+    RL_PAIR_BYTES,
+    RL_FEATURE_BYTES,
+    RL_MAX_WORKERS,
+    RL_STRING_THRESHOLD,
+    RL_WEIGHT_VAR,
+    RL_DENSE_ASSIGNMENT_CELLS,
+)
 from .plot import cargo_grouping
 
 def test_crop(crop):
@@ -43,60 +64,800 @@ def filter_crop(df, crop, source):
     return crop
 
 
-def find_matches(df_1, df_2, exact_vars= None, string_vars=None,
-                 block_vars=None):
+def day_number(dates):
     """
-    Find all possible matches between two datasets based on different columns
+    Turn dates into the number of days since 1970-01-01.
+
+    Inputs:
+        dates (Series): series with dates.
+
+    Returns (Series): series with integer day numbers.
+    """
+    return (dates - pd.Timestamp("1970-01-01")).dt.days
+
+
+def estimate_pairs(df_1, df_2, block_vars=None, date_window=None):
+    """
+    Count the candidate pairs of a blocking strategy without building them.
+    Only the number of rows per block is used, so it's cheap even when the
+    candidate index wouldn't fit in memory.
 
     Inputs:
         df_1 (DataFrame): first dataset to match
         df_2 (DataFrame): second dataset to match
-        exact_vars (lst): list of strings with variables names we want to match
-            exactly. If empty, it's set to "None" by default
-        string_vars (lst): list of strings with variables names we want to match
-            by the Jaro Winkler distance rule. If empty, it's set to "None" by
-            default
-        block_vars (lst): list of strings with blocking variables names. If
-            empty, it's set to "None" by default.
+        block_vars (lst): list of columns that form a composite blocking key.
+            If None, every pair of rows is a candidate
+        date_window (int): if not None, maximum number of days between the
+            "date" of a candidate pair (sorted neighbourhood over date).
 
-    Returns (DataFrame): dataframe with matches from both datasets. Matches are
-        not necessarily unique.
+    Returns (int): number of candidate pairs.
     """
+    keys = [var for var in block_vars or [] if var != "date" or date_window is None]
+    if date_window is not None:
+        keys.append("date")
+    if not keys:
+        return len(df_1) * len(df_2)
 
-    indexer = recordlinkage.Index()
+    counts_1 = df_1.groupby(keys, observed=True).size().rename("n_1").reset_index()
+    counts_2 = df_2.groupby(keys, observed=True).size().rename("n_2").reset_index()
+
+    n_pairs = 0
+    for days in range(-(date_window or 0), (date_window or 0) + 1):
+        shifted = counts_2.copy()
+        if days:
+            shifted["date"] = shifted["date"] + pd.Timedelta(days=days)
+        block_counts = counts_1.merge(shifted, on=keys)
+        n_pairs += int((block_counts["n_1"] * block_counts["n_2"]).sum())
+
+    return n_pairs
 
-    if block_vars is not None:
-        for block in block_vars:
-            indexer.block(block)
+
+def pairs_budget(n_features):
+    """
+    Find the maximum number of candidate pairs that fit in the record linkage
+    memory budget (RL_MEMORY_BUDGET_MB in config.py).
+
+    Inputs:
+        n_features (int): number of compared variables.
+
+    Returns (int): maximum number of candidate pairs.
+    """
+    pair_bytes = RL_PAIR_BYTES + RL_FEATURE_BYTES * n_features
+
+    return int(RL_MEMORY_BUDGET_MB * 2 ** 20) // pair_bytes
+
+
+def check_budget(df_1, df_2, block_vars, date_window, n_features,
+                 on_budget="tighten"):
+    """
+    Estimate the candidate pairs of a blocking strategy and make sure they fit
+    in the memory budget. The date window is halved until the pairs fit (a
+    window of 0 days is blocking on exact date).
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        block_vars (lst): list of columns that form a composite blocking key
+        date_window (int): maximum number of days between the "date" of a
+            candidate pair or None
+        n_features (int): number of compared variables
+        on_budget (str): what to do when the pairs don't fit in the budget:
+            "tighten" the date window or "raise" an error. Default is
+            "tighten".
+
+    Returns (tuple): date window to use and estimated number of candidate
+        pairs.
+    """
+    assert on_budget in ["tighten", "raise"], \
+        "Wrong budget option Error: on_budget must be 'tighten' or 'raise'."
+    max_pairs = pairs_budget(n_features)
+    n_pairs = estimate_pairs(df_1, df_2, block_vars, date_window)
+
+    while n_pairs > max_pairs and on_budget == "tighten" and date_window:
+        date_window //= 2
+        n_pairs = estimate_pairs(df_1, df_2, block_vars, date_window)
+        print(f"Candidate pairs over budget. Tightening date window to "
+              f"{date_window} days ({n_pairs} pairs)")
+
+    if n_pairs > max_pairs:
+        raise ValueError(
+            f"{n_pairs} candidate pairs exceed the budget of {max_pairs} pairs "
+            f"({RL_MEMORY_BUDGET_MB} MB). Add blocking variables, use a "
+            "smaller date window or raise RL_MEMORY_BUDGET_MB in config.py."
+        )
+
+    return date_window, n_pairs
+
+
+def build_index(df_1, df_2, block_vars=None, date_window=None):
+    """
+    Build the candidate pairs of a blocking strategy.
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        block_vars (lst): list of columns that form a composite blocking key.
+            If None, every pair of rows is a candidate
+        date_window (int): if not None, maximum number of days between the
+            "date" of a candidate pair (sorted neighbourhood over date).
+
+    Returns (MultiIndex): candidate pairs of df_1 and df_2 index labels.
+    """
+    indexer = recordlinkage.Index()
+    keys = [var for var in block_vars or [] if var != "date" or date_window is None]
+
+    if date_window is not None:
+        # Sorting over every calendar day makes the window a number of days
+        # and not a number of distinct dates
+        dates = pd.concat([df_1["date"], df_2["date"]])
+        days = pd.date_range(dates.min(), dates.max(), freq="D")
+        indexer.sortedneighbourhood("date", window=2 * date_window + 1,
+                                    sorting_key_values=days, block_on=keys)
+    elif keys:
+        indexer.block(keys)
     else:
         indexer.full()
-    candidate_links = indexer.index(df_1, df_2)
+
+    return indexer.index(df_1, df_2)
+
+
+def compare_block(df_1, df_2, exact_vars, string_vars, block_vars=None,
+                  date_window=None, lookups=None):
+    """
+    Build the candidate pairs of a block of rows, compare them and keep the
+    matches.
+
+    Inputs:
+        df_1 (DataFrame): rows of the first dataset in the block
+        df_2 (DataFrame): rows of the second dataset in the block
+        exact_vars (lst): list of variables names we want to match exactly
+        string_vars (lst): list of variables names we want to match by the
+            Jaro Winkler distance rule
+        block_vars (lst): list of columns that form a composite blocking key
+        date_window (int): maximum number of days between the "date" of a
+            candidate pair or None
+        lookups (dict): optional dictionary with string variables as keys and
+            (categorical dtype, similarity matrix) tuples as values (see
+            'string_lookups'). These variables must be categorical with that
+            dtype and are compared by looking up their codes.
+
+    Returns (DataFrame): dataframe with the index labels of the matched rows
+        and their comparison features.
+    """
+    lookups = lookups or {}
+    candidate_links = build_index(df_1, df_2, block_vars, date_window)
 
     # Comparison step
     compare_cl = recordlinkage.Compare()
-
-    if exact_vars is not None:
-        for exact in exact_vars:
+    left = df_1[exact_vars + string_vars].copy()
+    right = df_2[exact_vars + string_vars].copy()
+
+    for exact in exact_vars:
+        if exact == "date" and date_window:
+            left["date"] = day_number(left["date"])
+            right["date"] = day_number(right["date"])
+            compare_cl.numeric("date", "date", method="step",
+                               offset=date_window, label="date")
+        else:
             compare_cl.exact(exact, exact, label=exact)
-    if string_vars is not None:
-        for string in string_vars:
+    for string in string_vars:
+        if string not in lookups:
             compare_cl.string(string, string, method="jarowinkler",
-                              threshold=0.9, label=string)
+                              threshold=RL_STRING_THRESHOLD, label=string)
 
-    features = compare_cl.compute(candidate_links, df_1, df_2)
+    if compare_cl.features:
+        features = compare_cl.compute(candidate_links, left, right)
+    else:
+        features = pd.DataFrame(index=candidate_links)
+
+    pos_1 = df_1.index.get_indexer(candidate_links.get_level_values(0))
+    pos_2 = df_2.index.get_indexer(candidate_links.get_level_values(1))
+    for string, (_, matrix) in lookups.items():
+        codes_1 = df_1[string].cat.codes.to_numpy()[pos_1]
+        codes_2 = df_2[string].cat.codes.to_numpy()[pos_2]
+        features[string] = lookup_similarity(codes_1, codes_2, matrix)
+    features = features[exact_vars + string_vars]
 
     # Classification step
     matches = features[features.sum(axis=1) > 1]
-    matches = matches.reset_index()
+
+    return matches.reset_index()
+
+
+@lru_cache(maxsize=32)
+def similarity_matrix(vocabulary, threshold=RL_STRING_THRESHOLD):
+    """
+    Compute the Jaro Winkler similarity between every pair of values of a
+    small vocabulary (e.g. country names) once.
+
+    Inputs:
+        vocabulary (tuple): tuple with unique strings
+        threshold (float): minimum similarity of two matching strings. If
+            None, the similarity itself is returned. Default is
+            RL_STRING_THRESHOLD in config.py.
+
+    Returns (ndarray): square matrix with 1.0 where the similarity of two
+        values is at least 'threshold' and 0.0 otherwise.
+    """
+    n = len(vocabulary)
+    values = np.array(vocabulary, dtype=object)
+    sim = jarowinkler_similarity(np.repeat(values, n), np.tile(values, n))
+    sim = sim.to_numpy().reshape(n, n)
+    if threshold is None:
+        return sim
+
+    return (sim >= threshold).astype("float64")
+
+
+def string_lookups(df_1, df_2, string_vars, threshold=RL_STRING_THRESHOLD):
+    """
+    Build the similarity lookup of each string variable over the unique
+    values of both datasets.
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        string_vars (lst): list of variables names we want to match by the
+            Jaro Winkler distance rule
+        threshold (float): minimum similarity of two matching strings.
+            Default is RL_STRING_THRESHOLD in config.py.
+
+    Returns (dict): dictionary with string variables as keys and tuples with
+        a categorical dtype of the vocabulary and its similarity matrix as
+        values.
+    """
+    lookups = {}
+    for var in string_vars:
+        values = set(df_1[var].dropna()) | set(df_2[var].dropna())
+        vocabulary = tuple(sorted(values))
+        lookups[var] = (pd.CategoricalDtype(vocabulary),
+                        similarity_matrix(vocabulary, threshold))
+
+    return lookups
+
+
+def lookup_similarity(codes_1, codes_2, matrix):
+    """
+    Look up the similarity of pairs of values by their vocabulary codes.
+
+    Inputs:
+        codes_1 (ndarray): codes of the first value of each pair (-1 if
+            missing)
+        codes_2 (ndarray): codes of the second value of each pair (-1 if
+            missing)
+        matrix (ndarray): similarity matrix of the vocabulary.
+
+    Returns (ndarray): similarity of each pair. Pairs with a missing value
+        get 0.0.
+    """
+    found = (codes_1 >= 0) & (codes_2 >= 0)
+
+    return np.where(found, matrix[codes_1, codes_2], 0.0)
+
+
+def is_exact(df_1, df_2, var, lookup):
+    """
+    Check if a string comparison is effectively exact: every value of df_1 is
+    only similar to the same value in df_2.
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        var (str): string variable
+        lookup (tuple): categorical dtype and similarity matrix of 'var'.
+
+    Returns (bool): True if the comparison is the same as an exact match.
+    """
+    dtype, matrix = lookup
+    codes_1 = np.unique(df_1[var].astype(dtype).cat.codes)
+    codes_2 = np.unique(df_2[var].astype(dtype).cat.codes)
+    codes_1, codes_2 = codes_1[codes_1 >= 0], codes_2[codes_2 >= 0]
+    equal = codes_1[:, None] == codes_2[None, :]
+
+    return np.array_equal(matrix[np.ix_(codes_1, codes_2)], equal.astype("float64"))
+
+
+def hash_join(df_1, df_2, exact_vars, string_vars, block_vars=None):
+    """
+    Match two datasets on exactly equal values, without building candidate
+    pairs. Only valid when the string comparisons are effectively exact (see
+    'is_exact').
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        exact_vars (lst): list of variables names we want to match exactly
+        string_vars (lst): list of variables names we want to match by the
+            Jaro Winkler distance rule
+        block_vars (lst): list of columns that form a composite blocking key.
+
+    Returns (DataFrame): dataframe with the index labels of the matched rows
+        and their comparison features (all equal to 1).
+    """
+    names = [df_1.index.name or "level_0", df_2.index.name or "level_1"]
+    keys = list(dict.fromkeys(exact_vars + string_vars + list(block_vars or [])))
+    left = df_1[keys].dropna().rename_axis(names[0]).reset_index()
+    right = df_2[keys].dropna().rename_axis(names[1]).reset_index()
+    matches = left.merge(right, on=keys)[names]
+    # Same dtypes as the features of recordlinkage's exact and string
+    # comparisons
+    for exact in exact_vars:
+        matches[exact] = 1
+    for string in string_vars:
+        matches[string] = 1.0
+
+    return matches
+
+
+def partition_blocks(df_1, df_2, block_vars=None, date_window=None,
+                     max_pairs=None):
+    """
+    Split two datasets into blocks that can be compared independently. Rows
+    of df_1 are grouped by the blocking variables other than "date" and each
+    group gets the df_2 rows that can be its candidates. Groups with more
+    than 'max_pairs' candidate pairs are split into chunks of df_1 rows
+    (sorted by date when blocking on date). Every candidate pair belongs to
+    exactly one block.
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        block_vars (lst): list of columns that form a composite blocking key
+        date_window (int): maximum number of days between the "date" of a
+            candidate pair or None
+        max_pairs (int): optional maximum number of candidate pairs of a
+            block.
+
+    Returns (lst): list of (df_1 positions, df_2 positions) array tuples.
+    """
+    block_vars = block_vars or []
+    keys = [var for var in block_vars if var != "date"]
+    by_date = date_window is not None or "date" in block_vars
+    window = np.timedelta64(date_window or 0, "D")
+
+    if keys:
+        key_ids = pd.concat([df_1[keys], df_2[keys]]).groupby(keys, observed=True)\
+                    .ngroup().fillna(-1).astype(int).to_numpy()
+    else:
+        key_ids = np.zeros(len(df_1) + len(df_2), dtype=int)
+    ids_1, ids_2 = key_ids[:len(df_1)], key_ids[len(df_1):]
+    rows_1 = pd.Series(np.arange(len(df_1))).groupby(ids_1).indices
+    rows_2 = pd.Series(np.arange(len(df_2))).groupby(ids_2).indices
+    if by_date:
+        dates_1 = df_1["date"].to_numpy()
+        dates_2 = df_2["date"].to_numpy()
+
+    blocks = []
+    for key_id, pos_1 in rows_1.items():
+        # Rows with missing blocking keys are never candidates
+        if key_id == -1 or key_id not in rows_2:
+            continue
+        n_chunks = 1
+        if max_pairs:
+            n_pairs = estimate_pairs(df_1.iloc[pos_1], df_2.iloc[rows_2[key_id]],
+                                     block_vars, date_window)
+            n_chunks = max(-(-n_pairs // max_pairs), 1)
+        if by_date:
+            pos_1 = pos_1[np.argsort(dates_1[pos_1], kind="stable")]
+        for chunk in np.array_split(pos_1, min(n_chunks, len(pos_1))):
+            pos_2 = rows_2[key_id]
+            if by_date:
+                first, last = dates_1[chunk].min(), dates_1[chunk].max()
+                in_range = (dates_2[pos_2] >= first - window) & \
+                           (dates_2[pos_2] <= last + window)
+                pos_2 = pos_2[in_range]
+            if len(pos_2):
+                blocks.append((np.sort(chunk), pos_2))
+
+    return blocks
+
+
+def iter_matches(df_1, df_2, exact_vars, string_vars, block_vars=None,
+                 date_window=None, max_workers=None, max_pairs=None,
+                 lookups=None):
+    """
+    Compare two datasets block by block in a process pool and yield the
+    matches of each block as soon as they are ready, so only the candidate
+    pairs of the blocks being compared are in memory.
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        exact_vars (lst): list of variables names we want to match exactly
+        string_vars (lst): list of variables names we want to match by the
+            Jaro Winkler distance rule
+        block_vars (lst): list of columns that form a composite blocking key
+        date_window (int): maximum number of days between the "date" of a
+            candidate pair or None
+        max_workers (int): maximum number of worker processes. Default is
+            RL_MAX_WORKERS in config.py (None uses every CPU). With 1 worker
+            or a single block, blocks are compared in this process
+        max_pairs (int): optional maximum size of a block (see
+            'partition_blocks')
+        lookups (dict): optional similarity lookups of string variables (see
+            'string_lookups').
+
+    Returns (generator): dataframes with the matches of each block, in block
+        order.
+    """
+    columns = list(dict.fromkeys(
+        list(block_vars or []) + (["date"] if date_window is not None else []) +
+        exact_vars + string_vars
+    ))
+    blocks = partition_blocks(df_1, df_2, block_vars, date_window, max_pairs)
+    dtypes = {var: dtype for var, (dtype, _) in (lookups or {}).items()}
+    left = df_1[columns].astype(dtypes)
+    right = df_2[columns].astype(dtypes)
+    tasks = ((left.iloc[pos_1], right.iloc[pos_2], exact_vars, string_vars,
+              block_vars, date_window, lookups)
+             for pos_1, pos_2 in blocks)
+
+    max_workers = max_workers or RL_MAX_WORKERS or os.cpu_count()
+    if max_workers == 1 or len(blocks) == 1:
+        for task in tasks:
+            yield compare_block(*task)
+        return
+
+    # Only a few blocks per worker are submitted ahead of the results
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(compare_block, *task))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def find_matches(df_1, df_2, exact_vars= None, string_vars=None,
+                 block_vars=None, date_window=None, on_budget="tighten",
+                 max_workers=None):
+    """
+    Find all possible matches between two datasets based on different columns.
+    Candidate pairs are compared block by block in parallel (see
+    'iter_matches').
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        exact_vars (lst): list of strings with variables names we want to match
+            exactly. If empty, it's set to "None" by default
+        string_vars (lst): list of strings with variables names we want to match
+            by the Jaro Winkler distance rule. If empty, it's set to "None" by
+            default
+        block_vars (lst): list of strings with blocking variables names. They
+            form a single composite key (e.g. ["date", "country"]). If empty,
+            it's set to "None" by default
+        date_window (int): if not None, rows whose dates are at most this
+            number of days apart are candidates (sorted neighbourhood over
+            "date" inside the blocks of the other blocking variables) and
+            "date" in 'exact_vars' matches within the window. Default is None
+        on_budget (str): "tighten" the date window or "raise" an error when
+            the candidate pairs would exceed RL_MEMORY_BUDGET_MB. Default is
+            "tighten"
+        max_workers (int): maximum number of worker processes. Default is
+            RL_MAX_WORKERS in config.py.
+
+    Returns (DataFrame): dataframe with matches from both datasets. Matches are
+        not necessarily unique.
+    """
+    exact_vars = exact_vars or []
+    string_vars = string_vars or []
+    n_features = len(exact_vars) + len(string_vars)
+    lookups = string_lookups(df_1, df_2, string_vars)
+
+    # With two features a match needs both, so if the string comparisons
+    # are effectively exact it's the same as joining on equal values
+    if n_features == 2 and not date_window and \
+            all(is_exact(df_1, df_2, var, lookups[var]) for var in string_vars):
+        print("String comparisons are exact. Matching with a hash join")
+        blocks = [hash_join(df_1, df_2, exact_vars, string_vars, block_vars)]
+    else:
+        date_window, n_pairs = check_budget(df_1, df_2, block_vars, date_window,
+                                            n_features, on_budget)
+        print("Number of candidate pairs: ", n_pairs)
+
+        # Each worker gets an equal share of the memory budget and at least
+        # one block
+        max_workers = max_workers or RL_MAX_WORKERS or os.cpu_count()
+        max_pairs = min(pairs_budget(n_features), n_pairs) // max_workers
+        blocks = list(iter_matches(df_1, df_2, exact_vars, string_vars,
+                                   block_vars, date_window, max_workers,
+                                   max_pairs, lookups))
+
+    names = [df_1.index.name or "level_0", df_2.index.name or "level_1"]
+    if blocks:
+        matches = pd.concat(blocks, ignore_index=True)
+        matches = matches.sort_values(names, ignore_index=True)
+    else:
+        matches = pd.DataFrame(columns=names + exact_vars + string_vars)
     print("Number of matches: ",len(matches))
 
     return matches
 
 
+def incremental_matches(df_1, df_2, store, exact_vars=None, string_vars=None,
+                        block_vars=None, date_window=None, on_budget="tighten",
+                        max_workers=None):
+    """
+    Find all possible matches between two datasets reusing the matches stored
+    by a previous run with the same parameters. Rows are identified by a
+    fingerprint of their values: only rows that are new or changed since the
+    stored run are compared (against all rows of the other dataset, inside
+    their blocks), stored matches of rows that are gone or changed are
+    dropped and the result is stored again. The date window is checked
+    against the memory budget once, on the whole datasets, and that window is
+    used for every comparison, so the matches don't depend on how many rows
+    are new.
+
+    Inputs:
+        df_1 (DataFrame): first dataset to match
+        df_2 (DataFrame): second dataset to match
+        store (str): name of the match store, e.g. "ig_bsgi_sunflower"
+        exact_vars, string_vars, block_vars, date_window, on_budget,
+            max_workers: see 'find_matches'.
+
+    Returns (DataFrame): dataframe with matches from both datasets, the same
+        as 'find_matches' on the whole datasets.
+    """
+    exact_vars = exact_vars or []
+    string_vars = string_vars or []
+    if date_window:
+        date_window, _ = check_budget(df_1, df_2, block_vars, date_window,
+                                      len(exact_vars) + len(string_vars),
+                                      on_budget)
+    params = {"exact_vars": exact_vars, "string_vars": string_vars,
+              "block_vars": block_vars, "date_window": date_window,
+              "string_threshold": RL_STRING_THRESHOLD,
+              "memory_budget_mb": RL_MEMORY_BUDGET_MB}
+    names = [df_1.index.name or "level_0", df_2.index.name or "level_1"]
+    fp_1 = row_fingerprints(df_1)
+    fp_2 = row_fingerprints(df_2)
+
+    stored = load_store(store, params)
+    if stored is None:
+        print(f"No stored matches for '{store}'. Matching all rows")
+        stored = (None, set(), set())
+    old_matches, old_rows_1, old_rows_2 = stored
+
+    is_new_1 = ~fp_1.isin(old_rows_1)
+    is_new_2 = ~fp_2.isin(old_rows_2)
+    print(f"New or changed rows: {is_new_1.sum()} of {len(df_1)} and "
+          f"{is_new_2.sum()} of {len(df_2)}")
+
+    # Pairs with a new row on the left, then pairs of old left rows with a
+    # new row on the right, so no pair is compared twice. Both are subsets of
+    # the whole datasets, so the window already fits in the budget
+    new_matches = []
+    if is_new_1.any():
+        new_matches.append(find_matches(df_1[is_new_1], df_2, exact_vars,
+                                        string_vars, block_vars, date_window,
+                                        "raise", max_workers))
+    if is_new_2.any() and not is_new_1.all():
+        new_matches.append(find_matches(df_1[~is_new_1], df_2[is_new_2],
+                                        exact_vars, string_vars, block_vars,
+                                        date_window, "raise", max_workers))
+
+    # Stored matches are kept only if both rows are still there unchanged
+    matches = []
+    if old_matches is not None:
+        keep = old_matches["fp_1"].isin(fp_1[~is_new_1]) & \
+               old_matches["fp_2"].isin(fp_2[~is_new_2])
+        matches.append(old_matches[keep])
+    for new in new_matches:
+        if new.empty:
+            continue
+        new = new.assign(fp_1=fp_1.loc[new[names[0]]].to_numpy(),
+                         fp_2=fp_2.loc[new[names[1]]].to_numpy())
+        matches.append(new.drop(columns=names))
+    if matches:
+        matches = pd.concat(matches, ignore_index=True)
+    else:
+        matches = pd.DataFrame(columns=["fp_1", "fp_2"] + exact_vars + string_vars)
+    matches = matches.drop_duplicates(["fp_1", "fp_2"])
+    matches = matches.astype({"fp_1": "uint64", "fp_2": "uint64"})
+    save_store(store, params, matches, fp_1, fp_2)
+
+    # Rows with the same values share a fingerprint, so they get the same
+    # matches
+    labels_1 = fp_1.rename("fp_1").rename_axis(names[0]).reset_index()
+    labels_2 = fp_2.rename("fp_2").rename_axis(names[1]).reset_index()
+    matches = matches.merge(labels_1, on="fp_1").merge(labels_2, on="fp_2")
+    matches = matches.reindex(columns=names + exact_vars + string_vars)
+    matches = matches.sort_values(names, ignore_index=True)
+    print("Number of matches: ", len(matches))
+
+    return matches
+
+
+def score_matches(matches, df_1, df_2, exact_vars, string_vars,
+                  date_window=None, weight_var=RL_WEIGHT_VAR):
+    """
+    Score candidate matches: how close their dates are, how similar their
+    strings are and how close their weights are. Each part is between 0 and
+    1 and the score is their sum.
+
+    Inputs:
+        matches (DataFrame): matches from 'find_matches'
+        df_1 (DataFrame): first dataset
+        df_2 (DataFrame): second dataset
+        exact_vars (lst): list of variables names matched exactly ("date"
+            is scored by the number of days between the dates)
+        string_vars (lst): list of variables names matched by the Jaro
+            Winkler distance rule
+        date_window (int): maximum number of days between the dates of a
+            match or None
+        weight_var (str): weight column. It's scored by the ratio of the
+            smallest to the largest weight when both datasets have it.
+            Default is RL_WEIGHT_VAR in config.py.
+
+    Returns (ndarray): score of each match.
+    """
+    names = [df_1.index.name or "level_0", df_2.index.name or "level_1"]
+    pos_1 = df_1.index.get_indexer(matches[names[0]])
+    pos_2 = df_2.index.get_indexer(matches[names[1]])
+    score = np.zeros(len(matches))
+
+    for exact in exact_vars:
+        if exact == "date":
+            days_1 = day_number(df_1["date"]).to_numpy()[pos_1]
+            days_2 = day_number(df_2["date"]).to_numpy()[pos_2]
+            score += 1 - np.abs(days_1 - days_2) / ((date_window or 0) + 1)
+        else:
+            score += matches[exact].to_numpy(dtype="float64")
+
+    for string, (dtype, _) in string_lookups(df_1, df_2, string_vars).items():
+        matrix = similarity_matrix(tuple(dtype.categories), None)
+        codes_1 = df_1[string].astype(dtype).cat.codes.to_numpy()[pos_1]
+        codes_2 = df_2[string].astype(dtype).cat.codes.to_numpy()[pos_2]
+        score += lookup_similarity(codes_1, codes_2, matrix)
+
+    if weight_var in df_1.columns and weight_var in df_2.columns:
+        weight_1 = df_1[weight_var].to_numpy(dtype="float64")[pos_1]
+        weight_2 = df_2[weight_var].to_numpy(dtype="float64")[pos_2]
+        largest = np.maximum(weight_1, weight_2)
+        ratio = np.divide(np.minimum(weight_1, weight_2), largest,
+                          out=np.zeros(len(matches)), where=largest > 0)
+        score += np.nan_to_num(ratio)
+
+    return score
+
+
+def dense_assignment(block_1, block_2, score, n_1, n_2):
+    """
+    Solve the assignment of a small component of candidate matches with a
+    dense score matrix.
+
+    Inputs:
+        block_1 (ndarray): position of the first row of each match (0 to n_1)
+        block_2 (ndarray): position of the second row of each match (0 to n_2)
+        score (ndarray): score of each match
+        n_1 (int): number of rows of the first dataset in the component
+        n_2 (int): number of rows of the second dataset in the component.
+
+    Returns (ndarray): positions of the chosen matches.
+    """
+    # Pairs that are not candidates get a score no match can offset
+    scores = np.full((n_1, n_2), -1e9)
+    scores[block_1, block_2] = score
+    match_id = np.full((n_1, n_2), -1)
+    match_id[block_1, block_2] = np.arange(len(score))
+    assigned = match_id[linear_sum_assignment(scores, maximize=True)]
+
+    return assigned[assigned >= 0]
+
+
+def sparse_assignment(block_1, block_2, score, n_1, n_2):
+    """
+    Solve the assignment of a component of candidate matches as a minimum
+    weight full matching of a sparse bipartite graph, so memory grows with
+    the number of candidates. Each first row also gets a dummy node only it
+    can be matched to, so a full matching always exists. Matching a dummy
+    costs more than any set of real matches, so the solution has as many
+    real matches as possible and, among those, the highest total score (like
+    'dense_assignment').
+
+    Inputs:
+        block_1 (ndarray): position of the first row of each match (0 to n_1)
+        block_2 (ndarray): position of the second row of each match (0 to n_2)
+        score (ndarray): score of each match
+        n_1 (int): number of rows of the first dataset in the component
+        n_2 (int): number of rows of the second dataset in the component.
+
+    Returns (ndarray): positions of the chosen matches.
+    """
+    # Costs must be positive: explicit zeros aren't edges of the graph
+    cost = score.max() - score + 1
+    dummy_cost = cost.sum() + 1
+    rows = np.concatenate([block_1, np.arange(n_1)])
+    cols = np.concatenate([block_2, n_2 + np.arange(n_1)])
+    weights = np.concatenate([cost, np.full(n_1, dummy_cost)])
+    graph = sparse.csr_matrix((weights, (rows, cols)), shape=(n_1, n_2 + n_1))
+    matched_1, matched_2 = min_weight_full_bipartite_matching(graph)
+
+    # Position of the match of each (first row, second row) pair
+    match_id = pd.Series(np.arange(len(score)),
+                         index=pd.MultiIndex.from_arrays([block_1, block_2]))
+    real = matched_2 < n_2
+    pairs = pd.MultiIndex.from_arrays([matched_1[real], matched_2[real]])
+
+    return match_id.reindex(pairs).to_numpy(dtype=int)
+
+
+def resolve_one_to_one(matches, score):
+    """
+    Choose one-to-one matches. Candidate matches form a bipartite graph and
+    each connected component is solved on its own as an assignment problem:
+    as many matches as possible with the highest total score. Components up
+    to RL_DENSE_ASSIGNMENT_CELLS (config.py) cells are solved with a dense
+    matrix and larger ones (e.g. a whole country linked by a date window)
+    with a sparse matching.
+
+    Inputs:
+        matches (DataFrame): matches from 'find_matches'. The first two
+            columns are the index labels of the matched rows
+        score (ndarray): score of each match.
+
+    Returns (ndarray): boolean mask of the chosen matches.
+    """
+    codes_1, uniques_1 = pd.factorize(matches.iloc[:, 0])
+    codes_2, uniques_2 = pd.factorize(matches.iloc[:, 1])
+    n_1, n_2 = len(uniques_1), len(uniques_2)
+    graph = sparse.coo_matrix((np.ones(len(matches)), (codes_1, n_1 + codes_2)),
+                              shape=(n_1 + n_2, n_1 + n_2))
+    _, components = connected_components(graph, directed=False)
+
+    chosen = np.zeros(len(matches), dtype=bool)
+    groups = pd.Series(np.arange(len(matches))).groupby(components[codes_1])
+    for rows in groups.indices.values():
+        if len(rows) == 1:
+            chosen[rows] = True
+            continue
+        rows_1, block_1 = np.unique(codes_1[rows], return_inverse=True)
+        rows_2, block_2 = np.unique(codes_2[rows], return_inverse=True)
+        if len(rows_1) * len(rows_2) <= RL_DENSE_ASSIGNMENT_CELLS:
+            solve = dense_assignment
+        else:
+            solve = sparse_assignment
+        assigned = solve(block_1, block_2, score[rows], len(rows_1), len(rows_2))
+        chosen[rows[assigned]] = True
+
+    return chosen
+
+
+def join_by_position(pairs, df_1, df_2):
+    """
+    Add the columns of both datasets to matched pairs by row position.
+    Columns in both datasets get the "_x" (first dataset) and "_y" (second
+    dataset) suffixes.
+
+    Inputs:
+        pairs (DataFrame): matched pairs. The first two columns are the index
+            labels of the matched rows
+        df_1 (DataFrame): first dataset
+        df_2 (DataFrame): second dataset.
+
+    Returns (DataFrame): matched pairs with the columns of both datasets.
+    """
+    left = df_1.iloc[df_1.index.get_indexer(pairs.iloc[:, 0])]
+    right = df_2.iloc[df_2.index.get_indexer(pairs.iloc[:, 1])]
+    both = left.columns.intersection(right.columns)
+    left = left.rename(columns={col: f"{col}_x" for col in both})
+    right = right.rename(columns={col: f"{col}_y" for col in both})
+
+    return pd.concat([pairs.reset_index(drop=True),
+                      left.reset_index(drop=True),
+                      right.reset_index(drop=True)], axis=1)
+
+
 def unique_matches(df_1, df_2, exact_vars= None, string_vars=None,
-                 block_vars=None):
+                 block_vars=None, date_window=None, on_budget="tighten",
+                 store=None, method="assignment"):
     """
     Find unique matches between two datasets based on different columns.
+    With the "assignment" method, candidate matches are scored (see
+    'score_matches') and resolved one-to-one (see 'resolve_one_to_one'). With
+    the "unique" method, only df_2 rows with a single df_1 candidate are kept.
 
     Inputs:
         df_1 (DataFrame): first dataset to match
@@ -107,28 +868,51 @@ def unique_matches(df_1, df_2, exact_vars= None, string_vars=None,
             by the Jaro Winkler distance rule. If empty, it's set to "None" by
             default
         block_vars (lst): list of strings with blocking variables names. If
-            empty, it's set to "None" by default.
-
-    Returns (DataFrame): dataframe with unique matches from both datasets.
+            empty, it's set to "None" by default
+        date_window (int): maximum number of days between the dates of a
+            match. If None (default), dates are matched exactly
+        on_budget (str): "tighten" the date window or "raise" an error when
+            the candidate pairs would exceed the memory budget. Default is
+            "tighten"
+        store (str): optional name of a match store. If given, matches are
+            computed incrementally (see 'incremental_matches')
+        method (str): how to choose unique matches, either "assignment" or
+            "unique". Default is "assignment".
+
+    Returns (DataFrame): dataframe with unique matches from both datasets
+        (and their "score" with the "assignment" method).
     """
+    assert method in ["assignment", "unique"], \
+        "Wrong method Error: method must be 'assignment' or 'unique'."
+    exact_vars = exact_vars or []
+    string_vars = string_vars or []
     df_1.index.name = "df_1"
     df_2.index.name = "df_2"
 
-    matches = find_matches(df_1, df_2, ["date"], ["country"], ["date"])
-    
-    # Create a unique matches index and filter the matches indexes by it to find
-    # unique matches
-    df_2_i = matches.groupby("df_2")["df_1"].nunique()
-    unique = matches[matches["df_2"].isin(df_2_i[df_2_i == 1].index)][["df_1", "df_2"]].reset_index(drop=True)
+    if store is not None:
+        matches = incremental_matches(df_1, df_2, store, exact_vars,
+                                      string_vars, block_vars, date_window,
+                                      on_budget)
+    else:
+        matches = find_matches(df_1, df_2, exact_vars, string_vars, block_vars,
+                               date_window, on_budget)
 
-    full_unique = unique.merge(df_1, left_on='df_1', right_index=True)
-    full_unique = full_unique.merge(df_2, left_on='df_2', right_index=True)
+    if method == "unique":
+        # Keep df_2 rows with a single df_1 candidate
+        n_candidates = matches.groupby("df_2")["df_1"].transform("nunique")
+        pairs = matches.loc[n_candidates == 1, ["df_1", "df_2"]]
+    else:
+        score = score_matches(matches, df_1, df_2, exact_vars, string_vars,
+                              date_window)
+        chosen = resolve_one_to_one(matches, score)
+        pairs = matches.loc[chosen, ["df_1", "df_2"]].assign(score=score[chosen])
 
-    return full_unique
+    return join_by_position(pairs, df_1, df_2)
 
 def record_linkage(df_1, df_2, group, other_cols, sort, asc_bool, agg_dict,
                    exact_vars= None, string_vars=None, block_vars=None,
-                   new_name = None):
+                   new_name = None, date_window=None, on_budget="tighten",
+                   store=None, method="assignment"):
     """
     Match dataframes based on different variables.
 
@@ -152,7 +936,16 @@ def record_linkage(df_1, df_2, group, other_cols, sort, asc_bool, agg_dict,
             by the Jaro Winkler distance rule. If empty, it's set to "None" by
             default
         block_vars (lst): list of strings with blocking variables names. If
-            empty, it's set to "None" by default.
+            empty, it's set to "None" by default
+        date_window (int): maximum number of days between the dates of a
+            match. If None (default), dates are matched exactly
+        on_budget (str): "tighten" the date window or "raise" an error when
+            the candidate pairs would exceed the memory budget. Default is
+            "tighten"
+        store (str): optional name of a match store. If given, matches are
+            computed incrementally (see 'incremental_matches')
+        method (str): how to choose unique matches, either "assignment" or
+            "unique" (see 'unique_matches'). Default is "assignment".
 
     Returns (DataFrame): dataframe with unique matches from both datasets based
         on specified variables.
@@ -160,12 +953,15 @@ def record_linkage(df_1, df_2, group, other_cols, sort, asc_bool, agg_dict,
 
     df_1_g = cargo_grouping(df_1, group, other_cols, sort, True, agg_dict)
 
-    full_unique = unique_matches(df_1_g, df_2, exact_vars, string_vars, block_vars)
+    full_unique = unique_matches(df_1_g, df_2, exact_vars, string_vars,
+                                 block_vars, date_window, on_budget, store,
+                                 method)
 
     return full_unique
 
 def rl_ig_bsgi(df_ig, df_bsgi, crop, exact_vars= None, string_vars=None,
-                   block_vars=None):
+                   block_vars=None, date_window=None, on_budget="tighten",
+                   incremental=False, method="assignment"):
     """
     Merge two dataframes based on different variables. The dataframes are matched
     also based on a specific crop.
@@ -175,12 +971,21 @@ def rl_ig_bsgi(df_ig, df_bsgi, crop, exact_vars= None, string_vars=None,
         df_bsgi (DataFrame): BSGI dataset
         crop (str): crop to match on
         exact_vars (lst): list of strings with variables names we want to match
-            exactly. If empty, it's set to "None" by default
+            exactly. If empty, it's set to ["date"]
         string_vars (lst): list of strings with variables names we want to match
-            by the Jaro Winkler distance rule. If empty, it's set to "None" by
-            default
+            by the Jaro Winkler distance rule. If empty, it's set to
+            ["country"]
         block_vars (lst): list of strings with blocking variables names. If
-            empty, it's set to "None" by default.
+            empty, it's set to ["date"]
+        date_window (int): maximum number of days between the dates of a
+            match. If None (default), dates are matched exactly
+        on_budget (str): "tighten" the date window or "raise" an error when
+            the candidate pairs would exceed the memory budget. Default is
+            "tighten"
+        incremental (bool): reuse the matches stored by the last run for this
+            crop and only compare new or changed rows. Default is False
+        method (str): how to choose unique matches, either "assignment" or
+            "unique" (see 'unique_matches'). Default is "assignment".
 
     Returns (DataFrame): dataframe with unique matches from both datasets based
         on specified variables.
@@ -200,7 +1005,11 @@ def rl_ig_bsgi(df_ig, df_bsgi, crop, exact_vars= None, string_vars=None,
     # full_unique = unique_matches(crop_ig, crop_bsgi, ["date"], ["country"], ["date"])
     full_unique = record_linkage(crop_ig, crop_bsgi, ["date", "country"],
                                  ["weight_ton"],  ["date", "country"], True,
-                                 {"weight_ton":"sum"}, ["date"], ["country"],
-                                 ["date"])
+                                 {"weight_ton":"sum"}, exact_vars or ["date"],
+                                 string_vars or ["country"],
+                                 block_vars or ["date"], date_window=date_window,
+                                 on_budget=on_budget,
+                                 store=f"ig_bsgi_{crop}" if incremental else None,
+                                 method=method)
     
     return full_unique
\ No newline at end of file
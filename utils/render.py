@@ -0,0 +1,128 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Batch chart rendering
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+import pandas as pd
+from config import OUTPUT_PATH, RENDER_MAX_WORKERS
+from .cache import file_hash, frame_hash, object_hash, is_fresh, write_manifest
+
+
+def use_agg():
+    """
+    Use the non-interactive Agg backend in a rendering worker, so charts are
+    drawn straight to image files without a display.
+
+    Returns: None.
+    """
+    matplotlib.use("Agg")
+
+
+def chart_key(func, kwargs):
+    """
+    Build the key of a chart from the plot function and its arguments:
+    dataframes are hashed by content, other arguments by value. The source
+    file of the function and the matplotlib version are part of the key, so
+    changes to the plot code render the chart again.
+
+    Inputs:
+        func (function): plot function
+        kwargs (dict): keyword arguments of the plot function.
+
+    Returns (str): SHA-256 hex digest.
+    """
+    args = {name: frame_hash(value) if isinstance(value, (pd.DataFrame, pd.Series))
+            else value for name, value in kwargs.items()}
+
+    return object_hash({
+        "func": f"{func.__module__}.{func.__qualname__}",
+        "code": file_hash(inspect.getsourcefile(func)),
+        "matplotlib": matplotlib.__version__,
+        "kwargs": args,
+    })
+
+
+def render_chart(func, kwargs, path, key):
+    """
+    Render a chart to a PNG file in a worker process, with a manifest with
+    the chart key. The figure is closed even if saving it fails.
+
+    Inputs:
+        func (function): plot function that returns its figure and takes a
+            'save_fig' argument
+        kwargs (dict): keyword arguments of the plot function
+        path (str): path of the PNG file
+        key (str): chart key (see 'chart_key').
+
+    Returns (str): path of the PNG file.
+    """
+    import matplotlib.pyplot as plt
+
+    fig = func(save_fig=False, **kwargs)
+    try:
+        fig.savefig(path)
+    finally:
+        plt.close(fig)
+    write_manifest(path + ".json", {"key": key})
+
+    return path
+
+
+def render_charts(charts, output_dir=OUTPUT_PATH, max_workers=RENDER_MAX_WORKERS,
+                  force=False):
+    """
+    Render charts in batch: each chart is drawn with the Agg backend in a
+    process pool and its figure is closed as soon as it's saved. A chart
+    whose PNG file exists and whose key (input data, plot arguments and plot
+    code) didn't change since it was rendered is skipped.
+
+    Inputs:
+        charts (lst): list of (name, func, kwargs) tuples, where name is the
+            file name without extension, func is a plot function that returns
+            its figure (e.g. 'plot_crops') and kwargs are its keyword
+            arguments other than 'save_fig'
+        output_dir (str): directory of the PNG files. Default is OUTPUT_PATH
+            in config.py
+        max_workers (int): maximum number of worker processes. Default is
+            RENDER_MAX_WORKERS in config.py (one per CPU if None)
+        force (bool): render every chart even if it's up to date. Default is
+            False.
+
+    Returns (dict): dictionary with chart names as keys and "rendered",
+        "skipped" or the error of the chart as values.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    status = {}
+    pending = []
+    for name, func, kwargs in charts:
+        path = os.path.join(output_dir, name + ".png")
+        key = chart_key(func, kwargs)
+        if not force and is_fresh(path + ".json", {"key": key}, path):
+            status[name] = "skipped"
+        else:
+            pending.append((name, func, kwargs, path, key))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=use_agg) as pool:
+            futures = {pool.submit(render_chart, func, kwargs, path, key): name
+                       for name, func, kwargs, path, key in pending}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    status[name] = "rendered"
+                except Exception as e:
+                    status[name] = f"failed: {e!r}"
+                    print(f"Rendering {name} failed: {e!r}")
+
+    rendered = sum(s == "rendered" for s in status.values())
+    skipped = sum(s == "skipped" for s in status.values())
+    print(f"Charts: {rendered} rendered, {skipped} up to date, "
+          f"{len(status) - rendered - skipped} failed. Check {output_dir}")
+
+    return {name: status[name] for name, _, _ in charts}
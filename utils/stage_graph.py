@@ -0,0 +1,339 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Stage graph runner
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import glob
+import inspect
+import os
+import pandas as pd
+from config import ROOT_PATH, STAGE_CACHE_PATH, CLEAN_CACHE_VERSION
+from .cache import (file_hash, object_hash, read_manifest, write_manifest,
+                    write_columnar, read_columnar)
+from .instrument import stage as instrument_stage
+
+
+class Stage:
+    """
+    Step of a pipeline whose output is memoized on disk.
+
+    Inputs:
+        name (str): stage name
+        func (function): function called with the outputs of the input
+            stages (in order) and 'params' as keyword arguments. It can change
+            its inputs in place only if no other stage uses them
+        inputs (lst): names of the stages whose outputs 'func' takes
+        params (dict): keyword arguments of 'func'. Part of the stage key
+        depends (dict): other values the output depends on, e.g. hashes of
+            files the stage reads. Part of the stage key, not passed to 'func'
+        code (lst): functions or modules called by 'func' (e.g.
+            'derive_columns'). The content of their source files is part of
+            the stage key, with the source file of 'func'
+        version (int): bump it when code called by 'func' that isn't in the
+            source files of 'func' or 'code' changes. Default is 1
+        store (bool): memoize the output on disk. Use False for stages with
+            side effects (e.g. exports) or with their own cache. Default is
+            True
+        keyed_by_output (bool): use the hash of the output as the stage key,
+            so a value passed with 'StageGraph.provide' and the computed one
+            share their key. Only for cheap stages without inputs and with a
+            JSON serializable output (e.g. a cached dictionary). Default is
+            False.
+    """
+
+    def __init__(self, name, func, inputs=(), params=None, depends=None,
+                 code=None, version=1, store=True, keyed_by_output=False):
+        if keyed_by_output and inputs:
+            raise ValueError(f"Stage '{name}' is keyed by its output and can't "
+                             f"have inputs")
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.params = params or {}
+        self.depends = depends or {}
+        self.code = list(code or [])
+        self.version = version
+        self.store = store and not keyed_by_output
+        self.keyed_by_output = keyed_by_output
+
+    def code_hash(self):
+        """
+        Hash the source files of the stage function and of the code it calls
+        ('code'), as 'render.chart_key' does for plot functions.
+
+        Returns (str): SHA-256 hex digest of the file contents (a function or
+            module without a source file is hashed by its name).
+        """
+        files = {}
+        for obj in [self.func] + self.code:
+            name = getattr(obj, "__qualname__", getattr(obj, "__name__", repr(obj)))
+            try:
+                path = inspect.getsourcefile(obj)
+            except TypeError:
+                path = None
+            if path is None:
+                files[name] = None
+            else:
+                files[os.path.relpath(path, ROOT_PATH)] = file_hash(path)
+
+        return object_hash(files)
+
+
+class StageGraph:
+    """
+    Directed acyclic graph of stages. Each stage output is memoized under a
+    key made of its code, version, parameters and the keys of its input
+    stages, so keys are known before running anything: a stage whose key
+    didn't change is loaded from disk and its upstream stages are skipped.
+
+    Inputs:
+        stages (lst): list of stages. Inputs must be defined before the stages
+            that use them
+        namespace (str): prefix of the memoized files, e.g. "ig_asia"
+        cache_dir (str): directory of the memoized files. Default is
+            STAGE_CACHE_PATH in config.py
+        fields (dict): values added to the instrumentation record of every
+            stage, e.g. {"country": "asia"}.
+    """
+
+    def __init__(self, stages, namespace, cache_dir=STAGE_CACHE_PATH,
+                 fields=None):
+        self.stages = {}
+        for s in stages:
+            for name in s.inputs:
+                if name not in self.stages:
+                    raise ValueError(f"Stage '{s.name}' uses unknown stage '{name}'")
+            self.stages[s.name] = s
+        self.namespace = namespace
+        self.cache_dir = cache_dir
+        self.fields = fields or {}
+        self.provided = {}
+        self._keys = {}
+
+    def provide(self, name, value):
+        """
+        Use a value computed outside the graph as the output of a stage, e.g.
+        a dictionary shared by several graphs. Its key (and the keys of the
+        stages using it) is computed from the hash of the value.
+
+        Inputs:
+            name (str): stage name
+            value (dict or list): JSON serializable stage output.
+
+        Returns: None.
+        """
+        self.provided[name] = value
+        self._keys.clear()
+
+    def key(self, name):
+        """
+        Compute the key of a stage from its definition and the keys of its
+        inputs.
+
+        Inputs:
+            name (str): stage name.
+
+        Returns (str): SHA-256 hex digest.
+        """
+        if name not in self._keys:
+            s = self.stages[name]
+            if s.keyed_by_output and name not in self.provided:
+                with instrument_stage(name, **self.fields) as record:
+                    self.provided[name] = s.func(**s.params)
+                    record["rows_out"] = self.provided[name]
+            if name in self.provided:
+                key = object_hash({"output": self.provided[name]})
+            else:
+                key = object_hash({
+                    "version": [CLEAN_CACHE_VERSION, s.version],
+                    "stage": name,
+                    "code": s.code_hash(),
+                    "params": s.params,
+                    "depends": s.depends,
+                    "inputs": [self.key(i) for i in s.inputs],
+                })
+            self._keys[name] = key
+
+        return self._keys[name]
+
+    def downstream(self, name):
+        """
+        Get a stage and every stage that depends on it.
+
+        Inputs:
+            name (str): stage name.
+
+        Returns (set): set of stage names.
+        """
+        if name not in self.stages:
+            raise ValueError(f"Unknown stage '{name}'. Use one of {list(self.stages)}.")
+
+        names = {name}
+        # Stages come after their inputs, so one pass finds every descendant
+        for s in self.stages.values():
+            if any(i in names for i in s.inputs):
+                names.add(s.name)
+
+        return names
+
+    def stage_path(self, name, key=None):
+        """
+        Build the path prefix of the memoized output of a stage.
+
+        Inputs:
+            name (str): stage name
+            key (str): stage key. If None, returns a glob pattern of every
+                memoized output of the stage.
+
+        Returns (str): path without extension.
+        """
+        suffix = "*" if key is None else key[:16]
+
+        return os.path.join(self.cache_dir, f"{self.namespace}_{name}_{suffix}")
+
+    def stored_path(self, name):
+        """
+        Find the memoized output of a stage for its current key.
+
+        Inputs:
+            name (str): stage name.
+
+        Returns (str): path of the Parquet or JSON file, or None if there's no
+            output memoized for the current key.
+        """
+        path = self.stage_path(name, self.key(name))
+        for ext in [".parquet", ".json"]:
+            if os.path.exists(path + ext):
+                return path + ext
+
+        return None
+
+    def load(self, path):
+        """
+        Load a memoized stage output.
+
+        Inputs:
+            path (str): path of the Parquet or JSON file.
+
+        Returns (DataFrame or JSON object): stage output.
+        """
+        if path.endswith(".parquet"):
+            return read_columnar(path)
+
+        return read_manifest(path)["output"]
+
+    def save(self, name, output):
+        """
+        Memoize the output of a stage, removing outputs stored for old keys.
+
+        Inputs:
+            name (str): stage name
+            output (DataFrame or JSON serializable object): stage output.
+                Dataframes are stored as Parquet files without their index.
+
+        Returns: None.
+        """
+        for old in glob.glob(self.stage_path(name) + ".*"):
+            os.remove(old)
+
+        path = self.stage_path(name, self.key(name))
+        if isinstance(output, pd.DataFrame):
+            write_columnar(output, path + ".parquet")
+        else:
+            write_manifest(path + ".json", {"output": output})
+
+    def plan(self, targets):
+        """
+        List the stages needed to compute some targets, inputs first.
+
+        Inputs:
+            targets (lst): names of target stages.
+
+        Returns (lst): list of stage names.
+        """
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stages[name].inputs)
+
+        return [name for name in self.stages if name in needed]
+
+    def run(self, targets, rerun_from=None):
+        """
+        Compute target stages. Memoized outputs are loaded instead of running
+        their stage, and stages whose output is loaded don't need their
+        inputs, so upstream stages are skipped too. Outputs are dropped from
+        memory as soon as no other pending stage needs them.
+
+        Inputs:
+            targets (str or lst): name or names of target stages
+            rerun_from (str): run this stage and every stage that depends on
+                it even if their outputs are memoized. Default is None.
+
+        Returns (any or dict): output of the target, or dictionary with target
+            names as keys and outputs as values if 'targets' is a list.
+        """
+        names = [targets] if isinstance(targets, str) else list(targets)
+        forced = self.downstream(rerun_from) if rerun_from is not None else set()
+        plan = self.plan(names)
+
+        # Number of pending stages using each output
+        users = {name: 0 for name in plan}
+        for name in plan:
+            for i in self.stages[name].inputs:
+                users[i] += 1
+
+        outputs = {}
+
+        def release(name):
+            users[name] -= 1
+            if users[name] == 0 and name not in names:
+                outputs.pop(name, None)
+
+        def compute(name):
+            if name in outputs:
+                return outputs[name]
+            s = self.stages[name]
+
+            if name in self.provided:
+                outputs[name] = self.provided[name]
+                for i in s.inputs:
+                    release(i)
+                return outputs[name]
+
+            path = self.stored_path(name) if s.store else None
+            if path is not None and name not in forced:
+                print(f"Stage '{name}' is up to date. Loading it from cache")
+                with instrument_stage(name, cached=True, **self.fields) as record:
+                    output = self.load(path)
+                    record["rows_out"] = output
+                outputs[name] = output
+                for i in s.inputs:
+                    release(i)
+                return output
+
+            args = [compute(i) for i in s.inputs]
+            print(f"Running stage '{name}'...")
+            with instrument_stage(name, rows_in=args[0] if args else None,
+                                  **self.fields) as record:
+                output = s.func(*args, **s.params)
+                record["rows_out"] = output
+            del args
+            if s.store:
+                self.save(name, output)
+            outputs[name] = output
+            for i in s.inputs:
+                release(i)
+
+            return output
+
+        for name in names:
+            compute(name)
+
+        if isinstance(targets, str):
+            return outputs[targets]
+        return {name: outputs[name] for name in names}
@@ -0,0 +1,98 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Subsidiary dictionary artifact
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import argparse
+import json
+import os
+import time
+from .cache import file_hash, object_hash, read_manifest, write_manifest
+from .clean_data import create_subsidiary_dict
+from config import CACHE_PATH, DEALS_PATH, NAMES_PATH
+
+# Bump when 'create_subsidiary_dict' changes so stored artifacts are rebuilt
+SUBSIDIARY_DICT_VERSION = 1
+
+
+def subsidiary_dict_key(n_parent_companies, n_subsidiaries):
+    """
+    Create the key of the subsidiary dictionary artifact from everything the
+    dictionary depends on.
+
+    Inputs:
+        n_parent_companies (int): top 'n' parent companies from Land Matrix
+        n_subsidiaries (int): top 'n' subsidiaries per parent company.
+
+    Returns (dict): artifact key.
+    """
+    with open(NAMES_PATH, encoding="utf-8") as f:
+        known_companies = json.load(f)["KNOWN_COMPANIES"]
+
+    return {
+        "version": SUBSIDIARY_DICT_VERSION,
+        "deals": file_hash(DEALS_PATH),
+        "n_parent_companies": n_parent_companies,
+        "n_subsidiaries": n_subsidiaries,
+        "known_companies": object_hash(known_companies),
+    }
+
+
+def subsidiary_dict_path(key):
+    """
+    Get the path of the artifact stored for a key.
+
+    Inputs:
+        key (dict): artifact key created with 'subsidiary_dict_key'.
+
+    Returns (str): path of the JSON artifact.
+    """
+    return os.path.join(CACHE_PATH, f"subsidiaries_{object_hash(key)[:16]}.json")
+
+
+def load_subsidiary_dict(n_parent_companies=25, n_subsidiaries=20, rebuild=False):
+    """
+    Load the subsidiary dictionary from its stored artifact. The artifact is
+    built (parsing Land Matrix data and translating subsidiary names) only if
+    there's no artifact for the current deals.csv, parameters and
+    KNOWN_COMPANIES, or if 'rebuild' is True.
+
+    Inputs:
+        n_parent_companies (int): top 'n' parent companies from Land Matrix
+        n_subsidiaries (int): top 'n' subsidiaries per parent company
+        rebuild (bool): build the artifact even if it's stored already.
+
+    Returns (dict): dictionary with parent companies as keys and subsidiary
+        names in Ukrainian (lowercase) as values.
+    """
+    key = subsidiary_dict_key(n_parent_companies, n_subsidiaries)
+    path = subsidiary_dict_path(key)
+
+    artifact = None if rebuild else read_manifest(path)
+    if artifact is not None and artifact["key"] == key:
+        return artifact["subsidiaries"]
+
+    subsidiaries = create_subsidiary_dict(n_parent_companies, n_subsidiaries)
+    write_manifest(path, {"key": key, "subsidiaries": subsidiaries})
+
+    return subsidiaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the cached subsidiary dictionary artifact"
+    )
+    parser.add_argument("--n-parents", type=int, default=25)
+    parser.add_argument("--n-subsidiaries", type=int, default=20)
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Rebuild even if it's stored already"
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    subsidiaries = load_subsidiary_dict(args.n_parents, args.n_subsidiaries,
+                                        args.rebuild)
+    key = subsidiary_dict_key(args.n_parents, args.n_subsidiaries)
+    print(f"{len(subsidiaries)} parent companies in {time.perf_counter() - start:.2f}s. "
+          f"Artifact: {subsidiary_dict_path(key)}")
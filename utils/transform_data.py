@@ -5,16 +5,22 @@
 # DSI
 
 from .record_linkage import filter_crop, test_crop
-from .plot import plot_pie, cargo_grouping
+from .plot import plot_pie
+from .cube import as_cube, monthly_table
+from .aho_corasick import Automaton
 import pandas as pd
+from config import CUBE_MEASURES
+
+# Columns that identify a month in row-level data or in the export cube
+TIME_COLUMNS = ["year", "month", "date", "period"]
 
 def estimate_weights(company_df, company_col, company_add, bsgi_df, bsgi_col, plot_title, crop=None):
     """
     Estimate the export weights for a specific crop.
 
     Inputs:
-        company_df (DataFrame): company dataframe with data from Import Genius
-            or Panjiva
+        company_df (DataFrame): export cube (or a slice of it) or company
+            dataframe with data from Import Genius or Panjiva
         company_col (str): column name from the company dataframe that we want
             to group by
         company_add (str): column name from the company dataframe that we want
@@ -28,7 +34,8 @@ def estimate_weights(company_df, company_col, company_add, bsgi_df, bsgi_col, pl
     """
     
     if crop is None:
-        company_g = cargo_grouping(company_df, [company_col], [company_add], [company_col], True, {company_add: "sum"})
+        company_g = as_cube(company_df).groupby(company_col, as_index=False,
+                                                observed=True)[company_add].sum()
         bsgi_weight = bsgi_df[bsgi_col].sum()
         print("bsgi_weight: ", bsgi_weight)
         company_weight = company_g["weight_ton"].sum()
@@ -59,7 +66,62 @@ def estimate_weights(company_df, company_col, company_add, bsgi_df, bsgi_col, pl
     
     return df
 
-def get_company_dict(company_col, company_dict):
+def build_company_matcher(company_dict):
+    """
+    Compile an Aho-Corasick automaton with every subsidiary name so each
+    shipper name only has to be scanned once.
+
+    Inputs:
+        company_dict (dict): dictionary with parent companies in English as keys
+            and subsiary companies in Ukrainian as values.
+
+    Return (Automaton): compiled automaton. Each pattern's value is a tuple
+        with the parent company position in 'company_dict' and its name.
+    """
+    matcher = Automaton()
+    for i, (parent, subsidiaries) in enumerate(company_dict.items()):
+        for subsidiary in subsidiaries:
+            if isinstance(subsidiary, str):
+                matcher.add(subsidiary, (i, parent))
+
+    return matcher.build()
+
+
+def match_company(matcher, name, on_conflict="longest"):
+    """
+    Find the parent company of a raw company name.
+
+    Inputs:
+        matcher (Automaton): automaton built with 'build_company_matcher'
+        name (str): raw company name (shipper)
+        on_conflict (str): rule to use when subsidiaries of several parent
+            companies are found in the name. "longest" keeps the parent with
+            the longest matching subsidiary name, "first" keeps the parent that
+            comes first in the company dictionary and "last" the one that comes
+            last. Ties under "longest" are broken like "last".
+
+    Return (str): parent company name or "Other" if there's no match.
+    """
+    if not isinstance(name, str):
+        return "Other"
+
+    matches = matcher.find_all(name)
+    if not matches:
+        return "Other"
+
+    if on_conflict == "longest":
+        key = lambda m: (len(m[0]), m[1][0])
+    elif on_conflict == "last":
+        key = lambda m: m[1][0]
+    elif on_conflict == "first":
+        key = lambda m: -m[1][0]
+    else:
+        raise ValueError("Wrong on_conflict value. Use 'longest', 'first' or 'last'.")
+
+    return max(matches, key=key)[1][1]
+
+
+def get_company_dict(company_col, company_dict, on_conflict="longest"):
     """
     Get a dictionary with raw company names (shipper) as keys and standardized
     company names as values.
@@ -69,24 +131,21 @@ def get_company_dict(company_col, company_dict):
             Ukrainian
         company_dict (dict): dictionary with parent companies in English as keys
             and subsiary companies in Ukrainian as values.
+        on_conflict (str): rule to use when subsidiaries of several parent
+            companies are found in one name. See 'match_company'.
     
     Return (dict): dictionary with raw company names (shipper) as keys and
         standardized company names as values.
     """
-    all_companies = company_col.unique()
+    matcher = build_company_matcher(company_dict)
     rename_dict = {}
 
-    for row in all_companies:
-        for parent, subsidiaries in company_dict.items():
-            for subsidiary in subsidiaries:
-                if subsidiary in row:
-                    rename_dict[row] = parent
-        if row not in rename_dict.keys():
-            rename_dict[row] = "Other"
+    for row in company_col.unique():
+        rename_dict[row] = match_company(matcher, row, on_conflict)
     
     return rename_dict
 
-def standard_company_name(company_col, company_dict):
+def standard_company_name(company_col, company_dict, on_conflict="longest"):
     """
     Create new column with standardized company names from "column" parameter.
 
@@ -95,80 +154,143 @@ def standard_company_name(company_col, company_dict):
             Ukrainian
         company_dict (dict): dictionary with parent companies in English as keys
             and subsiary companies in Ukrainian as values.
+        on_conflict (str): rule to use when subsidiaries of several parent
+            companies are found in one name. See 'match_company'.
     
-    Return (Series): series with new standardized company names.
+    Return (Series): categorical series with new standardized company names.
     """
-    rename_dict = get_company_dict(company_col, company_dict)
-    standard_col = company_col.apply(lambda x: rename_dict[x])
+    # We match each unique name once and then take the result by position
+    codes, uniques = pd.factorize(company_col)
+    rename_dict = get_company_dict(pd.Series(uniques), company_dict, on_conflict)
+    # Missing names have code -1 so they take the last label ("Other")
+    labels = pd.Categorical([rename_dict[name] for name in uniques] + ["Other"])
+    standard_col = pd.Series(labels.take(codes), index=company_col.index,
+                             name=company_col.name)
     
     return standard_col
 
-def create_wide_table(df, group, agg_cols, sort, asc_bool, agg_dict,
-                   new_name = None):
+def table_spec(group, agg_dict):
     """
-    Create wide table from dataframe.
+    Translate the grouping arguments of the table functions into the cube
+    dimensions used as columns and the measure to sum. Time columns ("year",
+    "month", "date" or "period") become the monthly index. The cube only has
+    sums and counts of shipments, so other aggregations raise an error.
 
     Inputs:
-        df (DataFrame): dataset to be used
         group (lst): list of columns to group by
-        other_cols(lst): list of columns that are going to be aggregated
-        sort (lst): list of columns to sort dataframe by. If new_name is not
-            empty then the new column names should be used
-        asc_bool (bool): boolean stating wheter or not to sort data "ascending"
-            (True) or "descending" (False)
-        agg_dict (dict): dict with aggregation functions we want to apply to
-            data. If we want to aggregate a column by more than one function
-            we put the functions as a list. Example: {"var": ["count", "sum"]}.
-        new_name (lst): optional paramater with list of new names for grouped
-            dataframe. Default is "None".
-
-    Return(DataFrame): wide table with month-year and standardized company names
-    as columns
-    """
-    # First we get long table by grouping data
-    df_g = cargo_grouping(df, group, agg_cols, sort, asc_bool, agg_dict)
-    df_g["date"] = df_g["month"].astype(str) + "/" + df_g["year"].astype(str)
-    
-    # Now we get the wide table format
-    pivot = pd.pivot_table(data=df_g, index=['date', "year", "month"],
-                           columns=['company_std'],
-                           values='weight_ton').reset_index()
-    pivot = pivot.sort_values(by=["year", "month"]).drop(['year', 'month'],
-                                                         axis=1).round(1)
-    
-    return pivot
+        agg_dict (dict): dict with one column and its aggregation function,
+            "sum" or "count". Example: {"weight_ton": "sum"}.
+
+    Returns (tuple): list of cube dimensions and measure name.
+    """
+    columns = [col for col in group or [] if col not in TIME_COLUMNS]
+    value = "weight_ton"
+    if agg_dict:
+        if len(agg_dict) > 1:
+            raise ValueError(f"Wide tables have one measure, got {agg_dict}.")
+        col, func = next(iter(agg_dict.items()))
+        if isinstance(func, list) and len(func) == 1:
+            func = func[0]
+        if func == "count":
+            value = "n_shipments"
+        elif func == "sum" and col in CUBE_MEASURES:
+            value = col
+        else:
+            raise ValueError(f"The export cube can't aggregate {col!r} with "
+                             f"{func!r}. Use 'sum' of one of {CUBE_MEASURES} "
+                             f"or 'count'.")
+
+    return columns or ["company_std"], value
+
+
+def create_wide_table(df, group=None, agg_cols=None, sort=None, asc_bool=True,
+                      agg_dict=None, new_name=None):
+    """
+    Create wide table from the export cube (or from clean data, which is
+    aggregated into a cube first).
+
+    Inputs:
+        df (DataFrame): export cube (or a slice of it) or clean data
+        group (lst): list of columns to group by. Columns that aren't time
+            columns are the columns of the wide table. Default is
+            "company_std"
+        agg_cols(lst): columns that are going to be aggregated. Only the
+            column of 'agg_dict' can be aggregated
+        sort (lst): columns to sort by. Rows are always sorted by month, so
+            only time and 'group' columns are accepted
+        asc_bool (bool): rows are sorted in ascending order, so only True is
+            accepted
+        agg_dict (dict): dict with the measure to aggregate as key. Example:
+            {"weight_ton": "sum"} (default). "count" counts shipments and
+            other functions raise an error (see 'table_spec')
+        new_name (lst): new names of the grouped columns aren't supported, so
+            only None is accepted.
+
+    Return(DataFrame): wide table with a monthly PeriodIndex and standardized
+    company names as columns
+    """
+    measure = next(iter(agg_dict or {"weight_ton": "sum"}))
+    if agg_cols and set(agg_cols) != {measure}:
+        raise ValueError(f"Only the column of 'agg_dict' ({measure!r}) can be "
+                         f"aggregated, got {agg_cols}.")
+    if sort and not set(sort) <= set(TIME_COLUMNS) | set(group or []):
+        raise ValueError(f"Wide tables are sorted by month and can't be sorted "
+                         f"by {sort}.")
+    if not asc_bool:
+        raise ValueError("Wide tables are sorted by month in ascending order.")
+    if new_name is not None:
+        raise ValueError("Wide tables keep the names of the grouped columns, "
+                         "'new_name' isn't supported.")
+    columns, value = table_spec(group, agg_dict)
+    if len(columns) == 1:
+        columns = columns[0]
+
+    return monthly_table(as_cube(df), columns, value).round(1)
 
-def data_source_table(df, group, other_cols, sort, asc_bool, agg_dict,
-                   new_name = None):
+def create_wide_tables(df, by="country", group=None, agg_dict=None):
     """
-    Create wide table from dataframe.
+    Create the wide table of every value of a column (e.g. every country) at
+    once: the data is grouped and pivoted a single time and then split, instead
+    of filtering the data and calling 'create_wide_table' for each value.
 
     Inputs:
-        df (DataFrame): dataset to be used
+        df (DataFrame): export cube (or a slice of it) or clean data
+        by (str): column to split tables by. Default is "country"
+        group (lst): list of columns to group by (see 'create_wide_table')
+        agg_dict (dict): dict with the measure to aggregate as key. Example:
+            {"weight_ton": "sum"} (default).
+
+    Return(dict): dictionary with the values of 'by' as keys and their wide
+    tables (see 'create_wide_table') as values. Each table only has the months
+    and columns with data for its value
+    """
+    columns, value = table_spec([col for col in group or [] if col != by],
+                                agg_dict)
+    if len(columns) == 1:
+        columns = columns[0]
+    wide = monthly_table(as_cube(df), columns, value, by=by).round(1)
+
+    return {key: table.droplevel(by).dropna(axis=1, how="all")
+            for key, table in wide.groupby(level=by, observed=True)}
+
+def data_source_table(df, group=None, other_cols=None, sort=None, asc_bool=True,
+                      agg_dict=None, new_name=None):
+    """
+    Create wide table from the export cube (or from clean data). See
+    'create_wide_table'.
+
+    Inputs:
+        df (DataFrame): export cube (or a slice of it) or clean data
         group (lst): list of columns to group by
-        other_cols(lst): list of columns that are going to be aggregated
-        sort (lst): list of columns to sort dataframe by. If new_name is not
-            empty then the new column names should be used
-        asc_bool (bool): boolean stating wheter or not to sort data "ascending"
-            (True) or "descending" (False)
-        agg_dict (dict): dict with aggregation functions we want to apply to
-            data. If we want to aggregate a column by more than one function
-            we put the functions as a list. Example: {"var": ["count", "sum"]}.
-        new_name (lst): optional paramater with list of new names for grouped
-            dataframe. Default is "None".
-
-    Return(DataFrame): wide table with month-year and standardized company names
-    as columns
-    """
-    # First we get long table by grouping data
-    df_g = cargo_grouping(df, group, other_cols, sort, asc_bool, agg_dict)
-    df_g["date"] = df_g["month"].astype(str) + "/" + df_g["year"].astype(str)
-    
-    # Now we get the wide table format
-    pivot = pd.pivot_table(data=df_g, index=['date', "year", "month"],
-                           columns=['company_std'],
-                           values='weight_ton').reset_index()
-    pivot = pivot.sort_values(by=["year", "month"]).drop(['year', 'month'],
-                                                         axis=1).round(1)
-    
-    return pivot
\ No newline at end of file
+        other_cols(lst): columns that are going to be aggregated
+        sort (lst): columns to sort by
+        asc_bool (bool): sort in ascending order
+        agg_dict (dict): dict with the measure to aggregate as key
+        new_name (lst): new names of the grouped columns (see
+            'create_wide_table').
+
+    Return(DataFrame): wide table with a monthly PeriodIndex and standardized
+    company names as columns
+    """
+    return create_wide_table(df, group, other_cols, sort, asc_bool, agg_dict,
+                             new_name)
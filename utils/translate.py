@@ -0,0 +1,505 @@
+# Name: Josemaria Macedo Carrillo
+# Title: Translation functions
+# Created: 10/18/26
+# Last modified: -
+# DSI
+
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from deep_translator import GoogleTranslator, DeeplTranslator
+from config import (
+    TRANSLATION_CACHE_PATH,
+    TRANSLATION_CACHE_MAX_ENTRIES,
+    TRANSLATION_CACHE_MAX_AGE_DAYS,
+    TRANSLATION_BATCH_SIZE,
+    TRANSLATION_MAX_WORKERS,
+    TRANSLATION_RATE_LIMIT,
+    TRANSLATION_MAX_RETRIES,
+    TRANSLATION_BACKOFF,
+)
+
+
+class TranslationCacheMiss(KeyError):
+    """
+    Raised when the cache runs in offline ("cache-only") mode and a value is
+    not stored in it.
+    """
+
+
+class TranslationCache:
+    """
+    Persistent translation cache stored in a single SQLite file. Entries are
+    keyed by (provider, source language, target language, text).
+
+    Inputs:
+        path (str): path of the SQLite file.
+        max_entries (int): maximum number of entries to keep. The least
+            recently used entries are evicted first.
+        max_age_days (float): entries older than this number of days are
+            evicted. If None, entries never expire.
+        offline (bool): if True, the cache never calls a translator and raises
+            TranslationCacheMiss on a miss. Default is the value of the
+            "TRANSLATION_OFFLINE" environment variable.
+    """
+
+    def __init__(
+        self,
+        path=TRANSLATION_CACHE_PATH,
+        max_entries=TRANSLATION_CACHE_MAX_ENTRIES,
+        max_age_days=TRANSLATION_CACHE_MAX_AGE_DAYS,
+        offline=None,
+    ):
+        if offline is None:
+            offline = os.environ.get("TRANSLATION_OFFLINE", "0") not in ("", "0")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self.translator_calls = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Several worker processes can write to the same file, so we wait for
+        # the database lock instead of failing right away
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                provider TEXT, source TEXT, target TEXT, text TEXT,
+                translation TEXT, created REAL, accessed REAL,
+                PRIMARY KEY (provider, source, target, text))"""
+        )
+        self._conn.commit()
+        self.evict()
+
+    def get_many(self, provider, source, target, texts):
+        """
+        Look up several texts at once.
+
+        Inputs:
+            provider (str): translator name, either 'google' or 'deepl'
+            source (str): source language code
+            target (str): target language code
+            texts (lst): list of strings to look up
+
+        Returns (dict): dictionary with the texts found in the cache as keys
+            and their translations as values. Hit and miss counters are
+            updated.
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for text in texts:
+                row = self._conn.execute(
+                    """SELECT translation FROM translations WHERE provider = ?
+                    AND source = ? AND target = ? AND text = ?""",
+                    (provider, source, target, text),
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    found[text] = row[0]
+            if found:
+                self._conn.executemany(
+                    """UPDATE translations SET accessed = ? WHERE provider = ?
+                    AND source = ? AND target = ? AND text = ?""",
+                    [(now, provider, source, target, text) for text in found],
+                )
+                self._conn.commit()
+
+        return found
+
+    def set_many(self, provider, source, target, translations):
+        """
+        Store several translations at once and evict old entries.
+
+        Inputs:
+            provider (str): translator name, either 'google' or 'deepl'
+            source (str): source language code
+            target (str): target language code
+            translations (dict): dictionary with texts as keys and their
+                translations as values.
+
+        Returns: None.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                """INSERT OR REPLACE INTO translations VALUES
+                (?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (provider, source, target, text, translation, now, now)
+                    for text, translation in translations.items()
+                ],
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self):
+        """
+        Remove entries older than 'max_age_days' and the least recently used
+        entries above 'max_entries'.
+
+        Returns: None.
+        """
+        with self._lock:
+            if self.max_age_days is not None:
+                oldest = time.time() - self.max_age_days * 24 * 60 * 60
+                self._conn.execute(
+                    "DELETE FROM translations WHERE created < ?", (oldest,)
+                )
+            if self.max_entries is not None:
+                self._conn.execute(
+                    """DELETE FROM translations WHERE rowid IN (SELECT rowid
+                    FROM translations ORDER BY accessed DESC, rowid DESC LIMIT -1
+                    OFFSET ?)""",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        """
+        Remove every entry from the cache and reset the counters.
+
+        Returns: None.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM translations")
+            self._conn.commit()
+        self.hits = self.misses = self.translator_calls = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM translations"
+            ).fetchone()[0]
+
+    def stats(self):
+        """
+        Get cache counters.
+
+        Returns (dict): dictionary with number of entries, hits, misses and
+            translator calls.
+        """
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "translator_calls": self.translator_calls,
+        }
+
+
+_CACHE = None
+
+
+def _reset_cache():
+    """
+    Forget the shared cache in forked worker processes so each process opens
+    its own SQLite connection instead of sharing the parent's one.
+    """
+    global _CACHE
+    _CACHE = None
+
+
+os.register_at_fork(after_in_child=_reset_cache)
+
+
+def get_cache():
+    """
+    Get the cache shared by every translation call site in the process. It's
+    created the first time the function is called.
+
+    Returns (TranslationCache): shared translation cache.
+    """
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = TranslationCache()
+
+    return _CACHE
+
+
+class Provider:
+    """
+    Translation provider interface. Subclasses implement 'translate_batch'.
+    Providers whose batch is sent as one request set 'batch_requests' to True
+    so the rate limiter counts one request per batch instead of one per text.
+    """
+
+    name = None
+    batch_requests = False
+
+    def translate_batch(self, texts, source, target):
+        """
+        Translate a batch of strings.
+
+        Inputs:
+            texts (lst): list of strings to translate
+            source (str): code of language to translate
+            target (str): target language code.
+
+        Returns (lst): list with translated strings in the same order.
+        """
+        raise NotImplementedError
+
+
+class GoogleProvider(Provider):
+    """
+    Google translator provider (one HTTP request per text).
+    """
+
+    name = "google"
+
+    def translate_batch(self, texts, source, target):
+        translator = GoogleTranslator(source=source, target=target)
+        return [translator.translate(text) for text in texts]
+
+
+class DeeplProvider(Provider):
+    """
+    Deepl translator provider. The API key is read from the environment
+    variable "API_KEY".
+    """
+
+    name = "deepl"
+
+    def translate_batch(self, texts, source, target):
+        translator = DeeplTranslator(
+            api_key=os.environ.get("API_KEY"),
+            source=source,
+            target=target,
+            use_free_api=True,
+        )
+        return [translator.translate(text) for text in texts]
+
+
+class LocalProvider(Provider):
+    """
+    Offline stand-in translator for tests and benchmarks. Texts found in
+    'translations' are translated with it, any other text is returned as is.
+
+    Inputs:
+        translations (dict): dictionary with texts as keys and translations
+            as values. Default is an empty dictionary.
+        latency (float): seconds to wait per text to simulate a network
+            round trip. Default is 0.
+        name (str): provider name used in the cache key. Default is 'local'.
+    """
+
+    batch_requests = True
+
+    def __init__(self, translations=None, latency=0, name="local"):
+        self.translations = translations if translations is not None else {}
+        self.latency = latency
+        self.name = name
+
+    def translate_batch(self, texts, source, target):
+        if self.latency:
+            time.sleep(self.latency * len(texts))
+        return [self.translations.get(text, text) for text in texts]
+
+
+PROVIDERS = {"google": GoogleProvider(), "deepl": DeeplProvider()}
+
+
+def register_provider(provider):
+    """
+    Make a provider available by name to every translation function.
+
+    Inputs:
+        provider (Provider): provider instance.
+
+    Returns: None.
+    """
+    PROVIDERS[provider.name] = provider
+
+
+def get_provider(translator):
+    """
+    Get provider from its name.
+
+    Inputs:
+        translator (str or Provider): provider name ('google', 'deepl' or any
+            registered provider) or provider instance.
+
+    Returns (Provider): provider instance.
+    """
+    if isinstance(translator, Provider):
+        return translator
+    assert (
+        translator in PROVIDERS
+    ), f"Wrong translator name. Use one of {list(PROVIDERS)}."
+
+    return PROVIDERS[translator]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Inputs:
+        rate (float): tokens added per second. If None, there is no limit.
+        capacity (float): maximum number of tokens (burst size). Default is
+            'rate'.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Wait until 'tokens' tokens are available and take them. Requests
+        larger than the bucket capacity are allowed to go into debt.
+
+        Inputs:
+            tokens (float): number of tokens to take.
+
+        Returns: None.
+        """
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= min(tokens, self.capacity):
+                    self._tokens -= tokens
+                    return
+                wait = (min(tokens, self.capacity) - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def translate_batch_with_retry(provider, batch, source, target, bucket,
+                               max_retries=TRANSLATION_MAX_RETRIES,
+                               backoff=TRANSLATION_BACKOFF):
+    """
+    Translate a batch of strings waiting for the rate limiter and retrying
+    with exponential backoff (and jitter) when the provider fails.
+
+    Inputs:
+        provider (Provider): translation provider
+        batch (lst): list of strings to translate
+        source (str): code of language to translate
+        target (str): target language code
+        bucket (TokenBucket): rate limiter shared by all workers
+        max_retries (int): number of retries before raising the error
+        backoff (float): seconds to wait before the first retry.
+
+    Returns (lst): list with translated strings in the same order.
+    """
+    cost = 1 if provider.batch_requests else len(batch)
+    for attempt in range(max_retries + 1):
+        bucket.acquire(cost)
+        try:
+            return provider.translate_batch(batch, source, target)
+        except Exception:
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff * 2**attempt * (1 + random.random()))
+
+
+def translate_many(texts, translator="google", source="uk", target="en",
+                   cache=None, batch_size=TRANSLATION_BATCH_SIZE,
+                   max_workers=TRANSLATION_MAX_WORKERS,
+                   rate_limit=TRANSLATION_RATE_LIMIT):
+    """
+    Translate strings going to the translator only for values that are not
+    in the cache yet. Missing values are deduplicated, split in batches and
+    translated concurrently by a bounded thread pool behind a token bucket
+    rate limiter.
+
+    Inputs:
+        texts (iterable): strings to translate. Repeated values are only
+            translated once and values that are not strings are returned
+            untranslated.
+        translator (str or Provider): translator to use. Can be either
+            'google', 'deepl', a registered provider name or a provider
+        source (str): code of language to translate. Default is 'uk' (Ukrainian)
+        target (str): target language code. Default is 'en' (English)
+        cache (TranslationCache): cache to use. Default is the shared cache
+        batch_size (int): number of strings per batch
+        max_workers (int): maximum number of concurrent batches
+        rate_limit (float): maximum number of requests per second. If None,
+            there is no limit.
+
+    Returns (dict): dictionary with original strings as keys and translations
+        as values.
+    """
+    provider = get_provider(translator)
+
+    if cache is None:
+        cache = get_cache()
+
+    d = {}
+    unique = []
+    for text in texts:
+        if text in d:
+            continue
+        if isinstance(text, str):
+            d[text] = None
+            unique.append(text)
+        else:
+            d[text] = text
+
+    d.update(cache.get_many(provider.name, source, target, unique))
+    missing = [text for text in unique if d[text] is None]
+
+    if missing and cache.offline:
+        raise TranslationCacheMiss(
+            f"{len(missing)} values not in translation cache (offline mode). "
+            f"First missing value: {missing[0]!r}"
+        )
+    if not missing:
+        return d
+
+    batches = [
+        missing[i : i + batch_size] for i in range(0, len(missing), batch_size)
+    ]
+    bucket = TokenBucket(rate_limit)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        results = pool.map(
+            lambda batch: translate_batch_with_retry(
+                provider, batch, source, target, bucket
+            ),
+            batches,
+        )
+        for batch, translated in zip(batches, results):
+            new = dict(zip(batch, translated))
+            cache.translator_calls += len(batch)
+            # We store every finished batch so a failure doesn't lose the
+            # translations we already paid for
+            cache.set_many(provider.name, source, target, new)
+            d.update(new)
+
+    return d
+
+
+def translate(text, translator="google", source="uk", target="en", cache=None):
+    """
+    Translate one string using the translation cache.
+
+    Inputs:
+        text (str): string to translate
+        translator (str or Provider): translator to use. Can be either
+            'google', 'deepl', a registered provider name or a provider
+        source (str): code of language to translate. Default is 'uk' (Ukrainian)
+        target (str): target language code. Default is 'en' (English)
+        cache (TranslationCache): cache to use. Default is the shared cache.
+
+    Returns (str): translated string.
+    """
+    return translate_many([text], translator, source, target, cache)[text]